@@ -0,0 +1,78 @@
+import time
+import argparse
+
+from utils import ChapterExtractor
+from benchmarks.pages import wrap_page
+from benchmarks.parser_benchmark import load_pages
+
+PARSER = argparse.ArgumentParser(description="Benchmarks the streaming text extractor against the tree, checking they match")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-l", "--limit", type=int, default=100)
+
+# Passages the fixtures don't cover: several cross references in a verse, entities, comments, stray and unclosed tags
+EDGE_CASES = [
+    '<h3><span class="text Gen-1-1">The <i>Beginning</i></span></h3><p class="chapter-1"><span class="text Gen-1-1">'
+    '<span class="chapternum">1 </span>In the beginning<sup class="crossreference" value="(A)">(<a href="#A">A</a>)</sup> '
+    'God created<sup class="crossreference">(<a href="#B">B</a>)</sup> the heaven.</span> <span id="en-KJV-2" class="text '
+    'Gen-1-2"><sup class="versenum">2&nbsp;</sup>And the earth<sup class="footnote">[<a href="#fa">a</a>]</sup> was '
+    'without form&#8212;and void &amp; &foo; &#150;</span></p>',
+    '<p><span class="text Gen-2-1"><sup class="crossreference"><sup class="versenum">1</sup>(A)</sup><sup class="versenum">'
+    ' 1 </sup>Thus the heavens <!-- note -->\n   <b>and</b>\n   <i>the earth</i></b> were finished,<br>\n and all '
+    '<em>the host of them.</span></p><span class="text Gen-2-2">Outside a paragraph</span><p></p>',
+    '<div class="poetry"><p class="line"><span class="text Ps-23-1"><span class="chapternum">23 </span>The Lord is my '
+    'shepherd;</span><br><span class="indent-1"><span class="indent-1-breaks">&nbsp;</span><span class="text Ps-23-1">I '
+    'shall not want.</span></span></p></div><p><span class="text Ps-23-2"><span class="chapternum">2 </span>He maketh me '
+    '</p> to lie down</span>',
+    '<p><span class="text Gen-3-1">A nested <p>paragraph</p> and <span class="text Gen-3-2">verse</span></span></p>',
+    '<p><span class="text Gen-4-1">Unclosed <sup class="versenum">1</sup>verse',
+]
+
+def extract_pages(extractor: ChapterExtractor, pages: list[str]) -> tuple[float, list]:
+    """Extracts the pages, returning the seconds spent and the chapters"""
+    started, chapters = time.perf_counter(), []
+
+    for page in pages:
+        extracted, _ = extractor.process(page, 1)
+
+        chapters.append(extracted)
+
+    return time.perf_counter() - started, chapters
+
+def check(pages: list[str], passage_only: bool) -> tuple[int, int]:
+    """Returns the pages extracted differently by the stream and the tree, and the pages the stream left to the tree"""
+    options = {"tag_settings": [], "include_html": False, "verse_output": True, "passage_only": passage_only}
+
+    _, streamed = extract_pages(ChapterExtractor(**options), pages)
+
+    _, parsed = extract_pages(ChapterExtractor(**options, streaming=False), pages)
+
+    fallbacks = sum(ChapterExtractor(**options).stream(page, 1) is None for page in pages)
+
+    return sum(a != b for a, b in zip(streamed, parsed)), fallbacks
+
+def run(html_path: str, limit: int) -> None:
+    """Entry point to the benchmark"""
+    pages = load_pages(html_path, limit)
+
+    edge_pages = [wrap_page(content, "Genesis 1", "KJV") for content in EDGE_CASES] + [wrap_page("", "Genesis 1", "KJV")
+                                                                                        .replace("passage-text", "no-passage")]
+
+    for passage_only in [False, True]:
+        mismatches, fallbacks = check(pages + edge_pages, passage_only)
+
+        options = {"tag_settings": [], "include_html": False, "passage_only": passage_only}
+
+        parsed, _ = extract_pages(ChapterExtractor(**options, streaming=False), pages)
+
+        streamed, _ = extract_pages(ChapterExtractor(**options), pages)
+
+        print(f"passage_only={passage_only!s:<5} || tree {len(pages) / parsed:8.1f} pages/s || stream "
+              f"{len(pages) / streamed:8.1f} pages/s ({parsed / streamed:.1f}x) || mismatches: {mismatches} "
+              f"|| left to the tree: {fallbacks} of {len(pages) + len(edge_pages)}")
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    run(args.html_path, args.limit)
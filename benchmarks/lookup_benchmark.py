@@ -0,0 +1,127 @@
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import http.client
+from urllib.parse import urlencode
+
+from verse_server import VerseLookup, VerseServer, build
+
+PARSER = argparse.ArgumentParser(description="Benchmarks verse and merged chapter lookups from the verse stores")
+
+PARSER.add_argument("-csv", "--csv_path", type=str, default="./data/csv/")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-n", "--requests", type=int, default=2000)
+
+PARSER.add_argument("-c", "--clients", type=int, default=8)
+
+PARSER.add_argument("-z", "--compress", action="store_true")
+
+def get_percentiles(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+
+    p50, p99 = latencies[len(latencies) // 2], latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+
+    return f"p50: {p50 * 1e6:.0f}us || p99: {p99 * 1e6:.0f}us"
+
+def get_requests(lookup: VerseLookup, count: int) -> list[tuple[str, dict[str, str]]]:
+    """Returns random verse, verse range and merged chapter requests of the chapters stored"""
+    chapters = [(store.version_id, book, chapter) for store in lookup.stores.values()
+                for book, chapter in store.get_chapters()]
+
+    requests = []
+
+    for _ in range(count):
+        version_id, book, chapter = random.choice(chapters)
+
+        kind = random.random()
+
+        if kind < 0.1: requests.append(("/chapter", {"book": book, "chapter": str(chapter)}))
+        else:
+            first = random.randint(1, 20)
+
+            verses = str(first) if kind < 0.7 else f"{first}-{first + random.randint(1, 10)}"
+
+            requests.append(("/verses", {"version": version_id, "book": book, "chapter": str(chapter), "verses": verses}))
+
+    return requests
+
+def bench_lookup(lookup: VerseLookup, requests: list[tuple[str, dict[str, str]]]) -> list[float]:
+    """Times the lookups in process"""
+    latencies = []
+
+    for path, params in requests:
+        started = time.perf_counter()
+
+        if path == "/chapter":
+            lookup.get_chapter(params["book"], int(params["chapter"]))
+        else:
+            first, _, last = params["verses"].partition("-")
+
+            lookup.get_verses(params["version"], params["book"], int(params["chapter"]), int(first), int(last or first))
+
+        latencies.append(time.perf_counter() - started)
+
+    return latencies
+
+def bench_http(server: VerseServer, requests: list[tuple[str, dict[str, str]]], clients: int) -> tuple[list[float], float]:
+    """Sends the requests from keep-alive clients in parallel, returns the latencies and the seconds taken"""
+    latencies, lock = [], threading.Lock()
+
+    def client(client_requests: list[tuple[str, dict[str, str]]]) -> None:
+        connection, client_latencies = http.client.HTTPConnection(*server.server_address), []
+
+        for path, params in client_requests:
+            started = time.perf_counter()
+
+            connection.request("GET", f"{path}?{urlencode(params)}")
+
+            connection.getresponse().read()
+
+            client_latencies.append(time.perf_counter() - started)
+
+        connection.close()
+
+        with lock: latencies.extend(client_latencies)
+
+    threads = [threading.Thread(target=client, args=(requests[i::clients],)) for i in range(clients)]
+
+    started = time.perf_counter()
+
+    [thread.start() for thread in threads]
+
+    [thread.join() for thread in threads]
+
+    return latencies, time.perf_counter() - started
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    store_path = tempfile.mkdtemp(prefix="verse-store-") + "/"
+
+    try:
+        build(args.csv_path, args.html_path, store_path, args.compress)
+
+        requests = get_requests(VerseLookup(store_path), args.requests)
+
+        print(f"Uncached lookups: {get_percentiles(bench_lookup(VerseLookup(store_path, 0), requests))}")
+
+        lookup = VerseLookup(store_path)
+
+        bench_lookup(lookup, requests)
+
+        print(f"Cached lookups: {get_percentiles(bench_lookup(lookup, requests))}")
+
+        server = VerseServer(0, lookup).start()
+
+        latencies, elapsed = bench_http(server, requests, args.clients)
+
+        print(f"Http ({args.clients} clients): {len(latencies) / elapsed:.0f} requests/s || {get_percentiles(latencies)}")
+
+        server.shutdown()
+    finally:
+        shutil.rmtree(store_path, ignore_errors=True)
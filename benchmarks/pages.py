@@ -0,0 +1,35 @@
+import json
+
+with open("./utils/books.json") as file:
+    PAGE_CONFIG = json.dumps(json.load(file))
+
+NAV_ITEMS = "".join(f'<li class="nav-item"><a href="/resources/{n}/">Resource {n}</a></li>' for n in range(200))
+
+AD_SLOTS = "".join(f'<div class="ad-slot" id="ad-{n}"><script>window.ads.push({n});</script></div>' for n in range(20))
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{search} {version} - Bible Gateway</title>
+<link rel="stylesheet" href="/assets/css/main.css">
+<script>window.BG = {config};</script>
+<script src="/assets/js/main.js"></script>
+</head>
+<body class="passage">
+<header><nav><ul class="nav">{nav}</ul></nav></header>
+<div class="container">
+<div class="passage-cols"><div class="passage-col version-{version}">
+<div class="passage-text"><div class="passage-content passage-class-0">{content}</div></div>
+</div></div>
+<aside>{ads}</aside>
+</div>
+<footer><ul class="footer-links">{nav}</ul></footer>
+<script>window.dataLayer = [{config}];</script>
+</body>
+</html>"""
+
+def wrap_page(content: str, search: str, version: str) -> str:
+    """Wraps a passage fragment in a full page like the ones served by biblegateway"""
+    return PAGE_TEMPLATE.format(search=search, version=version, config=PAGE_CONFIG,
+                                nav=NAV_ITEMS, ads=AD_SLOTS, content=content)
@@ -0,0 +1,68 @@
+import os
+import time
+import argparse
+import tracemalloc
+
+from utils import parse_page, PARSER_BACKENDS
+from benchmarks.pages import wrap_page
+
+PARSER = argparse.ArgumentParser(description="Benchmarks the parser backends on full passage pages")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-l", "--limit", type=int, default=100)
+
+def load_pages(html_path: str, limit: int) -> list[str]:
+    """Wraps the html fixtures in full pages"""
+    pages = []
+
+    for file_name in sorted(os.listdir(html_path))[:limit]:
+        with open(f"{html_path}{file_name}", encoding="utf-8") as file:
+            version, *book, chapter, _ = file_name.split("_")
+
+            pages.append(wrap_page(file.read(), f"{' '.join(book)} {chapter}", version))
+
+    return pages
+
+def parse_pages(pages: list[str], backend: str, passage_only: bool) -> tuple[float, int, list[str]]:
+    """Parses the pages, returning the seconds spent, the peak memory of one page and the passages"""
+    elapsed, peak, passages = 0.0, 0, []
+
+    for page in pages:
+        tracemalloc.start()
+
+        start = time.perf_counter()
+
+        soup = parse_page(page, backend, passage_only)
+
+        elapsed += time.perf_counter() - start
+
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+
+        tracemalloc.stop()
+
+        passages.append(soup.select_one("div.passage-text").__repr__())
+
+    return elapsed, peak, passages
+
+def run(html_path: str, limit: int) -> None:
+    """Entry point to the benchmark"""
+    pages = load_pages(html_path, limit)
+
+    reference = None
+
+    for backend in PARSER_BACKENDS:
+        for passage_only in [False, True]:
+            elapsed, peak, passages = parse_pages(pages, backend, passage_only)
+
+            reference = passages if reference is None else reference
+
+            mismatches = sum(a != b for a, b in zip(reference, passages))
+
+            print(f"{backend:<12} passage_only={passage_only!s:<5} || {len(pages) / elapsed:8.1f} pages/s "
+                  f"|| peak {peak / 1024:8.1f} KiB || mismatches: {mismatches}")
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    run(args.html_path, args.limit)
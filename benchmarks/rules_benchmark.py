@@ -0,0 +1,67 @@
+import os
+import json
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+from utils import TagRules
+
+PARSER = argparse.ArgumentParser(description="Benchmarks the settings.json tag rules on the html fixtures")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-n", "--rounds", type=int, default=3)
+
+def load_fixtures(html_path: str) -> list[str]:
+    """Reads every html fixture"""
+    fixtures = []
+
+    for file_name in sorted(os.listdir(html_path)):
+        with open(f"{html_path}{file_name}", encoding="utf-8") as file:
+            fixtures.append(file.read())
+
+    return fixtures
+
+def time_rules(apply, fixtures: list[str], rounds: int) -> tuple[float, list[str]]:
+    """Applies the rules to freshly parsed fixtures and returns the seconds spent and the outputs"""
+    elapsed, outputs = 0.0, []
+
+    for _ in range(rounds):
+        soups = [BeautifulSoup(fixture, "html.parser").find() for fixture in fixtures]
+
+        start = time.perf_counter()
+
+        [apply(soup) for soup in soups]
+
+        elapsed += time.perf_counter() - start
+
+        outputs = [soup.__repr__() for soup in soups]
+
+    return elapsed, outputs
+
+def run(html_path: str, rounds: int) -> None:
+    """Entry point to the benchmark"""
+    with open("./settings/settings.json", "r") as file:
+        rules = TagRules(json.load(file))
+
+    fixtures = load_fixtures(html_path)
+
+    sequential_time, sequential_outputs = time_rules(rules.apply_sequential, fixtures, rounds)
+
+    compiled_time, compiled_outputs = time_rules(rules.apply, fixtures, rounds)
+
+    mismatches = sum(a != b for a, b in zip(sequential_outputs, compiled_outputs))
+
+    chapters = len(fixtures) * rounds
+
+    print(f"Fixtures: {len(fixtures)} || Rounds: {rounds} || Mismatches: {mismatches}")
+
+    print(f"Sequential: {sequential_time:.3f}s ({chapters / sequential_time:.1f} chapters/s)")
+
+    print(f"Compiled: {compiled_time:.3f}s ({chapters / compiled_time:.1f} chapters/s)")
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    run(args.html_path, args.rounds)
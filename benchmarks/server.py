@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks.pages import wrap_page
+
+PARSER = argparse.ArgumentParser(description="Serves the html fixtures like biblegateway's /passage endpoint")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-p", "--port", type=int, default=8765)
+
+PARSER.add_argument("-l", "--latency", type=float, default=0.0)
+
+PARSER.add_argument("-j", "--jitter", type=float, default=0.0)
+
+PARSER.add_argument("-er", "--error-rate", type=float, default=0.0)
+
+PARSER.add_argument("-tr", "--throttle-rate", type=float, default=0.0)
+
+PARSER.add_argument("-ra", "--retry-after", type=int, default=1)
+
+FIXTURE_RE = re.compile(r"^(\w+?)_(.+)_(\d+)_(\d{4}-\d{2}-\d{2})\.html$")
+
+TEXT_HTML_RE = re.compile(r'^<div\b[^>]*\bclass="[^"]*\btext-html\b')
+
+def index_fixtures(html_path: str) -> dict[tuple[str, str, int], str]:
+    """Indexes (version, book, chapter) to the newest fixture of the chapter"""
+    fixtures = {}
+
+    for file_name in sorted(os.listdir(html_path)):
+        fixture_match = FIXTURE_RE.match(file_name)
+
+        if fixture_match is None: continue
+
+        version, book, chapter, _ = fixture_match.groups()
+
+        fixtures[(version, book.replace("_", " ").lower(), int(chapter))] = f"{html_path}{file_name}"
+
+    return fixtures
+
+def read_fixture(file_path: str, version: str) -> tuple[str, str]:
+    """Returns the opening div.text-html tag of a fixture and its inner html"""
+    with open(file_path, encoding="utf-8") as file:
+        html = file.read().strip()
+
+    head, rest = html.split(">", 1)
+
+    if not TEXT_HTML_RE.match(html): head = f'<div class="version-{version} result-text-style-normal text-html"'
+
+    return f"{head}>", rest[:rest.rindex("</div>")]
+
+class PassageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None: pass
+
+    def __send(self, status: int, body: bytes, headers: Optional[dict[str, str]]=None) -> None:
+        self.send_response(status)
+
+        [self.send_header(k, v) for k, v in (headers or {}).items()]
+
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def __get_page(self, search: str, version: str) -> Optional[str]:
+        """Builds the page of a search like "Genesis 1" or "Genesis 1-3", None if a chapter is missing"""
+        book, _, chapters = search.rpartition(" ")
+
+        if not chapters.replace("-", "").isdigit(): return
+
+        first, _, last = chapters.partition("-")
+
+        files = [self.server.fixtures.get((version, book.lower(), chapter))
+                 for chapter in range(int(first), int(last or first) + 1)]
+
+        if not files or None in files: return
+
+        parts = [read_fixture(file_path, version) for file_path in files]
+
+        return wrap_page(parts[0][0] + "".join(inner for _, inner in parts) + "</div>", search, version)
+
+    def do_GET(self) -> None:
+        server: PassageServer = self.server
+
+        params = parse_qs(urlparse(self.path).query)
+
+        time.sleep(max(server.latency + random.uniform(-server.jitter, server.jitter), 0))
+
+        with server.lock: server.requests += 1
+
+        if random.random() < server.throttle_rate:
+            return self.__send(429, b"Too Many Requests", {"Retry-After": str(server.retry_after)})
+
+        if random.random() < server.error_rate: return self.__send(500, b"Internal Server Error")
+
+        page = self.__get_page(params.get("search", [""])[0], params.get("version", [""])[0])
+
+        if page is None: return self.__send(404, b"Not Found")
+
+        self.__send(200, page.encode("utf-8"))
+
+class PassageServer(ThreadingHTTPServer):
+    """Local stand-in for biblegateway's /passage endpoint built from the html fixtures,
+    with configurable latency, error rate and 429 (throttled) responses"""
+    daemon_threads = True
+
+    def __init__(self, port: int, html_path: Optional[str]="./data/html/", latency: Optional[float]=0.0,
+                 jitter: Optional[float]=0.0, error_rate: Optional[float]=0.0,
+                 throttle_rate: Optional[float]=0.0, retry_after: Optional[int]=1) -> None:
+        super().__init__(("127.0.0.1", port), PassageHandler)
+
+        self.fixtures = index_fixtures(html_path)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address) -> None:
+        """Ignores the connections the clients dropped, e.g. when their requests timed out"""
+        if not isinstance(sys.exc_info()[1], ConnectionError): super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/passage"
+
+    def start(self) -> "PassageServer":
+        """Serves in a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+        return self
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    server = PassageServer(args.port, args.html_path, args.latency, args.jitter,
+                           args.error_rate, args.throttle_rate, args.retry_after)
+
+    print(f"Serving {len(server.fixtures)} chapters on {server.url}")
+
+    server.serve_forever()
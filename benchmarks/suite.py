@@ -0,0 +1,186 @@
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Optional
+
+from benchmarks.server import PassageServer
+
+PARSER = argparse.ArgumentParser(description="Benchmarks the scraper and the merger offline against the local passage server")
+
+PARSER.add_argument("-b", "--book", type=str, nargs="+", default=["genesis"])
+
+PARSER.add_argument("-v", "--versions", type=str, nargs="+", default=["KJV"])
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-l", "--latency", type=float, default=0.05)
+
+PARSER.add_argument("-j", "--jitter", type=float, default=0.02)
+
+PARSER.add_argument("-er", "--error-rate", type=float, default=0.0)
+
+PARSER.add_argument("-tr", "--throttle-rate", type=float, default=0.0)
+
+PARSER.add_argument("-bl", "--baseline", type=str, default="./benchmarks/baseline.json")
+
+PARSER.add_argument("-sb", "--save-baseline", action="store_true")
+
+PARSER.add_argument("-t", "--tolerance", type=float, default=0.2)
+
+PARSER.add_argument("-k", "--keep", action="store_true")
+
+PARSER.add_argument("-pp", "--parse-processes", type=int, default=0)
+
+SOURCES = ["main.py", "merger.py", "indexer.py", "verse_server.py", "utils", "settings"]
+
+LOWER_IS_BETTER = ["p50", "p99", "peak_rss_mb"]
+
+def prepare_workdir() -> str:
+    """Copies the scripts and the settings to an empty working directory"""
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+
+    os.makedirs(f"{workdir}/data/html/")
+
+    for source in SOURCES:
+        copy = shutil.copytree if os.path.isdir(source) else shutil.copy
+
+        copy(source, f"{workdir}/{source}")
+
+    return workdir
+
+def run_process(args: list[str], workdir: str) -> tuple[float, float]:
+    """Runs a script in the working directory, returning the seconds it took and its peak rss in MB"""
+    started = time.perf_counter()
+
+    process = subprocess.Popen([sys.executable, *args], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    _, status, usage = os.wait4(process.pid, 0)
+
+    elapsed = time.perf_counter() - started
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode: raise RuntimeError(f"{' '.join(args)} exited with {process.returncode}, see {workdir}/logs/")
+
+    return elapsed, usage.ru_maxrss / 1024
+
+def read_metrics(workdir: str, name: str) -> dict[str, Any]:
+    with open(f"{workdir}/logs/{name}-metrics.json", encoding="utf-8") as file:
+        return json.load(file)
+
+def count_chapters(workdir: str) -> int:
+    """Counts the chapter rows saved to the csv files"""
+    chapters = 0
+
+    for file_path in glob.glob(f"{workdir}/data/csv/**/*.csv", recursive=True):
+        with open(file_path, encoding="utf-8", newline="") as file:
+            chapters += sum(1 for _ in csv.DictReader(file))
+
+    return chapters
+
+def get_result(chapters: int, elapsed: float, peak_rss_mb: float, stage: Optional[dict]) -> dict[str, float]:
+    stage = stage or {}
+
+    return {"chapters": chapters, "seconds": round(elapsed, 3),
+            "chapters_per_s": round(chapters / max(elapsed, 1e-9), 2),
+            "p50": stage.get("p50"), "p99": stage.get("p99"), "peak_rss_mb": round(peak_rss_mb, 1)}
+
+def bench_scraper(server: PassageServer, book: str, versions: list[str], html: bool, 
+                  parse_processes: Optional[int]=0) -> tuple[dict, str]:
+    """Scrapes the book from the local server. p50/p99 are the fetch latencies, the peak rss 
+    doesn't include the parse worker processes"""
+    workdir = prepare_workdir()
+
+    args = ["main.py", "-b", book, "-v", *versions, "-c", "off", "-u", server.url, "-pp", str(parse_processes)]
+
+    args += ["--html"] if html else []
+
+    elapsed, peak_rss_mb = run_process(args, workdir)
+
+    stage = read_metrics(workdir, "scraper")["stages"].get("fetch")
+
+    return get_result(count_chapters(workdir), elapsed, peak_rss_mb, stage), workdir
+
+def bench_merger(workdir: str) -> dict[str, float]:
+    """Merges the chapters scraped in html mode. p50/p99 are the latencies of a chapter"""
+    elapsed, peak_rss_mb = run_process(["merger.py"], workdir)
+
+    metrics = read_metrics(workdir, "merger")
+
+    chapters = sum(c["value"] for c in metrics["counters"] if c["name"] == "chapters" and c["labels"]["result"] == "merged")
+
+    return get_result(int(chapters), elapsed, peak_rss_mb, metrics["stages"].get("chapter"))
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Returns the metrics worse than the baseline by more than the tolerance"""
+    regressions = []
+
+    for scenario, result in results.items():
+        for metric, value in result.items():
+            expected = baseline.get(scenario, {}).get(metric)
+
+            if metric in ["chapters", "seconds"] or not value or not expected: continue
+
+            change = (value - expected) / expected
+
+            if (change if metric in LOWER_IS_BETTER else -change) > tolerance:
+                regressions.append(f"{scenario} {metric}: {expected} -> {value} ({change:+.0%})")
+
+    return regressions
+
+def run(args: argparse.Namespace) -> int:
+    """Entry point to the benchmark suite. Returns 1 when a metric regressed past the baseline"""
+    server = PassageServer(0, args.html_path, args.latency, args.jitter, args.error_rate, args.throttle_rate).start()
+
+    book, results, workdirs = " ".join(args.book), {}, []
+
+    try:
+        results["scraper-text"], workdir = bench_scraper(server, book, args.versions, False, args.parse_processes)
+
+        workdirs.append(workdir)
+
+        results["scraper-html"], workdir = bench_scraper(server, book, args.versions, True, args.parse_processes)
+
+        workdirs.append(workdir)
+
+        results["merger"] = bench_merger(workdir)
+    finally:
+        server.shutdown()
+
+        [shutil.rmtree(workdir, ignore_errors=True) for workdir in workdirs if not args.keep]
+
+    print(f"Book: {book} || Versions: {', '.join(args.versions)} || Latency: {args.latency}s ± {args.jitter}s || "
+          f"Errors: {args.error_rate:.0%} || Throttled: {args.throttle_rate:.0%} || Requests: {server.requests}")
+
+    for scenario, result in results.items():
+        print(f"{scenario}: {result['chapters']} chapters in {result['seconds']:.2f}s "
+              f"({result['chapters_per_s']:.1f} chapters/s) || p50: {result['p50']}s || p99: {result['p99']}s || "
+              f"Peak RSS: {result['peak_rss_mb']:.1f}MB")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+
+        print(f"Baseline saved to {args.baseline}")
+
+        return 0
+
+    if not os.path.exists(args.baseline): return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+
+    [print(f"Regression: {regression}") for regression in regressions]
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(run(PARSER.parse_args()))
@@ -0,0 +1,80 @@
+import os
+import time
+import argparse
+from typing import Optional
+
+from merger import iter_source, read_sqlite, read_parquet
+from utils import BlobStore, BLOBS_PATH, CODECS, PARQUET_PATH, SQLITE_PATH
+
+PARSER = argparse.ArgumentParser(description="Manages the content-addressed store of the chapter html")
+
+PARSER.add_argument("command", type=str, choices=["migrate", "gc", "stats"])
+
+PARSER.add_argument("-csv", "--csv_path", type=str, default="./data/csv/")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-bp", "--blobs_path", type=str, default=BLOBS_PATH)
+
+PARSER.add_argument("-pq", "--parquet_path", type=str, default=PARQUET_PATH)
+
+PARSER.add_argument("-db", "--sqlite_path", type=str, default=SQLITE_PATH)
+
+PARSER.add_argument("-c", "--codec", type=str, choices=CODECS, default="gzip")
+
+PARSER.add_argument("-k", "--keep", action="store_true")
+
+PARSER.add_argument("-n", "--dry-run", action="store_true")
+
+def format_size(size: int) -> str:
+    return f"{size / 1024 / 1024:.2f}MB"
+
+def migrate(store: BlobStore, html_path: str, keep: Optional[bool]=False) -> None:
+    """Moves the html files into the store, the files are deleted once stored unless keep"""
+    file_names = sorted(f for f in os.listdir(html_path) if f.endswith(".html")) if os.path.exists(html_path) else []
+
+    for file_name in file_names:
+        with open(f"{html_path}{file_name}", encoding="utf-8") as file:
+            store.put(file.read(), file_name)
+
+        if not keep: os.remove(f"{html_path}{file_name}")
+
+    print(f"{len(file_names)} html files {'copied' if keep else 'moved'} to the store")
+
+def get_live_names(csv_path: str, parquet_path: str, sqlite_path: str) -> set[str]:
+    """Returns the html file names referenced by the csv files, the parquet dataset and the sqlite database"""
+    verses = list(iter_source("csv", csv_path, parquet_path, sqlite_path)) if os.path.exists(csv_path) else []
+
+    if os.path.exists(sqlite_path): verses += read_sqlite(sqlite_path)
+
+    if os.path.exists(f"{parquet_path}chapters/"): verses += read_parquet(parquet_path)
+
+    return {verse.content for verse in verses if verse.content and verse.content.endswith(".html")}
+
+def collect(store: BlobStore, csv_path: str, parquet_path: str, sqlite_path: str, dry_run: Optional[bool]=False) -> None:
+    """Deletes the references no scraped chapter uses anymore and the blobs left without references.
+    The references created while the chapters are read are kept, their rows may not be written yet"""
+    started = time.time()
+
+    refs, blobs, size = store.collect(get_live_names(csv_path, parquet_path, sqlite_path), dry_run, started)
+
+    print(f"{refs} references and {blobs} blobs ({format_size(size)}) {'to delete' if dry_run else 'deleted'}")
+
+def stats(store: BlobStore) -> None:
+    stats = store.get_stats()
+
+    print(f"{stats['refs']} references to {stats['blobs']} blobs || "
+          f"{format_size(stats['size'])} of html stored in {format_size(stats['stored_size'])}")
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    store = BlobStore(args.blobs_path, args.codec)
+
+    if args.command == "migrate": migrate(store, args.html_path, args.keep)
+
+    if args.command == "gc": collect(store, args.csv_path, args.parquet_path, args.sqlite_path, args.dry_run)
+
+    stats(store)
+
+    store.close()
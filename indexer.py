@@ -0,0 +1,159 @@
+import os
+import csv
+import time
+import hashlib
+import argparse
+from typing import Optional
+
+from merger import BibleVerse, iter_csv, get_csv_files
+from utils import SearchIndex, get_html_verses, get_text_verses, read_chapter_html, INDEX_PATH, BLOBS_PATH
+
+VERSES_PATH = "./data/verses/"
+
+PARSER = argparse.ArgumentParser(description="Builds and searches the full-text index of the scraped chapters")
+
+PARSER.add_argument("-csv", "--csv_path", type=str, default="./data/csv/")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-vp", "--verses_path", type=str, default=VERSES_PATH)
+
+PARSER.add_argument("-bp", "--blobs_path", type=str, default=BLOBS_PATH)
+
+PARSER.add_argument("-idx", "--index_path", type=str, default=INDEX_PATH)
+
+PARSER.add_argument("-q", "--query", type=str, nargs="+")
+
+PARSER.add_argument("-v", "--versions", type=str, nargs="+")
+
+PARSER.add_argument("-l", "--limit", type=int, default=20)
+
+PARSER.add_argument("-c", "--compact", action="store_true")
+
+def get_latest_chapters(csv_path: str) -> dict[str, list[tuple[str, BibleVerse]]]:
+    """Returns the rows of every version and the file they are from, the newest snapshot of each chapter like the merger"""
+    latest_verses: dict[tuple[str, str, int], tuple[str, BibleVerse]] = {}
+
+    for file_name in get_csv_files(csv_path):
+        for verse in iter_csv(f"{csv_path}{file_name}"):
+            latest_verses[(verse.version_id, verse.book, verse.chapter)] = file_name, verse
+
+    versions: dict[str, list[tuple[str, BibleVerse]]] = {}
+
+    [versions.setdefault(version_id, []).append(row) for (version_id, _, _), row in latest_verses.items()]
+
+    return versions
+
+def read_verse_output(file_path: str) -> dict[tuple[str, int], list[tuple[int, str]]]:
+    """Returns the verses of each (book, chapter) of a verse level output file (--verses), nothing if there is none"""
+    verses: dict[tuple[str, int], list[tuple[int, str]]] = {}
+
+    if not os.path.exists(file_path): return verses
+
+    with open(file_path, encoding="utf-8", newline="") as file:
+        [verses.setdefault((row["Book"], int(row["Chapter"])), []).append((int(row["Verse"]), row["Content"]))
+         for row in csv.DictReader(file)]
+
+    return verses
+
+class ChapterReader:
+    """Reads the verses of the chapters of a version: from the verse spans of their html, or from the verse
+    level output saved with their text, whose verse numbers can't be told from numbers in the text"""
+    def __init__(self, html_path: str, verses_path: str, blobs_path: Optional[str]=BLOBS_PATH) -> None:
+        self.html_path = html_path
+        self.verses_path = verses_path
+        self.blobs_path = blobs_path
+        self.verse_outputs: dict[str, dict[tuple[str, int], list[tuple[int, str]]]] = {}
+
+    def read(self, file_name: str, verse: BibleVerse) -> Optional[tuple[str, bool, list[tuple[int, str]]]]:
+        """Returns the html or text of a chapter, if it is html and its verses. None if its html is missing"""
+        source = read_source(verse, self.html_path, self.blobs_path)
+
+        if source is None: return
+
+        text, is_html = source
+
+        if is_html: return text, is_html, get_html_verses(text)
+
+        if file_name not in self.verse_outputs:
+            self.verse_outputs[file_name] = read_verse_output(f"{self.verses_path}{file_name}")
+
+        return text, is_html, get_text_verses(text, self.verse_outputs[file_name].get((verse.book, verse.chapter)))
+
+def read_source(verse: BibleVerse, html_path: str, blobs_path: Optional[str]=BLOBS_PATH) -> Optional[tuple[str, bool]]:
+    """Returns the html or text a chapter was saved as and if it is html, None if its html is missing"""
+    content = verse.content or ""
+
+    if not content.endswith(".html"): return content, False
+
+    try:
+        return read_chapter_html(f"{html_path}{content}", blobs_path), True
+    except FileNotFoundError:
+        return
+
+def update_version(index: SearchIndex, version_id: str, verses: list[tuple[str, BibleVerse]], 
+                   reader: ChapterReader) -> tuple[int, int]:
+    """Indexes the chapters of a version whose source changed since they were indexed.
+    Returns the chapters and the verses indexed"""
+    version_index = index.open(version_id)
+
+    hashes, chapters = version_index.get_hashes(), []
+
+    for file_name, verse in verses:
+        source = reader.read(file_name, verse)
+
+        if source is None:
+            print(f"Skipping {verse.book} {verse.chapter} ({version_id}), {verse.content} not found")
+
+            continue
+
+        text, _, chapter_verses = source
+
+        source_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+        if hashes.get((verse.book, verse.chapter)) == source_hash: continue
+
+        chapters.append((verse.book, verse.chapter, source_hash, chapter_verses))
+
+    return len(chapters), version_index.update(chapters)
+
+def update(csv_path: str, html_path: str, index_path: Optional[str]=INDEX_PATH, compact: Optional[bool]=False,
+           verses_path: Optional[str]=VERSES_PATH, blobs_path: Optional[str]=BLOBS_PATH) -> None:
+    """Brings the index up to date with the csv files, only the new or changed chapters are indexed"""
+    started, index = time.perf_counter(), SearchIndex(index_path)
+
+    for version_id, verses in get_latest_chapters(csv_path).items():
+        chapters, indexed = update_version(index, version_id, verses, ChapterReader(html_path, verses_path, blobs_path))
+
+        if compact: index.open(version_id).compact()
+
+        print(f"{version_id}: {chapters} chapters ({indexed} verses) indexed, {len(verses) - chapters} unchanged")
+
+    index.close()
+
+    print(f"Index updated in {time.perf_counter() - started:.1f}s")
+
+def search(query: str, version_ids: Optional[list[str]]=None, limit: Optional[int]=20,
+           index_path: Optional[str]=INDEX_PATH) -> None:
+    """Prints the verses matching the query"""
+    index = SearchIndex(index_path)
+
+    started = time.perf_counter()
+
+    total, hits = index.search(query, version_ids, limit)
+
+    elapsed = time.perf_counter() - started
+
+    [print(f"{hit.key} ({hit.version_id}) {hit.book} {hit.chapter}:{hit.verse} {hit.text}") for hit in hits]
+
+    print(f"{total} verses found in {elapsed * 1000:.1f}ms" + (f", showing the first {len(hits)}" if total > len(hits) else ""))
+
+    index.close()
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    if args.query:
+        search(" ".join(args.query), args.versions, args.limit, args.index_path)
+    else:
+        update(args.csv_path, args.html_path, args.index_path, args.compact, args.verses_path, args.blobs_path)
@@ -1,24 +1,49 @@
-import eventlet
-
-eventlet.monkey_patch(thread=True, socket=True)
+from __future__ import annotations
 
 import os
-import re
+import sys
 import json
+import time
+import socket
+import asyncio
+import itertools
 import argparse
 import threading
+import subprocess
 import dataclasses
 import configparser
-from queue import Queue
+from queue import Queue, PriorityQueue
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
 from datetime import date
 from typing import Optional, Tuple
 
 import requests
-import pandas as pd
-from bs4 import BeautifulSoup, ResultSet, Tag
 from requests.adapters import HTTPAdapter, Retry
 
-from utils import Logger, VERSIONS, BOOKS
+from utils import (Logger, VERSIONS, ResponseCache, CachedResponse, CACHE_PATH, 
+                   Manifest, PARSER_BACKENDS, Writer, 
+                   CsvSink, ParquetSink, SqliteSink, SINKS, FSYNC_POLICIES, Metrics, 
+                   profile, METRICS_PATH, TokenBucket, ConcurrencyLimiter, get_backoff, 
+                   parse_retry_after, get_reference_table, parse_reference, BlobStore, 
+                   BLOBS_PATH, CODECS, JobQueue, Job, FinishedJob, JOBS_PATH, ChapterExtractor, 
+                   ExtractedChapter, ParseWorker)
+
+eventlet = None
+
+def patch_thread_engine() -> None:
+    """Loads eventlet and patches the sockets and threads for the green threads of the thread engine. 
+    Called by the entry point once the engine is known, before the scraper is created. 
+    The async engine runs on the unpatched interpreter and never loads it"""
+    global eventlet
+
+    if eventlet is not None: return
+
+    os.environ.setdefault("EVENTLET_NO_GREENDNS", "yes")
+
+    import eventlet
+
+    eventlet.monkey_patch(thread=True, socket=True)
 
 config = configparser.ConfigParser()
 
@@ -28,12 +53,106 @@ with open("./settings/settings.ini", "r") as file:
 with open("./settings/settings.json", "r") as file:
     TAG_SETTINGS = json.load(file)
 
+with open("./settings/options-order.json", "r") as file:
+    VERSIONS_ORDER: list[str] = json.load(file)
+
 VERSION = config.get("version to scrape", "version_id")
 
+VERSION_IDS = [version_id.strip() for version_id in VERSION.split(",") if version_id.strip()]
+
 THREAD_NUM = 20
 
+ENGINE = config.get("scraper", "engine", fallback="thread")
+
+MAX_IN_FLIGHT = config.getint("scraper", "max_in_flight", fallback=100)
+
+BATCH_SIZE = config.getint("scraper", "batch_size", fallback=1)
+
+URL = config.get("scraper", "url", fallback="https://www.biblegateway.com/passage")
+
+REQUESTS_PER_SECOND = config.getfloat("scraper", "requests_per_second", fallback=20.0)
+
+MAX_RETRIES = config.getint("scraper", "max_retries", fallback=5)
+
+BACKOFF_BASE = config.getfloat("scraper", "backoff_base", fallback=0.5)
+
+BACKOFF_CAP = config.getfloat("scraper", "backoff_cap", fallback=30.0)
+
+REQUEST_TIMEOUT = config.getfloat("scraper", "request_timeout", fallback=10.0)
+
+LATENCY_FACTOR = config.getfloat("scraper", "latency_factor", fallback=3.0)
+
+RETRY_STATUSES = [408, 429]
+
+CACHE_MODES = ["off", "offline", "revalidate", "refresh"]
+
+CACHE_MODE = config.get("cache", "mode", fallback="off")
+
+CACHE_MAX_SIZE = config.getint("cache", "max_size_mb", fallback=512) * 1024 * 1024
+
+PARSER_BACKEND = config.get("parser", "backend", fallback="html.parser")
+
+PASSAGE_ONLY = config.getboolean("parser", "passage_only", fallback=False)
+
+STREAMING = config.getboolean("parser", "streaming", fallback=True)
+
+def get_process_count(value: str) -> int:
+    """Returns the number of parse processes of a setting. "auto" is one per core, 
+    none (parse in the fetchers) on a single core where they can't run in parallel"""
+    if value != "auto": return int(value)
+
+    return os.cpu_count() if (os.cpu_count() or 1) > 1 else 0
+
+PARSE_PROCESSES = get_process_count(config.get("parser", "processes", fallback="0"))
+
+PARSE_QUEUE_SIZE = config.getint("parser", "queue_size", fallback=100)
+
+PARSE_TIMEOUT = config.getfloat("parser", "timeout", fallback=60.0)
+
+WRITER_BATCH_SIZE = config.getint("writer", "batch_size", fallback=100)
+
+WRITER_FLUSH_INTERVAL = config.getfloat("writer", "flush_interval", fallback=5.0)
+
+WRITER_FSYNC = config.get("writer", "fsync", fallback="close")
+
+WRITER_QUEUE_SIZE = config.getint("writer", "queue_size", fallback=1000)
+
+WRITER_SINKS = [sink.strip() for sink in config.get("writer", "sinks", fallback="csv").split(",") if sink.strip()]
+
+PARQUET_PATH = config.get("writer", "parquet_path", fallback="./data/parquet/")
+
+SQLITE_PATH = config.get("writer", "sqlite_path", fallback="./data/scraped.db")
+
+INLINE_HTML = config.getboolean("writer", "inline_html", fallback=False)
+
+HTML_STORES = ["files", "blobs"]
+
+HTML_STORE = config.get("writer", "html_store", fallback="files")
+
+HTML_COMPRESSION = config.get("writer", "html_compression", fallback="gzip")
+
+HTML_BLOBS_PATH = config.get("writer", "blobs_path", fallback=BLOBS_PATH)
+
+JOB_QUEUE_PATH = config.get("jobs", "path", fallback=JOBS_PATH)
+
+LEASE_SECONDS = config.getfloat("jobs", "lease_seconds", fallback=60.0)
+
+LEASE_ATTEMPTS = config.getint("jobs", "max_attempts", fallback=3)
+
+JOB_IDLE_TIMEOUT = config.getfloat("jobs", "idle_timeout", fallback=30.0)
+
+JOB_POLL_INTERVAL = 0.2
+
+JOB_PAGE_SIZE = 100
+
+PROGRESS_INTERVAL = config.getfloat("logging", "progress_interval", fallback=5.0)
+
 OUTPUT_PATH = "./data/csv/"
 
+HTML_OUTPUT_PATH = "./data/html/"
+
+VERSE_OUTPUT_PATH = "./data/verses/"
+
 PARSER = argparse.ArgumentParser(description="Html scraping decision")
 
 COLUMN_MAPPINGS = {
@@ -45,6 +164,15 @@ COLUMN_MAPPINGS = {
     "content": "Content"
 }
 
+VERSE_COLUMN_MAPPINGS = {
+    "version": "Version",
+    "version_id": "ID",
+    "book": "Book",
+    "chapter": "Chapter",
+    "verse": "Verse",
+    "content": "Content"
+}
+
 HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
     "Accept-Language": "en-US,en;q=0.9",
@@ -53,9 +181,19 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
 
-URL = "https://www.biblegateway.com/passage"
+class RequestFailed(Exception):
+    """A request that didn't return the page. Timeouts, errors, 408, 429 and 5xx are retried"""
+    def __init__(self, reason: str, retryable: Optional[bool]=True, retry_after: Optional[float]=None) -> None:
+        super().__init__(reason)
 
-pd.set_option('display.max_colwidth', None)
+        self.reason = reason
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_status(cls, status: int, headers: dict[str, str]) -> "RequestFailed":
+        return cls(str(status), status in RETRY_STATUSES or status >= 500, 
+                   parse_retry_after(headers.get("Retry-After")))
 
 @dataclasses.dataclass
 class BibleVerse:
@@ -66,184 +204,420 @@ class BibleVerse:
     chapter_title: Optional[str] = None
     content: Optional[str] = None
 
+@dataclasses.dataclass
+class VerseRecord:
+    version: str
+    version_id: str
+    book: str
+    chapter: int
+    verse: int
+    content: str
+
+def get_worker_id() -> str:
+    """Returns the id of the worker run by this process"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+@dataclasses.dataclass
+class ScraperOptions:
+    """The options of a scraper run, the defaults are the ones of settings.ini"""
+    include_html: bool = True
+    engine: str = ENGINE
+    max_in_flight: int = MAX_IN_FLIGHT
+    version_ids: Optional[list[str]] = None
+    batch_size: int = BATCH_SIZE
+    cache_mode: str = CACHE_MODE
+    only_missing: bool = False
+    parser_backend: str = PARSER_BACKEND
+    passage_only: bool = PASSAGE_ONLY
+    verse_output: bool = False
+    fsync: str = WRITER_FSYNC
+    sinks: Optional[list[str]] = None
+    inline_html: bool = INLINE_HTML
+    url: str = URL
+    requests_per_second: float = REQUESTS_PER_SECOND
+    max_retries: int = MAX_RETRIES
+    html_store: str = HTML_STORE
+    html_compression: str = HTML_COMPRESSION
+    blobs_path: str = HTML_BLOBS_PATH
+    parse_processes: int = PARSE_PROCESSES
+    parse_queue_size: int = PARSE_QUEUE_SIZE
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> ScraperOptions:
+        return cls(args.html, args.engine, args.max_in_flight, args.versions, args.batch_size, args.cache, 
+                   args.only_missing, args.parser, args.passage_only, args.verses, args.fsync, args.sinks, 
+                   args.inline_html, args.url, args.requests_per_second, args.max_retries, args.html_store, 
+                   args.html_compression, args.blobs_path, args.parse_processes, args.parse_queue_size)
+
 class BibleGatewayScraper:
-    """Scrapes biblical scriptures from https://www.biblegateway.com/"""
-    def __init__(self, include_html: Optional[bool]=True) -> None:
-        self.logger = Logger(__class__.__name__)
+    """Scrapes biblical scriptures from https://www.biblegateway.com/.
+    The thread engine needs the green threads patched in first, see patch_thread_engine"""
+    def __init__(self, options: Optional[ScraperOptions]=None) -> None:
+        options = ScraperOptions() if options is None else options
+
+        if options.engine != "async" and eventlet is None:
+            raise RuntimeError("patch_thread_engine() must be called before starting the thread engine")
+
+        self.logger = Logger(__class__.__name__, PROGRESS_INTERVAL)
+        self.metrics = Metrics("scraper")
         self.logger.info("{:*^50}".format(f"{__class__.__name__} Started"))
 
-        self.queue = Queue()
+        self.queue = PriorityQueue()
         self.save_queue = Queue()
         self.session = requests.Session()
         
-        self.verses = []
         self.verses_found = 0
-        self.headers_added = []
-        self.file_saving = False
-        self.include_html = include_html
+        self.include_html = options.include_html
+        self.engine = options.engine
+        self.max_in_flight = options.max_in_flight
+        self.batch_size = max(options.batch_size, 1)
+        self.cache_mode = options.cache_mode
+        self.cache = ResponseCache(CACHE_PATH, CACHE_MAX_SIZE) if self.cache_mode != "off" else None
+        self.only_missing = options.only_missing
+        self.manifest = Manifest()
+        self.completed = set()
+        self.content_hashes = {}
+        self.parser_backend = options.parser_backend
+        self.passage_only = options.passage_only
+        self.verse_output = options.verse_output
+        self.verse_records = {}
+        self.fsync = options.fsync
+        self.sinks = WRITER_SINKS if not options.sinks else options.sinks
+        self.inline_html = options.inline_html
+        self.blobs_path = options.blobs_path
+        self.blobs = BlobStore(self.blobs_path, options.html_compression) if self.include_html and options.html_store == "blobs" else None
+        self.url = options.url
+        self.max_retries = max(options.max_retries, 0)
+        self.bucket = TokenBucket(options.requests_per_second)
+        self.limiter = ConcurrencyLimiter(self.max_in_flight if self.engine == "async" else min(self.max_in_flight, THREAD_NUM), 
+                                          latency_factor=LATENCY_FACTOR)
+        self.dead_letters = []
+        self.writer = None
+        self.jobs = None
+        self.worker_id = None
+        self.job_html = {}
+        self.claimed = 0
+        self.assembling = {}
+        self.jobs_seen = False
+        self.stopping = threading.Event()
+        self.extractor = ChapterExtractor(**self.__get_extractor_options())
+        self.parse_processes = max(options.parse_processes, 0)
+        self.parse_queue_size = max(options.parse_queue_size, 1)
+        self.parse_queue = None
+        self.parse_executor = None
+        self.parsers = []
+        self.versions = self.__get_versions(VERSION_IDS if not options.version_ids else options.version_ids)
+        self.sequence = itertools.count()
+        self.remaining = Counter()
+        self.crawled = 0
+        self.lock = threading.Lock()
+        self.sizes = {}
+        self.book_sizes = {}
+        self.book_estimates = {}
+        self.verse_size = 1.0
+        self.chapter_sizes = {}
         self.__file_name = f"{date.today()}.csv"
         self.__html_filename = f"{date.today()}.html"
     
-    def __process_request(self, s: requests.Session, params: dict[str, str]) -> Optional[BeautifulSoup]:
-        """Make a request to the website and return BeautifulSoup object of the response"""
+    def __get_cached(self, params: dict[str, str]) -> Optional[CachedResponse]:
+        """Returns the cached response to replay or revalidate, if any"""
+        if self.cache_mode in ["offline", "revalidate"]:
+            return self.cache.get(params)
+
+    def __replay(self, params: dict[str, str], cached: Optional[CachedResponse]) -> str:
+        """Returns the cached response without touching the network. Misses give an empty page"""
+        if cached is None:
+            self.logger.warn(f"{params['search']} ({params['version']}) not found in cache")
+
+            return ""
+
+        return cached.text
+
+    @staticmethod
+    def __get_request_headers(cached: Optional[CachedResponse]) -> dict[str, str]:
+        """Returns the request headers, made conditional when a cached response is available"""
+        headers = dict(HEADERS)
+
+        if cached is not None and cached.etag: headers["If-None-Match"] = cached.etag
+
+        if cached is not None and cached.last_modified: headers["If-Modified-Since"] = cached.last_modified
+
+        return headers
+
+    def __cache_response(self, params: dict[str, str], text: str, headers: dict[str, str]) -> None:
+        """Stores the response body together with its validators"""
+        if self.cache is None: return
+
+        self.cache.put(params, text, headers.get("ETag"), headers.get("Last-Modified"))
+
+    def __process_request(self, s: requests.Session, params: dict[str, str]) -> str:
+        """Make a request to the website and return the page.
+        Raises RequestFailed when the response isn't ok"""
+        cached = self.__get_cached(params)
+
+        if self.cache_mode == "offline": return self.__replay(params, cached)
         
         with eventlet.Timeout(30):
-            response = s.get(URL, headers=HEADERS, params=params, timeout=3)
+            with self.metrics.timer("fetch"):
+                response = s.get(self.url, headers=self.__get_request_headers(cached), params=params, 
+                                 timeout=REQUEST_TIMEOUT)
 
-            if response.ok:
-                return BeautifulSoup(response.text, "html.parser")
-    
-    @staticmethod
-    def __get_book(book: str) -> Optional[Tuple[str, int]]:
-        """Gets the search term corresponding to a given biblical book"""
-        for book_dict in BOOKS["books"]["AMP"]:
-            if re.search(book, book_dict["display"], re.I):
-                return book_dict["display"], book_dict["num_chapters"]
+            self.metrics.increment("requests", status=response.status_code)
+
+            self.metrics.increment("bytes_downloaded", len(response.content))
+
+            if response.status_code == 304 and cached is not None: return cached.text
+
+            if not response.ok: raise RequestFailed.from_status(response.status_code, response.headers)
+
+            self.__cache_response(params, response.text, response.headers)
+
+            return response.text
     
-    @staticmethod
-    def __get_books() -> dict[str, int]:
-        """Gets the search term corresponding to a given biblical book"""
-        return {book_dict["display"]: book_dict["num_chapters"]
-                for book_dict in BOOKS["books"]["AMP"]}
+    async def __process_request_async(self, client: aiohttp.ClientSession, 
+                                      params: dict[str, str]) -> str:
+        """Make a request using the shared async client and return the page.
+        Raises RequestFailed when the response isn't ok"""
+        cached = self.__get_cached(params)
+
+        if self.cache_mode == "offline": return self.__replay(params, cached)
+
+        started = time.perf_counter()
+
+        async with client.get(self.url, headers=self.__get_request_headers(cached), params=params) as response:
+            self.metrics.increment("bytes_downloaded", len(await response.read()))
+
+            self.metrics.observe("fetch", time.perf_counter() - started)
+
+            self.metrics.increment("requests", status=response.status)
+
+            if response.status == 304 and cached is not None: return cached.text
+
+            if not response.ok: raise RequestFailed.from_status(response.status, response.headers)
+
+            encoding = requests.utils.get_encoding_from_headers(response.headers)
+
+            text = await response.text(encoding=encoding)
+
+            self.__cache_response(params, text, response.headers)
+
+            return text
     
-    @staticmethod
-    def __get_verse_text(span_tags: ResultSet[BeautifulSoup], verse: str) -> str:
-        for span_tag in span_tags:
-            cross_reference = span_tag.select_one("sup.crossreference")
+    def __retry_delay(self, attempt: int, failure: RequestFailed) -> float:
+        """Counts the retry and returns the seconds to wait before it, at least what Retry-After asks"""
+        self.metrics.increment("retries", reason=failure.reason)
 
-            if cross_reference is not None:
-                cross_reference.decompose()
-            
-            verse_num = ""
+        return max(get_backoff(attempt, BACKOFF_BASE, BACKOFF_CAP), failure.retry_after or 0)
 
-            verse_num_tag = span_tag.select_one("sup.versenum")
+    def __fetch(self, s: requests.Session, params: dict[str, str]) -> Tuple[Optional[str], Optional[str]]:
+        """Requests a page within the concurrency limit and the requests per second. Retries timeouts, 
+        errors, 429s and 5xx up to max_retries times. Returns the page, or None and why it failed"""
+        if self.cache_mode == "offline": return self.__process_request(s, params), None
 
-            if verse_num_tag is not None:
-                verse_num = verse_num_tag.get_text(strip=True) + " "
+        for attempt in range(self.max_retries + 1):
+            while (delay := self.limiter.acquire()): eventlet.sleep(delay)
 
-                verse_num_tag.decompose()
-            
-            verse += verse_num + span_tag.get_text().strip().replace("\n", "") + " "
+            eventlet.sleep(self.bucket.reserve())
 
-            while "  " in verse: verse = verse.replace("  ", " ")
-        
-        return verse
+            started, failure = time.perf_counter(), None
+
+            try:
+                response = self.__process_request(s, params)
+
+            except RequestFailed as e: failure = e
+
+            except eventlet.timeout.Timeout: failure = RequestFailed("timeout")
+
+            except Exception: failure = RequestFailed("error")
+
+            self.limiter.release(time.perf_counter() - started, failure is not None and failure.retryable, 
+                                 failure and failure.retry_after)
+
+            if failure is None: return response, None
+
+            if not failure.retryable or attempt == self.max_retries: return None, failure.reason
+
+            eventlet.sleep(self.__retry_delay(attempt, failure))
+
+    async def __fetch_async(self, client: aiohttp.ClientSession, 
+                            params: dict[str, str]) -> Tuple[Optional[str], Optional[str]]:
+        """Async version of __fetch"""
+        import aiohttp
+
+        if self.cache_mode == "offline": return await self.__process_request_async(client, params), None
+
+        for attempt in range(self.max_retries + 1):
+            while (delay := self.limiter.acquire()): await asyncio.sleep(delay)
+
+            await asyncio.sleep(self.bucket.reserve())
+
+            started, failure = time.perf_counter(), None
+
+            try:
+                response = await self.__process_request_async(client, params)
 
-    def __extract_data(self, soup: BeautifulSoup, verse: BibleVerse, abbr: str) -> None:
-        """Extracts the chapter title, content, and html"""
-        passage_tag = soup.select_one("div.passage-text")
+            except RequestFailed as e: failure = e
 
-        if passage_tag is None: return
+            except asyncio.TimeoutError: failure = RequestFailed("timeout")
 
-        header_tag = passage_tag.select_one("h3")
+            except aiohttp.ClientError: failure = RequestFailed("error")
 
-        chapter_title = header_tag.get_text(strip=True) if header_tag else None
+            self.limiter.release(time.perf_counter() - started, failure is not None and failure.retryable, 
+                                 failure and failure.retry_after)
 
-        if chapter_title is not None:
-            chapter_title = chapter_title.encode("ascii", errors="ignore").decode()
+            if failure is None: return response, None
 
-        verse.chapter_title = chapter_title
+            if not failure.retryable or attempt == self.max_retries: return None, failure.reason
+
+            await asyncio.sleep(self.__retry_delay(attempt, failure))
+
+    @staticmethod
+    def __get_books() -> dict[str, range]:
+        """Gets the search term and the chapters of every biblical book"""
+        return {book.name: range(1, book.num_chapters + 1) for book in get_reference_table().books}
+    
+    def __extract_data(self, extracted: ExtractedChapter, verse: BibleVerse, abbr: str) -> None:
+        """Fills in the chapter title and content of an extracted chapter, saving its html"""
+        if extracted.content is None: return
+
+        verse.chapter_title = extracted.title
+
+        [self.logger.count(message) for message in extracted.not_found]
+
+        if self.verse_output:
+            self.verse_records[(abbr, verse.book, verse.chapter)] = [
+                VerseRecord(verse.version, verse.version_id, verse.book, verse.chapter, verse_number, text)
+                for verse_number, text in extracted.verses]
+
+        content = extracted.content
 
         if self.include_html:
             book_fmt = '_'.join(verse.book.split(" "))
-            html_file_name = f"./data/html/{abbr}_{book_fmt}_{verse.chapter}_{self.__html_filename}"
-            content = passage_tag.select_one("div.text-html")
+            html_file_name = f"{HTML_OUTPUT_PATH}{abbr}_{book_fmt}_{verse.chapter}_{self.__html_filename}"
+            content = html_file_name.split("/")[-1]
+
+            if self.worker_id is not None: self.job_html[(abbr, verse.book, verse.chapter)] = extracted.content
+            elif self.blobs is not None: self.blobs.put(extracted.content, content)
+            else:
+                with open(html_file_name, "w", encoding="utf-8") as file:
+                    file.write(extracted.content)
 
-            self.__process_html(content)
+        verse.content = content.encode("ascii", errors="ignore").decode()
 
-            with open(html_file_name, "w", encoding="utf-8") as file:
-                file.write(content.__repr__())
+        self.content_hashes[(abbr, verse.book, verse.chapter)] = extracted.content_hash
 
-                content = html_file_name.split("/")[-1]
-        else:
-            chapter_tag = passage_tag.select_one("span.chapternum")
+        key = (verse.book, verse.chapter)
 
-            if chapter_tag: chapter_tag.decompose()
+        self.chapter_sizes[key] = max(self.chapter_sizes.get(key, 0), len(extracted.content))
+    
+    def __get_versions(self, version_ids: list[str]) -> list[Tuple[str, str]]:
+        """Gets the (version, version id) pairs to scrape. "all" uses the merger's options order"""
+        if [version_id.lower() for version_id in version_ids] == ["all"]:
+            version_names = {value: key for key, value in VERSIONS.items()}
 
-            content = ""
+            return [(version_names[version_id], version_id) 
+                    for version_id in VERSIONS_ORDER if version_id in version_names]
 
-            for paragraph in passage_tag.select("p"):
-                span_tags = paragraph.select("span.text")
+        versions = {value.casefold(): (key, value) for key, value in VERSIONS.items()}
 
-                content = self.__get_verse_text(span_tags, content)
+        unknown = [version_id for version_id in version_ids if version_id.casefold() not in versions]
+
+        if unknown:
+            self.logger.error(f"Couldn't find the versions <{', '.join(unknown)}> specified in settings!", True)
+
+        items = []
+
+        [items.append(versions[version_id.casefold()]) for version_id in version_ids 
+         if versions[version_id.casefold()] not in items]
+
+        return items
+
+    def __get_batches(self, chapters: list[int]) -> list[range]:
+        """Groups consecutive chapters into ranges of at most batch_size chapters"""
+        batches: list[range] = []
+
+        for chapter in chapters:
+            if batches and batches[-1].stop == chapter and len(batches[-1]) < self.batch_size:
+                batches[-1] = range(batches[-1].start, chapter + 1)
+            else:
+                batches.append(range(chapter, chapter + 1))
         
-        verse.content = content.encode("ascii", errors="ignore").decode()
-    
-    def __process_html(self, html: Tag) -> str:
-        for tag in TAG_SETTINGS:
-            soup_tags: ResultSet[Tag] = []
-
-            if tag["tag"] == html.name: soup_tags.append(html)
-            
-            soup_tags.extend(html.select(tag["tag"]))
-
-            found, tag_found = False, False
-                
-            for html_tag in soup_tags:
-                if not len(tag["attrs"]): found = True
-                
-                for attr, value in tag["attrs"].items():
-                    if not html_tag.attrs.get(attr): continue
-
-                    if "changeAttrWildcard" in tag["actions"] and "(.*)" in value:
-                        wildcard_re = re.search(rf"{value}", ' '.join(html_tag.attrs[attr]), re.I)
-
-                        if wildcard_re:
-                            tag_found, wildcard = True, wildcard_re.group(1)
-                        
-                            for new_attr, new_value in tag["attrsToChange"].items():
-                                html_tag.attrs[new_attr] = new_value.format(wildcard)
-
-                    for val in value.split(" "):
-                        found = False
-
-                        found = True if  val in html_tag.attrs[attr] else found
-
-                        if not found: break
-                                                
-                if found: 
-                    tag_found = True
-                    
-                    if "remove" in tag["actions"]:
-                        html_tag.decompose()
-
-                        continue
-                    elif "stripTags" in tag["actions"]:
-                        html_tag.unwrap()
-
-                        continue
-                    
-                    if "changeAttrs" in tag["actions"]:
-                        for new_attr, new_value in tag["attrsToChange"].items():
-                            html_tag.attrs[new_attr] = new_value
-                    
-                    if "rename" in tag["actions"]:
-                        html_tag.name = tag["newTagName"]
-                    
-                    if "removeAttr" in tag["actions"]:
-                        html_tag.attrs = {k:v for k, v in html_tag.attrs.items() 
-                                            if not k in tag["attrsToRemove"]}
-            
-            if not tag_found: 
-                self.logger.warn(f"{tag['tag']} {tag['attrs']} not found")
-
-    def __create_work(self, book: str, bible_verses: list, __file_name: str, chapters: int) -> None:
-        """Creates work to be done by threads"""
-        items = None
-
-        for key, value in VERSIONS.items():
-            if re.search(rf"{VERSION}", value, re.I):
-                items = [(key, value)]
+        return batches
 
-                break
+    def __get_work_items(self, book: str, bible_verses: list, 
+                         __file_name: str, chapters: range) -> list[tuple]:
+        """Returns the work items for every (version, chapter) of the book not yet completed. 
+        Chapters are grouped into ranges when batching is on"""
+        items = []
+
+        for v, v_id in self.versions:
+            missing = [n for n in chapters if not (v_id, book, n) in self.completed]
+
+            items.extend((book, bible_verses, __file_name, v, v_id, batch if len(batch) > 1 else batch.start) 
+                         for batch in self.__get_batches(missing))
 
-        if items is None:
-            self.logger.error("Couldn't find the version specified in settings!", True)
+        return sorted(items, key=lambda item: item[-1].start if isinstance(item[-1], range) else item[-1])
 
-        [self.queue.put((book, bible_verses, __file_name, v, v_id, n + 1)) 
-         for n in range(chapters) for v, v_id in items]
+    def __get_size(self, book: str, chapter: int) -> float:
+        """Returns the size of a chapter seen by the previous runs, the average of its book if unknown.
+        Books never seen are estimated from their average verses per chapter, so a first run also starts with 
+        the longest books. It is a book-level heuristic: the chapters of such a book all get the same estimate 
+        and keep their reference order"""
+        if (book, chapter) in self.sizes: return self.sizes[(book, chapter)]
 
-        self.queue.join() 
+        return self.book_sizes.get(book, self.book_estimates.get(book, 0) * self.verse_size)
+
+    def __prioritize(self, item: tuple) -> tuple:
+        """Returns the (priority, sequence, item) of a work item, the longest chapters come first.
+        Ties keep the order the items were scheduled in"""
+        book, chapter = item[0], item[-1]
+
+        size = sum(self.__get_size(book, c) for c in (chapter if isinstance(chapter, range) else [chapter]))
+
+        return -size, next(self.sequence), item
+
+    def __schedule(self, books: dict[str, range]) -> list[tuple]:
+        """Returns the prioritized work items of every book, to be run on one worker pool"""
+        self.sizes = self.manifest.get_sizes()
+
+        sizes_by_book = {}
+
+        [sizes_by_book.setdefault(book, []).append(size) for (book, _), size in self.sizes.items()]
+
+        self.book_sizes = {book: sum(sizes) / len(sizes) for book, sizes in sizes_by_book.items()}
+
+        self.book_estimates = {book.name: book.num_verses / book.num_chapters for book in get_reference_table().books}
+
+        # The size of a verse, from the chapters seen, so the estimates compare with the sizes measured
+        verses = sum(self.book_estimates.get(book, 0) for book, _ in self.sizes)
+
+        self.verse_size = sum(self.sizes.values()) / verses if verses else 1.0
+
+        items = []
+
+        for book, chapters in books.items():
+            book_items = self.__get_work_items(book, [], self.__file_name, chapters)
+
+            self.remaining[book] = len(book_items)
+
+            if not book_items: self.__finish_book(book)
+
+            items.extend(book_items)
+
+        return [self.__prioritize(item) for item in items]
+
+    def __task_done(self, book: str, chapter: int|range, requeued: int) -> int:
+        """Counts a work item done, finishing its book once none are left. Returns the chapters crawled"""
+        with self.lock:
+            self.remaining[book] += requeued - 1
+
+            self.crawled += 0 if requeued else len(chapter) if isinstance(chapter, range) else 1
+
+            finished, crawled = self.remaining[book] == 0, self.crawled
+
+        if finished: self.__finish_book(book)
+
+        return crawled
 
     @staticmethod
     def __get_session() -> requests.Session:
@@ -258,137 +632,682 @@ class BibleGatewayScraper:
 
         return s         
     
+    @staticmethod
+    def __get_work_params(book: str, version: str, 
+                          version_id: str, chapter: int|range) -> Tuple[dict[str, str], str, str]:
+        """Returns the request params plus the cleaned version name and id for a work item"""
+        if isinstance(chapter, range):
+            params = {"search": f"{book} {chapter.start}-{chapter[-1]}", "version": version_id}
+        else:
+            params = {"search": f"{book} {chapter}", "version": version_id}
+
+        if version_id in version:
+            version = version.split(f"({version_id})")[0].strip()
+        
+        version = version.encode("ascii", errors="ignore").decode()
+
+        version_id = version_id.encode("ascii", errors="ignore").decode()
+
+        return params, version, version_id
+
+    def __handle_response(self, response: str, book: str, bible_verses: list, 
+                          __file_name: str, version: str, version_id: str, chapter: int|range) -> list[tuple]:
+        """Parses and extracts a response in this process, see __handle_extracted"""
+        return self.__handle_extracted(self.extractor.process(response, chapter), book, bible_verses, 
+                                       __file_name, version, version_id, chapter)
+
+    def __handle_extracted(self, extracted: Tuple[Optional[list[ExtractedChapter]], dict[str, float]], 
+                           book: str, bible_verses: list, __file_name: str, version: str, 
+                           version_id: str, chapter: int|range) -> list[tuple]:
+        """Hands the rows of the chapters extracted from a response to the writer. 
+        Returns the single chapter work items to retry when a batch couldn't be split"""
+        chapters, timings = extracted
+
+        [self.metrics.observe(stage, seconds) for stage, seconds in timings.items()]
+
+        if chapters is None:
+            self.logger.warn(f"Failed to split {book} {chapter.start}-{chapter[-1]} ({version_id}). "
+                             "Requesting the chapters one by one")
+
+            return [(book, bible_verses, __file_name, version, version_id, c) for c in chapter]
+
+        for extracted_chapter in chapters:
+            verse = BibleVerse(version=version, version_id=version_id, book=book, chapter=extracted_chapter.chapter)
+
+            self.__extract_data(extracted_chapter, verse, version_id)
+
+            if verse.content is None and self.worker_id is not None:
+                self.jobs.fail(self.worker_id, (version_id, book, verse.chapter), "no passage")
+            elif verse.content is None:
+                self.manifest.mark([(version_id, book, verse.chapter, "failed", None, None)])
+            else: 
+                self.__save(verse)
+
+                self.verses_found += 1
+        
+            bible_verses.append("")
+
+        return []
+
+    def __handle_failure(self, reason: str, book: str, bible_verses: list, __file_name: str, 
+                         version: str, version_id: str, chapter: int|range) -> list[tuple]:
+        """Sends a chapter that failed to the dead letters, marking it as failed in the manifest. 
+        Returns the single chapter work items to retry when a batch failed"""
+        if isinstance(chapter, range):
+            return [(book, bible_verses, __file_name, version, version_id, c) for c in chapter]
+
+        self.metrics.increment("dead_letters", reason=reason)
+
+        if self.worker_id is not None:
+            self.jobs.fail(self.worker_id, (version_id, book, chapter), reason)
+
+            bible_verses.append("")
+
+            return []
+
+        self.manifest.mark([(version_id, book, chapter, "failed", None, None)])
+
+        self.dead_letters.append((version_id, book, chapter, reason))
+
+        bible_verses.append("")
+
+        return []
+
     def __work(self) -> None:
-        """Work to be done by the threads"""
+        """Work to be done by the threads, until they get the None item"""
         s = self.__get_session()
 
         while True:
-            book, bible_verses, __file_name, version, version_id, chapter = self.queue.get()
+            *_, item = self.queue.get()
 
-            params = {"search": f"{book} {chapter}", "version": version_id}
+            if item is None: 
+                self.queue.task_done()
 
-            if version_id in version:
-                version = version.split(f"({version_id})")[0].strip()
-            
-            version = version.encode("ascii", errors="ignore").decode()
+                break
 
-            version_id = version_id.encode("ascii", errors="ignore").decode()
+            book, bible_verses, __file_name, version, version_id, chapter = item
 
-            response = None
+            params, version, version_id = self.__get_work_params(book, version, version_id, chapter)
 
-            while response is None:
-                try:
-                    response = self.__process_request(s, params)
+            response, reason = self.__fetch(s, params)
 
-                except eventlet.timeout.Timeout: pass
+            item = (book, bible_verses, __file_name, version, version_id, chapter)
 
-                except: s = self.__get_session()
+            if response is not None and self.parse_queue is not None:
+                self.parse_queue.put((response, item))
 
-            verse = BibleVerse(version=version, version_id=version_id, book=book, chapter=chapter)
+                continue
 
-            self.__extract_data(response, verse, version_id)
+            requeued = (self.__handle_response(response, *item) if response is not None 
+                        else self.__handle_failure(reason, *item))
 
-            if verse.content is not None: 
-                self.verses.append(verse)
+            self.__finish_item(self.queue, item, requeued)
 
-                self.verses_found += 1
+    async def __work_async(self, client: aiohttp.ClientSession, queue: asyncio.Queue) -> None:
+        """Work to be done by each coroutine of the async engine"""
+        while True:
+            *_, (book, bible_verses, __file_name, version, version_id, chapter) = await queue.get()
 
-                if len(self.verses) % 100 == 0: 
-                    verses = self.verses[:]
+            params, version, version_id = self.__get_work_params(book, version, version_id, chapter)
 
-                    self.__save(verses, __file_name)
+            response, reason = await self.__fetch_async(client, params)
 
-                    [self.verses.remove(i) for i in verses]
+            item = (book, bible_verses, __file_name, version, version_id, chapter)
 
-                    del verses
-            
-            bible_verses.append("")
+            if response is not None and self.parse_queue is not None:
+                await self.parse_queue.put((response, item))
+
+                continue
 
-            self.queue.task_done()
+            requeued = (self.__handle_response(response, *item) if response is not None 
+                        else self.__handle_failure(reason, *item))
 
-            queue, crawled = self.queue.unfinished_tasks, len(bible_verses)
-            
-            self.logger.info(f"Queue: {queue} || Crawled: {crawled} || Verses Found: {self.verses_found}")
+            self.__finish_item(queue, item, requeued)
 
-    def __save(self, bible_verses: list[BibleVerse], __file_name: str) -> None:
-        """Saves data retrieved to an excel file"""
-        while self.file_saving: pass
+    def __finish_item(self, queue: PriorityQueue|asyncio.PriorityQueue, item: tuple, requeued: list[tuple]) -> None:
+        """Queues the work items to retry and counts the item done"""
+        [queue.put_nowait(self.__prioritize(i)) for i in requeued]
 
-        self.file_saving = True
+        crawled = self.__task_done(item[0], item[-1], len(requeued))
 
-        self.logger.info("Saving data retrieved...")
+        queue.task_done()
 
-        results = [dataclasses.asdict(verse) for verse in bible_verses]
+        depth = queue.qsize() if self.engine == "async" else queue.unfinished_tasks
 
-        df = pd.DataFrame(results)
+        self.metrics.sample("queue_depth", depth)
+        
+        self.logger.progress(f"Queue: {depth} || Crawled: {crawled} || Verses Found: {self.verses_found}")
 
-        df.rename(columns=COLUMN_MAPPINGS, inplace=True)
+    def __get_extractor_options(self) -> dict:
+        return {"tag_settings": TAG_SETTINGS, "include_html": self.include_html, "verse_output": self.verse_output, 
+                "parser_backend": self.parser_backend, "passage_only": self.passage_only, "streaming": STREAMING}
 
-        df.sort_values(by=["Chapter"], inplace=True)
+    def __parse_stage(self, parser: ParseWorker) -> None:
+        """Hands the pages queued by the fetchers to a parse worker process and their chapters 
+        to the writer, until it gets the None page. The process runs in a native thread, 
+        so the fetchers keep going while it parses"""
+        from eventlet import tpool
 
-        version_id = df.iloc[0]["ID"]
+        while True:
+            page = self.parse_queue.get()
 
-        file_name = "{}{}_{}".format(OUTPUT_PATH, version_id, __file_name)
+            if page is None: break
 
-        if not __file_name in self.headers_added:
-            df.to_csv(file_name, index=False)
+            response, item = page
 
-            self.headers_added.append(__file_name)
+            requeued = []
 
-        else:
-            df.to_csv(file_name, index=False, header=False, mode="a")
+            try:
+                requeued = self.__handle_parsed(tpool.execute(self.__parse_page, parser, response, item[-1]), *item)
+            except Exception as e:
+                requeued = self.__handle_parse_failure(e, *item)
+            finally:
+                self.__finish_item(self.queue, item, requeued)
+
+    async def __parse_stage_async(self, parser: ParseWorker, queue: asyncio.PriorityQueue) -> None:
+        """Async version of __parse_stage"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            response, item = await self.parse_queue.get()
+
+            requeued = []
+
+            try:
+                requeued = await loop.run_in_executor(self.parse_executor, self.__parse_item, parser, response, item)
+            except Exception as e:
+                requeued = self.__handle_parse_failure(e, *item)
+            finally:
+                self.__finish_item(queue, item, requeued)
+
+    def __parse_page(self, parser: ParseWorker, response: str, chapter: int|range) -> tuple:
+        """Parses a page in a parse worker process, or in this process when the worker fails on it. 
+        Returns what the extractor returns and the worker error. Runs in a native thread, so it doesn't log"""
+        try:
+            return parser.process(response, chapter), None
+        except RuntimeError as e:
+            return self.extractor.process(response, chapter), str(e)
+
+    def __handle_parsed(self, parsed: tuple, *item) -> list[tuple]:
+        """Logs the worker error of a page parsed, see __parse_page, and hands its chapters to the writer"""
+        extracted, error = parsed
+
+        if error is not None: self.logger.warn(f"{error}. Parsed {item[0]} {item[-1]} ({item[4]}) in the scraper")
+
+        return self.__handle_extracted(extracted, *item)
+
+    def __parse_item(self, parser: ParseWorker, response: str, item: tuple) -> list[tuple]:
+        """Parses a page and hands its chapters to the writer, in a thread of the async parse stage 
+        so the writer blocking doesn't block the event loop"""
+        return self.__handle_parsed(self.__parse_page(parser, response, item[-1]), *item)
+
+    def __handle_parse_failure(self, error: Exception, book: str, bible_verses: list, __file_name: str, 
+                               version: str, version_id: str, chapter: int|range) -> list[tuple]:
+        """Sends a page that couldn't be parsed to the dead letters, see __handle_failure"""
+        self.logger.warn(f"Failed to parse {book} {chapter} ({version_id}): {error!r}")
+
+        return self.__handle_failure("parse", book, bible_verses, __file_name, version, version_id, chapter)
+
+    def __start_parsers(self) -> list[ParseWorker]:
+        """Starts the parse worker processes, none to parse in the fetchers"""
+        self.parsers = [ParseWorker(self.__get_extractor_options(), PARSE_TIMEOUT) for _ in range(self.parse_processes)]
+
+        if self.parsers: self.logger.info(f"Parsing on {len(self.parsers)} processes")
+
+        return self.parsers
+
+    def __stop_parsers(self) -> None:
+        [parser.close() for parser in self.parsers]
+
+        self.parsers, self.parse_queue = [], None
+
+    def __start_parse_stage(self) -> list[threading.Thread]:
+        """Starts the parse stage of the thread engine: a thread per parse worker process 
+        taking the pages from a queue of parse_queue_size pages, which blocks the fetchers when full"""
+        if not self.parse_processes: return []
+
+        self.parse_queue = Queue(maxsize=self.parse_queue_size)
+
+        stages = [threading.Thread(target=self.__parse_stage, args=(parser,), daemon=True) 
+                  for parser in self.__start_parsers()]
+
+        [stage.start() for stage in stages]
+
+        return stages
+
+    def __stop_parse_stage(self, stages: list[threading.Thread]) -> None:
+        """Stops the parse stage once the pages queued are parsed"""
+        [self.parse_queue.put(None) for _ in stages]
+
+        [stage.join() for stage in stages]
+
+        self.__stop_parsers()
+
+    def __start_parse_stage_async(self, queue: asyncio.PriorityQueue) -> list[asyncio.Task]:
+        """Async version of __start_parse_stage, the parse workers are waited on from a thread pool"""
+        if not self.parse_processes: return []
+
+        self.parse_queue = asyncio.Queue(maxsize=self.parse_queue_size)
+
+        self.parse_executor = ThreadPoolExecutor(self.parse_processes)
+
+        return [asyncio.create_task(self.__parse_stage_async(parser, queue)) for parser in self.__start_parsers()]
+
+    def __stop_parse_stage_async(self) -> None:
+        if self.parse_executor is not None: self.parse_executor.shutdown()
+
+        self.parse_executor = None
+
+        self.__stop_parsers()
 
-        self.logger.info(f"{len(df)} records saved to {file_name}")
+    def __create_client(self) -> aiohttp.ClientSession:
+        """Returns the keep-alive client shared by the coroutines of the async engine"""
+        import aiohttp
 
-        del df
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
 
-        del results
+        timeout = aiohttp.ClientTimeout(total=30, sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT)
 
-        self.file_saving = False
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def __scrape_books_async(self, books: dict[str, range]) -> None:
+        """Runs the work items of every book on one pool of coroutines sharing a keep-alive client"""
+        async with self.__create_client() as client:
+            queue = asyncio.PriorityQueue()
+
+            [queue.put_nowait(item) for item in self.__schedule(books)]
+
+            workers = [asyncio.create_task(self.__work_async(client, queue)) 
+                       for _ in range(min(self.max_in_flight, queue.qsize()))]
+
+            workers += self.__start_parse_stage_async(queue)
+
+            await queue.join()
+
+            [worker.cancel() for worker in workers]
+
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            self.__stop_parse_stage_async()
+
+    def __save(self, verse: BibleVerse) -> None:
+        """Queues the row of a chapter to the writer, the chapter is marked as done once it is written"""
+        key, row = (verse.version_id, verse.book, verse.chapter), dataclasses.asdict(verse)
+
+        if self.worker_id is not None: return self.__complete_job(key, row)
+
+        if self.verse_output: self.__save_verse_records(self.verse_records.pop(key, []))
+
+        unit = (*key, "done", self.content_hashes.pop(key, None), 
+                f"{HTML_OUTPUT_PATH}{verse.content}" if self.include_html else self.writer.get_path("chapters", row))
+
+        self.writer.put("chapters", row, unit)
     
-    def __scrape_book(self, search_term: str, num_chapters: int) -> None:
-        __file_name = f"{self.__file_name}"
+    def __save_verse_records(self, records: list[VerseRecord]) -> None:
+        """Queues the verse level records of a chapter to the writer, one row per verse"""
+        [self.writer.put("verses", dataclasses.asdict(record)) for record in records]
 
-        bible_verses = []
+    def __mark_saved(self, units: list[tuple]) -> None:
+        """Marks the chapters of a batch written as done, the jobs of a coordinator are removed from the queue"""
+        self.manifest.mark(units)
 
-        [threading.Thread(target=self.__work, 
-                          daemon=True).start() for _ in range(THREAD_NUM)]
-        
-        self.__create_work(search_term, bible_verses, __file_name, num_chapters)
+        if self.jobs is None or self.worker_id is not None: return
 
-        if len(self.verses):
-            self.__save(self.verses, __file_name)
-        
-        self.verses = []
+        self.jobs.remove([unit[:3] for unit in units])
+
+        [self.assembling.pop(unit[:3], None) for unit in units]
+
+    def __get_sinks(self) -> list:
+        """Creates the output sinks, in the order given"""
+        sinks = {
+            "csv": lambda: CsvSink({"chapters": (OUTPUT_PATH, COLUMN_MAPPINGS), 
+                                    "verses": (VERSE_OUTPUT_PATH, VERSE_COLUMN_MAPPINGS)}, 
+                                   self.__file_name, self.fsync, self.only_missing, 
+                                   list(self.__get_books())),
+            "parquet": lambda: ParquetSink(PARQUET_PATH),
+            "sqlite": lambda: SqliteSink(SQLITE_PATH, HTML_OUTPUT_PATH if self.include_html and self.inline_html else None, 
+                                          self.blobs_path)
+        }
+
+        return [sinks[sink]() for sink in self.sinks]
+
+    def __report_dead_letters(self) -> None:
+        """Logs the chapters that failed for good, they are retried by a run with --resume"""
+        if not self.dead_letters: return
+
+        self.logger.warn(f"{len(self.dead_letters)} chapters failed, run again with --resume to retry them:")
+
+        [self.logger.warn(f"{book} {chapter} ({version_id}): {reason}") 
+         for version_id, book, chapter, reason in sorted(self.dead_letters)]
+
+    def __finish_book(self, search_term: str) -> None:
+        """Logs the end of a book, its rows are already on their way to the writer"""
+        self.logger.progress(f"Scraper done scraping all the {search_term} chapters. "
+                             f"Verses Found: {self.verses_found}", True)
+
+    def __scrape_books(self, books: dict[str, range]) -> None:
+        """Runs the work items of every book on one pool of THREAD_NUM threads, 
+        which are stopped once the queue is drained"""
+        workers = [threading.Thread(target=self.__work, daemon=True) for _ in range(THREAD_NUM)]
+
+        [worker.start() for worker in workers]
+
+        stages = self.__start_parse_stage()
+
+        [self.queue.put(item) for item in self.__schedule(books)]
+
+        self.queue.join()
+
+        [self.queue.put((float("inf"), next(self.sequence), None)) for _ in workers]
+
+        [worker.join() for worker in workers]
+
+        self.__stop_parse_stage(stages)
+
+    def __complete_job(self, key: Tuple[str, str, int], row: dict) -> None:
+        """Sends the row of a chapter, with its html and verse rows, back to the job queue"""
+        result = {"row": row, "html": self.job_html.pop(key, None), 
+                  "verses": [dataclasses.asdict(record) for record in self.verse_records.pop(key, [])], 
+                  "content_hash": self.content_hashes.pop(key, None), 
+                  "size": self.chapter_sizes.get(key[1:], 0)}
+
+        if not self.jobs.complete(self.worker_id, key, result):
+            self.logger.warn(f"Lost the lease of {key[1]} {key[2]} ({key[0]}), its result is dropped")
+
+    def __heartbeat(self) -> None:
+        """Renews the leases of the worker until it stops"""
+        while not self.stopping.wait(self.jobs.lease_seconds / 3): self.jobs.heartbeat(self.worker_id)
+
+    def __claim_jobs(self) -> list[tuple]:
+        """Claims jobs while less than twice the concurrency limit are in flight, so the workers 
+        share the queue. Returns their prioritized work items"""
+        jobs = self.jobs.claim(self.worker_id, int(self.limiter.limit) * 2 - (self.claimed - self.crawled))
+
+        self.claimed += len(jobs)
+
+        return [(job.priority, next(self.sequence), 
+                 (job.book, [], self.__file_name, job.version, job.version_id, job.chapter)) for job in jobs]
+
+    def __is_drained(self, started: float, idle_timeout: float) -> bool:
+        """Whether the worker is done: nothing in flight and no job pending or leased. 
+        While the queue is empty the worker waits idle_timeout seconds for jobs to be queued"""
+        if self.claimed > self.crawled: return False
+
+        counts = self.jobs.get_counts()
+
+        if counts["pending"] or counts["leased"]: 
+            self.jobs_seen = True
+
+            return False
+
+        return self.jobs_seen or counts["done"] + counts["failed"] > 0 or time.monotonic() - started > idle_timeout
+
+    def __work_jobs(self, idle_timeout: float) -> None:
+        """Feeds the jobs claimed to one pool of THREAD_NUM threads until the job queue is drained"""
+        workers = [threading.Thread(target=self.__work, daemon=True) for _ in range(THREAD_NUM)]
+
+        [worker.start() for worker in workers]
+
+        stages, started = self.__start_parse_stage(), time.monotonic()
+
+        while True:
+            [self.queue.put(item) for item in self.__claim_jobs()]
 
-        self.logger.info(f"Scraper done scraping all the {search_term} chapters.")
+            if self.__is_drained(started, idle_timeout): break
 
-    def scrape(self, book: str|None) -> None:
-        """Entry point to the scraper"""
+            eventlet.sleep(JOB_POLL_INTERVAL)
+
+        [self.queue.put((float("inf"), next(self.sequence), None)) for _ in workers]
+
+        [worker.join() for worker in workers]
+
+        self.__stop_parse_stage(stages)
+
+    async def __work_jobs_async(self, idle_timeout: float) -> None:
+        """Async version of __work_jobs, on max_in_flight coroutines"""
+        async with self.__create_client() as client:
+            queue = asyncio.PriorityQueue()
+
+            workers = [asyncio.create_task(self.__work_async(client, queue)) for _ in range(self.max_in_flight)]
+
+            workers += self.__start_parse_stage_async(queue)
+
+            started = time.monotonic()
+
+            while True:
+                [queue.put_nowait(item) for item in self.__claim_jobs()]
+
+                if self.__is_drained(started, idle_timeout): break
+
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+
+            [worker.cancel() for worker in workers]
+
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            self.__stop_parse_stage_async()
+
+    def work(self, jobs: JobQueue, idle_timeout: Optional[float]=JOB_IDLE_TIMEOUT) -> None:
+        """Entry point to a worker: scrapes the chapters it claims from the job queue and sends their 
+        rows back to it, until the queue is drained. The leases it holds are released if it stops early"""
+        self.jobs, self.worker_id = jobs, get_worker_id()
+
+        self.metrics.name = f"scraper-{self.worker_id}"
+
+        self.logger.info(f"Worker {self.worker_id} pulling jobs from {jobs.path}")
+
+        threading.Thread(target=self.__heartbeat, daemon=True).start()
+
+        try:
+            if self.engine == "async":
+                asyncio.run(self.__work_jobs_async(idle_timeout))
+            else:
+                self.__work_jobs(idle_timeout)
+        finally:
+            self.stopping.set()
+
+            jobs.release(self.worker_id)
+
+        self.logger.info(f"Worker {self.worker_id} done. Crawled: {self.crawled} || Verses Found: {self.verses_found}")
+
+        self.logger.summarize()
+
+        self.logger.info("Metrics saved to {} and {}".format(*self.metrics.export()))
+
+    def __get_worker_command(self, jobs: JobQueue, workers: int) -> list[str]:
+        """Returns the command starting a local worker with the options of this run, 
+        the requests per second are split between the workers"""
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "-jq", jobs.path, 
+                   "-e", self.engine, "-m", str(self.max_in_flight), "-c", self.cache_mode, 
+                   "-p", self.parser_backend, "-u", self.url, "-mr", str(self.max_retries), 
+                   "-rps", str(self.bucket.rate / workers), "-pp", str(self.parse_processes), 
+                   "-pq", str(self.parse_queue_size)]
+
+        return command + [flag for flag, on in [("--html", self.include_html), ("--verses", self.verse_output), 
+                                                ("--passage-only", self.passage_only)] if on]
+
+    def __assemble(self, jobs: JobQueue) -> None:
+        """Saves the results of the jobs finished since the last call like a local run, JOB_PAGE_SIZE jobs 
+        at a time: the html to the html store, the rows to the writer and the chapters that failed to the 
+        dead letters. Failed jobs are removed from the queue right away, done ones once their rows are saved"""
+        while (finished := jobs.get_finished(set(self.assembling.values()), JOB_PAGE_SIZE)):
+            failed = [self.__assemble_job(job) for job in finished]
+
+            jobs.remove([key for key in failed if key is not None])
+
+    def __assemble_job(self, job: FinishedJob) -> Optional[Tuple[str, str, int]]:
+        """Saves the result of a finished job, returns its key if it failed"""
+        key = (job.version_id, job.book, job.chapter)
+
+        if job.status == "failed" or job.result is None:
+            self.manifest.mark([(*key, "failed", None, None)])
+
+            self.dead_letters.append((*key, job.reason))
+
+            return key
+
+        verse, html = BibleVerse(**job.result["row"]), job.result["html"]
+
+        if html is not None and self.blobs is not None: self.blobs.put(html, verse.content)
+        elif html is not None:
+            with open(f"{HTML_OUTPUT_PATH}{verse.content}", "w", encoding="utf-8") as file:
+                file.write(html)
+
+        self.content_hashes[key] = job.result["content_hash"]
+
+        self.verse_records[key] = [VerseRecord(**record) for record in job.result["verses"]]
+
+        self.chapter_sizes[key[1:]] = max(self.chapter_sizes.get(key[1:], 0), job.result["size"])
+
+        self.verses_found += 1
+
+        self.assembling[key] = job.rowid
+
+        self.__save(verse)
+
+    def __coordinate(self, books: dict[str, range], jobs: JobQueue, workers: int) -> None:
+        """Queues every chapter of the books for the workers (starting workers local ones), waits until 
+        the jobs are done or failed, saving their results as they finish. Jobs left by a coordinator that 
+        stopped early are kept, so running it again picks up where it was"""
+        self.jobs = jobs
+
+        queued = jobs.enqueue(Job(version, version_id, book, c, -self.__get_size(book, c)) 
+                              for *_, (book, _, _, version, version_id, chapter) in self.__schedule(books) 
+                              for c in (chapter if isinstance(chapter, range) else [chapter]))
+
+        self.logger.info(f"{queued} chapters queued in {jobs.path}" + (f", starting {workers} workers" if workers else ""))
+
+        processes = [subprocess.Popen(self.__get_worker_command(jobs, workers)) for _ in range(workers)]
+
+        while (counts := jobs.get_counts())["pending"] or counts["leased"]:
+            if processes and all(process.poll() is not None for process in processes):
+                self.logger.warn("Every worker stopped before the jobs were done, saving the ones finished")
+
+                break
+
+            self.__assemble(jobs)
+
+            self.logger.progress(" || ".join(f"{status.title()}: {count}" for status, count in counts.items()))
+
+            eventlet.sleep(JOB_POLL_INTERVAL) if self.engine != "async" else time.sleep(JOB_POLL_INTERVAL)
+
+        [process.wait() for process in processes]
+
+        self.__assemble(jobs)
+
+    def scrape(self, book: str|None, jobs: Optional[JobQueue]=None, workers: Optional[int]=0) -> None:
+        """Entry point to the scraper. With a job queue it coordinates: the chapters are 
+        scraped by the workers pulling from the queue and their rows are written here"""
         if not os.path.exists(OUTPUT_PATH): os.makedirs(OUTPUT_PATH)
 
+        if self.verse_output and not os.path.exists(VERSE_OUTPUT_PATH): os.makedirs(VERSE_OUTPUT_PATH)
+
         if not book:
             search_books_dict = self.__get_books()
+        else:
+            try:
+                reference = parse_reference(book)
+            except ValueError:
+                self.logger.error(f"Failed to find chapter named <{book}>", True)
+
+            search_books_dict = {reference.book.name: reference.chapters}
+
+        self.logger.info(f"Versions to scrape: {', '.join(v_id for _, v_id in self.versions)}")
+
+        if self.only_missing:
+            self.completed = self.manifest.get_completed()
+
+            self.logger.info(f"{len(self.completed)} chapters already scraped will be skipped")
 
-            [self.__scrape_book(k, v) for k, v in search_books_dict.items()]
+        self.writer = Writer(self.__get_sinks(), WRITER_BATCH_SIZE, WRITER_FLUSH_INTERVAL, 
+                             WRITER_QUEUE_SIZE, self.logger, self.metrics, self.__mark_saved)
+
+        if jobs is not None:
+            self.__coordinate(search_books_dict, jobs, workers)
+        elif self.engine == "async":
+            asyncio.run(self.__scrape_books_async(search_books_dict))
         else:
-            search_args = self.__get_book(book)
+            self.__scrape_books(search_books_dict)
 
-            search_term, num_chapters = search_args if search_args is not None else (None, None)
-            
-            if search_term is None:
-                self.logger.error(f"Failed to find chapter named <{book}>", True)
+        self.logger.info("Closing the output sinks...")
+
+        self.writer.close()
 
-            search_term = book if search_term is None else search_term
+        self.manifest.record_sizes(self.chapter_sizes)
 
-            self.__scrape_book(search_term, num_chapters)
+        self.logger.summarize()
+
+        self.__report_dead_letters()
+
+        self.logger.info("Metrics saved to {} and {}".format(*self.metrics.export()))
 
 PARSER.add_argument("-b", "--book", type=str, nargs="+")
 
 PARSER.add_argument("-hml", "--html", action="store_true")
 
+PARSER.add_argument("-e", "--engine", type=str, choices=["thread", "async"], default=ENGINE)
+
+PARSER.add_argument("-m", "--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+
+PARSER.add_argument("-v", "--versions", type=str, nargs="+")
+
+PARSER.add_argument("-bs", "--batch-size", type=int, default=BATCH_SIZE)
+
+PARSER.add_argument("-c", "--cache", type=str, choices=CACHE_MODES, default=CACHE_MODE)
+
+PARSER.add_argument("-r", "--resume", "--only-missing", dest="only_missing", action="store_true")
+
+PARSER.add_argument("-p", "--parser", type=str, choices=PARSER_BACKENDS, default=PARSER_BACKEND)
+
+PARSER.add_argument("-po", "--passage-only", action="store_true", default=PASSAGE_ONLY)
+
+PARSER.add_argument("-vo", "--verses", action="store_true")
+
+PARSER.add_argument("-fs", "--fsync", type=str, choices=FSYNC_POLICIES, default=WRITER_FSYNC)
+
+PARSER.add_argument("-s", "--sinks", type=str, nargs="+", choices=SINKS)
+
+PARSER.add_argument("-ih", "--inline-html", action="store_true", default=INLINE_HTML)
+
+PARSER.add_argument("-pr", "--profile", action="store_true")
+
+PARSER.add_argument("-u", "--url", type=str, default=URL)
+
+PARSER.add_argument("-rps", "--requests-per-second", type=float, default=REQUESTS_PER_SECOND)
+
+PARSER.add_argument("-mr", "--max-retries", type=int, default=MAX_RETRIES)
+
+PARSER.add_argument("-hs", "--html-store", type=str, choices=HTML_STORES, default=HTML_STORE)
+
+PARSER.add_argument("-hc", "--html-compression", type=str, choices=CODECS, default=HTML_COMPRESSION)
+
+PARSER.add_argument("-bp", "--blobs-path", type=str, default=HTML_BLOBS_PATH)
+
+PARSER.add_argument("-pp", "--parse-processes", type=get_process_count, default=PARSE_PROCESSES)
+
+PARSER.add_argument("-pq", "--parse-queue-size", type=int, default=PARSE_QUEUE_SIZE)
+
+PARSER.add_argument("-w", "--worker", action="store_true")
+
+PARSER.add_argument("-co", "--coordinate", action="store_true")
+
+PARSER.add_argument("-sp", "--spawn", type=int, default=0)
+
+PARSER.add_argument("-jq", "--jobs-path", type=str, default=JOB_QUEUE_PATH)
+
 if __name__ == "__main__":
     args = PARSER.parse_args()
 
-    app = BibleGatewayScraper(args.html)
-    app.scrape(" ".join(args.book) if args.book else None)
\ No newline at end of file
+    if args.worker: Logger.set_file(f"logs-{get_worker_id()}.log")
+
+    if args.engine != "async": patch_thread_engine()
+
+    app = BibleGatewayScraper(ScraperOptions.from_args(args))
+    jobs = JobQueue(args.jobs_path, LEASE_SECONDS, LEASE_ATTEMPTS) if args.worker or args.coordinate else None
+
+    if args.worker:
+        scrape = lambda: app.work(jobs)
+    else:
+        scrape = lambda: app.scrape(" ".join(args.book) if args.book else None, jobs, args.spawn)
+
+    profile(scrape, f"{METRICS_PATH}scraper{f'-{get_worker_id()}' if args.worker else ''}.prof") if args.profile else scrape()
\ No newline at end of file
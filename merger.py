@@ -1,13 +1,25 @@
 import os
+import re
+import csv
 import json
+import glob
+import time
+import heapq
+import sqlite3
+import hashlib
 import argparse
+import functools
+import itertools
 import threading
 import dataclasses
 from queue import Queue
-from typing import Optional, Tuple
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-import pandas as pd
-from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+
+from utils import (SINKS, PARQUET_PATH, SQLITE_PATH, FragmentCache, MergeState, 
+                   Metrics, profile, METRICS_PATH, read_chapter_html, get_reference_table, BLOBS_PATH)
 
 with open("./settings/options-order.json") as f:
     VERSIONS = json.load(f)
@@ -16,16 +28,21 @@ QUEUE = Queue()
 
 MERGED_OUTPUT_PATH = "./data/merged/"
 
-BASE_TEMPLATE = '[parsehtml]\n<div id="{}_{}">{}</div>\n[/parsehtml]'
+SNAPSHOT_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+FRAGMENTS: Optional[FragmentCache] = None
+
+FRAGMENTS_LOCK = threading.Lock()
+
+BASE_TEMPLATE = '[parsehtml]\n<div id={}>\n{}</div>\n[/parsehtml]\n'
 
-SELECT_TEMPLATE = '''
-<select class="div-toggle" data-target=".versionselect">{}\n</select>'''
+SELECT_TEMPLATE = ' <select class="div-toggle" data-target=".versionselect">\n{} </select>\n'
 
-VERSE_CONTAINER_TEMPLATE = '\n<div class="versionselect"> {}</div>\n'
+VERSE_CONTAINER_TEMPLATE = ' <div class="versionselect">\n{} </div>\n'
 
-OPTION_BASE = '\n\t<option value="{}" data-show=".{}">{}</option>'
+OPTION_BASE = '  <option data-show={} value={}>\n   {}\n  </option>\n'
 
-VERSION_CONTENT_BASE = '\n<div class="{} hide">\n{}\n</div>'
+VERSION_CONTENT_BASE = '  <div class={}>\n{}  </div>\n'
 
 COLUMN_MAPPINGS = {
     "Version": "version",
@@ -42,6 +59,20 @@ PARSER.add_argument("-csv", "--csv_path", nargs="+", type=str, default="./data/c
 
 PARSER.add_argument("-html", "--html_path", nargs="+", type=str, default="./data/html/")
 
+PARSER.add_argument("-bp", "--blobs_path", type=str, default=BLOBS_PATH)
+
+PARSER.add_argument("-s", "--source", type=str, choices=SINKS, default="csv")
+
+PARSER.add_argument("-pq", "--parquet_path", type=str, default=PARQUET_PATH)
+
+PARSER.add_argument("-db", "--sqlite_path", type=str, default=SQLITE_PATH)
+
+PARSER.add_argument("-p", "--processes", type=int, default=0)
+
+PARSER.add_argument("-i", "--incremental", action="store_true")
+
+PARSER.add_argument("-pr", "--profile", action="store_true")
+
 @dataclasses.dataclass
 class BibleVerse:
     version: str
@@ -50,9 +81,12 @@ class BibleVerse:
     chapter: str
     chapter_title: Optional[str] = None
     content: Optional[str] = None
+    html: Optional[str] = None
 
 def read_csv(file_path: str) -> list[BibleVerse]:
     """Reads a csv and returns a list of BibleVerse objects"""
+    import pandas as pd
+
     df = pd.read_csv(file_path)
 
     df.rename(columns=COLUMN_MAPPINGS, inplace=True)
@@ -61,20 +95,71 @@ def read_csv(file_path: str) -> list[BibleVerse]:
 
     return [BibleVerse(**item) for item in data_list]
 
-def read_html(file_path: str) -> str:
-    """Reads html file and returns the html string"""
-    with open(file_path, encoding="utf-8") as file:
-        return file.read()
+def iter_csv(file_path: str) -> Iterator[BibleVerse]:
+    """Streams the rows of a csv as BibleVerse objects without loading the whole file"""
+    with open(file_path, encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            verse = BibleVerse(**{COLUMN_MAPPINGS[k]: v if v != "" else None for k, v in row.items()})
+
+            verse.chapter = int(verse.chapter)
+
+            yield verse
+
+def read_parquet(dataset_path: str, version_ids: Optional[list[str]]=None) -> list[BibleVerse]:
+    """Reads the chapters parquet dataset, only the partitions of the given versions if any"""
+    import pyarrow.parquet as pq
+
+    version_paths = [f"{dataset_path}chapters/{v}/" for v in version_ids] if version_ids else [f"{dataset_path}chapters/*/"]
+
+    parts = sorted(part for path in version_paths for part in glob.glob(f"{path}*/part-*.parquet"))
+
+    return [BibleVerse(**row) for part in parts for row in pq.read_table(part).to_pylist()]
+
+def read_sqlite(db_path: str, version_ids: Optional[list[str]]=None) -> list[BibleVerse]:
+    """Reads the chapters table, only the rows of the given versions if any"""
+    query = "SELECT version, version_id, book, chapter, chapter_title, content, html FROM chapters"
+
+    if version_ids: query += f" WHERE version_id IN ({', '.join('?' for _ in version_ids)})"
+
+    with sqlite3.connect(db_path) as connection:
+        rows = connection.execute(query, version_ids or []).fetchall()
+
+    return [BibleVerse(*row) for row in rows]
+
+def read_html(file_path: str, blobs_path: Optional[str]=BLOBS_PATH) -> str:
+    """Reads html file and returns the html string. Files that aren't there are read
+    from the blob store (in blobs_path) their name refers to"""
+    return read_chapter_html(file_path, blobs_path)
     
+def get_fragments() -> FragmentCache:
+    """Returns the rendered fragments cache of the thread pool or of the current process,
+    created by the first thread asking for it"""
+    global FRAGMENTS
+
+    with FRAGMENTS_LOCK:
+        if FRAGMENTS is None: FRAGMENTS = FragmentCache()
+
+    return FRAGMENTS
+
+def quote_attribute(value: str) -> str:
+    """Escapes and quotes an attribute value like BeautifulSoup does"""
+    return EntitySubstitution.quoted_attribute_value(EntitySubstitution.substitute_xml(value))
+
 def create_option(verse: BibleVerse) -> str:
     """Creates an html option from the verse provided"""
     version = verse.version_id.lower().strip()
     
-    return OPTION_BASE.format(version, version, verse.version)
+    return OPTION_BASE.format(quote_attribute(f".{version}"), quote_attribute(version), 
+                              EntitySubstitution.substitute_xml(verse.version.strip()))
 
 def create_version_content(verse: BibleVerse, html: str) -> str:
-    """Creates version content from the verse and html from file"""
-    return VERSION_CONTENT_BASE.format(verse.version_id.lower(), html)
+    """Creates version content from the verse and html from file, the html
+    is prettified once and then taken from the fragments cache"""
+    return format_version_content(verse, get_fragments().render(html))
+
+def format_version_content(verse: BibleVerse, fragment: str) -> str:
+    """Creates version content from the verse and its already rendered html"""
+    return VERSION_CONTENT_BASE.format(quote_attribute(f"{verse.version_id.lower()} hide"), fragment)
 
 def create_content(verse: BibleVerse, options: str, versions_content: str) -> str:
     """Creates content from the bible verse given"""
@@ -85,7 +170,7 @@ def create_content(verse: BibleVerse, options: str, versions_content: str) -> st
 
 def create_base_template(verse: BibleVerse, content: str) -> str:
     """Creates the base template from the given verse"""
-    return BASE_TEMPLATE.format(verse.book.lower(), verse.chapter, content)
+    return BASE_TEMPLATE.format(quote_attribute(f"{verse.book.lower()}_{verse.chapter}"), content)
 
 def groupby_chapter(verses: list[BibleVerse]) -> dict[int, list[BibleVerse]]:
     """Groups bible verses by chapter"""
@@ -99,89 +184,266 @@ def groupby_chapter(verses: list[BibleVerse]) -> dict[int, list[BibleVerse]]:
     return grouped_verses
 
 def groupby_book(verses: list[list[BibleVerse]]) -> dict[str, list[BibleVerse]]:
-    grouped_verses: dict[str, list] = {}
-
-    added = set()
+    """Groups bible verses by book, keeping the last row of each version chapter.
+    The rows are read from the oldest snapshot to the newest one, so the newest one is kept"""
+    latest_verses: dict[str, BibleVerse] = {}
 
     for bible_verses in verses:
         for verse in bible_verses:
-            verse_id = f"{verse.version_id} {verse.book} {verse.chapter}"
-
-            if verse_id in added: continue
-
-            if not grouped_verses.get(verse.book): grouped_verses[verse.book] = []
+            latest_verses[f"{verse.version_id} {verse.book} {verse.chapter}"] = verse
 
-            grouped_verses[verse.book].append(verse)
+    grouped_verses: dict[str, list] = {}
 
-            added.add(verse_id)
+    [grouped_verses.setdefault(verse.book, []).append(verse) for verse in latest_verses.values()]
     
     return grouped_verses
 
-def process_grouped_verses(chapter_verses: list[BibleVerse], html_path: str) -> Tuple[str, str]:
-    options, content, crawled = '', '', []
+def get_chapter_inputs(chapter_verses: list[BibleVerse], html_path: str, 
+                       blobs_path: Optional[str]=BLOBS_PATH) -> list[Tuple[BibleVerse, str]]:
+    """Returns the versions of a chapter to merge, in the options-order.json order, with their html"""
+    inputs, crawled = [], []
 
     for mapping_verse in VERSIONS:
         for verse in chapter_verses:
             if verse.version_id != mapping_verse or verse.version_id in crawled: continue
 
-            options += f"{create_option(verse=verse)}"
-
-            html = read_html(f"{html_path}{verse.content}")
-
-            version_content = create_version_content(verse=verse, html=html)
+            html = verse.html if verse.html is not None else read_html(f"{html_path}{verse.content}", blobs_path)
 
-            content += f"{version_content}"
+            inputs.append((verse, html))
 
             crawled.append(verse.version_id)
 
             break
 
+    return inputs
+
+def get_inputs_hash(inputs: list[Tuple[BibleVerse, str]]) -> str:
+    """Hashes what a merged file is built from: the versions order, the templates
+    and the version names and html of the chapter"""
+    inputs_hash = hashlib.sha1(json.dumps([VERSIONS, BASE_TEMPLATE, SELECT_TEMPLATE, VERSE_CONTAINER_TEMPLATE, 
+                                           OPTION_BASE, VERSION_CONTENT_BASE]).encode("utf-8"))
+
+    for verse, html in inputs:
+        inputs_hash.update(f"{verse.version_id}\n{verse.version}\n{len(html)}\n{html}".encode("utf-8"))
+
+    return inputs_hash.hexdigest()
+
+def process_grouped_verses(inputs: list[Tuple[BibleVerse, str]]) -> Tuple[str, str]:
+    options, content = '', ''
+
+    for verse, html in inputs:
+        options += f"{create_option(verse=verse)}"
+
+        content += f"{create_version_content(verse=verse, html=html)}"
+
     return options, content
 
-def work(html_path: str) -> None:
-    while True:
-        chapter_verses: list[BibleVerse] = QUEUE.get()
+def merge_chapter(chapter_verses: list[BibleVerse], html_path: str, previous_hash: Optional[str]=None, 
+                  blobs_path: Optional[str]=BLOBS_PATH) -> Tuple[str, str, bool, dict[str, float]]:
+    """Merges the versions of a chapter into one html file, unless its inputs hash is the previous one.
+    Returns the file name, the inputs hash, if it was merged and how long each stage took"""
+    book, chapter = chapter_verses[0].book, chapter_verses[0].chapter
+
+    timings, started = {}, time.perf_counter()
+
+    inputs = get_chapter_inputs(chapter_verses, html_path, blobs_path)
+
+    timings["read"], started = time.perf_counter() - started, time.perf_counter()
+
+    inputs_hash, filename = get_inputs_hash(inputs), get_merged_name(book, chapter)
+
+    timings["hash"], started = time.perf_counter() - started, time.perf_counter()
+
+    if inputs_hash == previous_hash and os.path.exists(f"{MERGED_OUTPUT_PATH}{filename}"):
+        return filename, inputs_hash, False, timings
+
+    options, content = process_grouped_verses(inputs)
 
-        options, content = process_grouped_verses(chapter_verses, html_path)
+    merged_content = create_content(chapter_verses[0], options, content)
 
-        merged_content = create_content(chapter_verses[0], options, content)
+    timings["render"], started = time.perf_counter() - started, time.perf_counter()
 
-        save_merged(merged_content, chapter_verses[0].book, chapter_verses[0].chapter)
+    save_merged(merged_content, book, chapter)
 
-        del merged_content, options, content
+    timings["save"] = time.perf_counter() - started
+
+    return filename, inputs_hash, True, timings
+
+def work(html_path: str, results: list[Tuple[str, str, bool, dict[str, float]]], blobs_path: str) -> None:
+    while True:
+        chapter_verses, previous_hash = QUEUE.get()
+
+        results.append(merge_chapter(chapter_verses, html_path, previous_hash, blobs_path))
 
         QUEUE.task_done()
 
-def save_merged(html: str, book: str, chapter: int) -> None:
-    """Saves merged content to an html file"""
-    filename = f"{'{:05d}'.format(chapter)}{book.lower()}{chapter}.html"
+def get_merged_name(book: str, chapter: int) -> str:
+    """Returns the file name of a merged chapter"""
+    return f"{'{:05d}'.format(chapter)}{book.lower()}{chapter}.html"
 
-    pretty_html = BeautifulSoup(html, "html.parser").prettify()
+def save_merged(html: str, book: str, chapter: int) -> None:
+    """Saves merged content to an html file, the content is already indented"""
+    filename = get_merged_name(book, chapter)
 
     with open(f'{MERGED_OUTPUT_PATH}{filename}', "w", encoding="utf-8") as f:
-        f.write(pretty_html)
+        f.write(html)
     
     print(f"Merged content saved to: {filename}")
     
-def run(csv_path: str, html_path: str) -> None:
-    """Entry point to the script"""
-    if not os.path.exists(MERGED_OUTPUT_PATH): os.makedirs(MERGED_OUTPUT_PATH)
+def read_source(source: str, csv_path: str, parquet_path: str, sqlite_path: str) -> list[list[BibleVerse]]:
+    """Reads the scraped chapters from the csv files, the parquet dataset or the sqlite database"""
+    if source == "parquet": return [read_parquet(parquet_path, VERSIONS)]
 
-    verses: list[list[BibleVerse]] = [
-        read_csv(f"{csv_path}{f}") for f in os.listdir(csv_path)]
+    if source == "sqlite": return [read_sqlite(sqlite_path, VERSIONS)]
+
+    return [read_csv(f"{csv_path}{f}") for f in get_csv_files(csv_path)]
+
+def get_csv_files(csv_path: str) -> list[str]:
+    """Returns the csv files from the oldest snapshot (the date in their name) to the newest one"""
+    def get_snapshot(file_name: str) -> str:
+        snapshot_match = SNAPSHOT_RE.search(file_name)
+
+        return snapshot_match.group(1) if snapshot_match else ""
+
+    return sorted(os.listdir(csv_path), key=lambda f: (get_snapshot(f), f))
     
-    grouped_verses: dict[str, dict] = groupby_book(verses=verses)
+@functools.cache
+def get_book_order() -> dict[str, int]:
+    """Returns the position of every book in the reference table"""
+    return {book.name: i for i, book in enumerate(get_reference_table().books)}
+
+def get_sort_key(book: str, chapter: Any) -> Tuple[int, int]:
+    """Sorts the rows by book (in the order of the reference table) and chapter, like the csv sink"""
+    books = get_book_order()
+
+    return books.get(book, len(books)), int(chapter)
+
+def get_chapter_key(verse: BibleVerse) -> Tuple[int, int]:
+    """Sorts the rows by book and chapter"""
+    return get_sort_key(verse.book, verse.chapter)
+
+def is_sorted(file_path: str) -> bool:
+    """Checks the rows of a csv are sorted by book and chapter, reading only those 2 columns.
+    Files are sorted when the scraper closes them, not the ones of an interrupted run"""
+    with open(file_path, encoding="utf-8", newline="") as file:
+        keys = (get_sort_key(row["Book"], row["Chapter"]) for row in csv.DictReader(file))
+
+        return all(a <= b for a, b in itertools.pairwise(keys))
+
+def iter_sorted_csv(file_path: str) -> Iterator[BibleVerse]:
+    """Streams the rows of a csv by book and chapter, sorting the files that aren't in memory"""
+    if is_sorted(file_path): 
+        yield from iter_csv(file_path)
+    else:
+        print(f"{file_path} isn't sorted by book and chapter, sorting it in memory")
+
+        yield from sorted(iter_csv(file_path), key=get_chapter_key)
+
+def iter_source(source: str, csv_path: str, parquet_path: str, sqlite_path: str) -> Iterator[BibleVerse]:
+    """Streams the scraped chapters sorted by book and chapter, the rows of a chapter from the oldest snapshot 
+    to the newest one. The csv files are merged as they are read, the other sources are sorted in memory"""
+    if source != "csv": 
+        return iter(sorted(itertools.chain.from_iterable(read_source(source, csv_path, parquet_path, sqlite_path)), 
+                           key=get_chapter_key))
+
+    return heapq.merge(*(iter_sorted_csv(f"{csv_path}{f}") for f in get_csv_files(csv_path)), key=get_chapter_key)
+
+def iter_chapters(verses: Iterable[BibleVerse]) -> Iterator[list[BibleVerse]]:
+    """Groups the sorted rows by chapter as they are read, keeping the last row of each version like groupby_book.
+    Rows only hold the names of the html files, the html is read by the process merging the chapter"""
+    for _, chapter_verses in itertools.groupby(verses, key=get_chapter_key):
+        latest_verses: dict[str, BibleVerse] = {}
+
+        for verse in chapter_verses:
+            latest_verses[verse.version_id] = verse
+
+        yield list(latest_verses.values())
+
+def report(results: list[Tuple[str, str, bool, dict[str, float]]], started: float) -> None:
+    """Prints the number of chapters merged per second"""
+    elapsed, merged = time.perf_counter() - started, sum(merged for _, _, merged, _ in results)
 
-    for book, g_verses in grouped_verses.items():
-        grouped_verses[book] = groupby_chapter(verses=g_verses)
+    print(f"Merged {merged} chapters in {elapsed:.1f}s ({merged / max(elapsed, 1e-9):.1f} chapters/s), "
+          f"{len(results) - merged} unchanged chapters skipped")
+
+def run_processes(verses: Iterable[BibleVerse], html_path: str, processes: int, hashes: dict[str, str], 
+                  metrics: Metrics, blobs_path: str) -> list[Tuple[str, str, bool, dict[str, float]]]:
+    """Merges the chapters in a pool of processes as they are read. At most 2 chapters per process
+    are in flight at a time, so the memory used doesn't grow with the number of chapters"""
+    results, pending = [], set()
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chapter_verses in iter_chapters(verses):
+            if len(pending) >= processes * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                results.extend(future.result() for future in done)
+
+            previous_hash = hashes.get(get_merged_name(chapter_verses[0].book, chapter_verses[0].chapter))
+
+            pending.add(executor.submit(merge_chapter, chapter_verses, html_path, previous_hash, blobs_path))
+
+        results.extend(future.result() for future in pending)
+
+    return results
+
+def run_threads(verses: Callable[[], list[list[BibleVerse]]], html_path: str, hashes: dict[str, str], 
+                metrics: Metrics, blobs_path: str) -> list[Tuple[str, str, bool, dict[str, float]]]:
+    """Merges the chapters in 5 threads"""
+    results = []
+
+    with metrics.timer("load"):
+        grouped_verses: dict[str, dict] = groupby_book(verses=verses())
+
+        for book, g_verses in grouped_verses.items():
+            grouped_verses[book] = groupby_chapter(verses=g_verses)
     
-    [threading.Thread(target=work, args=(html_path,), daemon=True).start() for _ in range(5)]
+    [threading.Thread(target=work, args=(html_path, results, blobs_path), daemon=True).start() for _ in range(5)]
     
-    [QUEUE.put(cvs) for _, bvs in grouped_verses.items() for _, cvs in bvs.items()]
+    [QUEUE.put((cvs, hashes.get(get_merged_name(cvs[0].book, cvs[0].chapter)))) 
+     for _, bvs in grouped_verses.items() for _, cvs in bvs.items()]
 
     QUEUE.join()
 
+    return results
+
+def run(csv_path: str, html_path: str, source: Optional[str]="csv", 
+        parquet_path: Optional[str]=PARQUET_PATH, sqlite_path: Optional[str]=SQLITE_PATH, 
+        processes: Optional[int]=0, incremental: Optional[bool]=False, blobs_path: Optional[str]=BLOBS_PATH) -> None:
+    """Entry point to the script. With processes, the chapters are streamed to a pool of processes.
+    With incremental, the chapters whose inputs hash didn't change since they were merged are skipped"""
+    if not os.path.exists(MERGED_OUTPUT_PATH): os.makedirs(MERGED_OUTPUT_PATH)
+
+    started, state, metrics = time.perf_counter(), MergeState(), Metrics("merger")
+
+    hashes = state.get_hashes() if incremental else {}
+
+    if processes:
+        results = run_processes(iter_source(source, csv_path, parquet_path, sqlite_path), 
+                                html_path, processes, hashes, metrics, blobs_path)
+    else:
+        results = run_threads(lambda: read_source(source, csv_path, parquet_path, sqlite_path), 
+                              html_path, hashes, metrics, blobs_path)
+
+    state.record([(filename, inputs_hash) for filename, inputs_hash, merged, _ in results if merged])
+
+    state.close()
+
+    for _, _, merged, timings in results:
+        metrics.increment("chapters", result="merged" if merged else "skipped")
+
+        [metrics.observe(stage, seconds) for stage, seconds in timings.items()]
+
+        metrics.observe("chapter", sum(timings.values()))
+
+    report(results, started)
+
+    print("Metrics saved to {} and {}".format(*metrics.export()))
+
 if __name__ == "__main__":
     args = PARSER.parse_args()
 
-    run(''.join(args.csv_path), ''.join(args.html_path))
\ No newline at end of file
+    merge = lambda: run(''.join(args.csv_path), ''.join(args.html_path), args.source, args.parquet_path, 
+                        args.sqlite_path, args.processes, args.incremental, args.blobs_path)
+
+    profile(merge, f"{METRICS_PATH}merger.prof") if args.profile else merge()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+import sys
+import shutil
+from typing import Iterator
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts read ./settings/ and the fixtures in ./data/html/ relative to the working directory
+os.chdir(ROOT)
+
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+HTML_PATH = "./data/html/"
+
+# Every 4th Genesis fixture of both versions
+FIXTURES = sorted(f for f in os.listdir(HTML_PATH) if "_Genesis_" in f)[::4]
+
+def load_page(file_name: str) -> str:
+    """Wraps an html fixture in a full page"""
+    from benchmarks.pages import wrap_page
+
+    with open(f"{HTML_PATH}{file_name}", encoding="utf-8") as file:
+        version, *book, chapter, _ = file_name.split("_")
+
+        return wrap_page(file.read(), f"{' '.join(book)} {chapter}", version)
+
+@pytest.fixture(scope="session")
+def pages() -> list[str]:
+    return [load_page(file_name) for file_name in FIXTURES]
+
+@pytest.fixture(scope="module")
+def server() -> Iterator["PassageServer"]:
+    """The local stand-in for the passage endpoint, serving the html fixtures"""
+    from benchmarks.server import PassageServer
+
+    server = PassageServer(0).start()
+
+    yield server
+
+    server.shutdown()
+
+@pytest.fixture
+def workdir() -> Iterator[str]:
+    """An empty working directory with the scripts and the settings"""
+    from benchmarks.suite import prepare_workdir
+
+    workdir = prepare_workdir()
+
+    yield workdir
+
+    shutil.rmtree(workdir, ignore_errors=True)
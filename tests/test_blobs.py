@@ -0,0 +1,97 @@
+import os
+import glob
+import time
+from typing import Iterator
+
+import pytest
+
+from benchmarks.suite import run_process
+from utils import BlobStore, SearchIndex, read_chapter_html
+
+@pytest.fixture(params=["none", "gzip"])
+def store(request, tmp_path) -> Iterator[BlobStore]:
+    store = BlobStore(f"{tmp_path}/", request.param)
+
+    yield store
+
+    store.close()
+
+def get_blob_path(store: BlobStore, key: str) -> str:
+    return store.get_blob_path(key, store.codec)
+
+def test_same_html_is_stored_once(store):
+    key = store.put("<p>In the beginning</p>", "KJV_Genesis_1_2024-03-01.html")
+
+    assert store.put("<p>In the beginning</p>", "KJV_Genesis_1_2024-03-04.html") == key
+
+    assert store.get_stats()["refs"] == 2 and store.get_stats()["blobs"] == 1
+
+    assert store.read("KJV_Genesis_1_2024-03-04.html") == "<p>In the beginning</p>"
+
+def test_missing_blob_is_written_again(store):
+    key = store.put("<p>In the beginning</p>", "KJV_Genesis_1_2024-03-01.html")
+
+    os.remove(get_blob_path(store, key))
+
+    store.put("<p>In the beginning</p>", "KJV_Genesis_1_2024-03-04.html")
+
+    assert os.path.exists(get_blob_path(store, key))
+
+def test_unknown_names_and_codecs(store, tmp_path):
+    with pytest.raises(FileNotFoundError): store.read("KJV_Genesis_1_2024-03-01.html")
+
+    with pytest.raises(ValueError): BlobStore(f"{tmp_path}/", "brotli")
+
+def test_collect_keeps_referenced_blobs(store):
+    shared = store.put("<p>shared</p>", "a.html")
+    store.put("<p>shared</p>", "b.html")
+    dead = store.put("<p>dead</p>", "c.html")
+
+    time.sleep(0.01)
+
+    assert store.collect(["b.html"], dry_run=True)[:2] == (2, 1)
+
+    assert store.get_stats()["refs"] == 3
+
+    assert store.collect(["b.html"])[:2] == (2, 1)
+
+    assert store.get_names() == ["b.html"] and store.get(shared) == "<p>shared</p>"
+
+    assert os.path.exists(get_blob_path(store, shared)) and not os.path.exists(get_blob_path(store, dead))
+
+    assert store.collect([])[:2] == (1, 1) and store.get_stats()["blobs"] == 0
+
+def test_collect_keeps_references_created_since(store):
+    store.put("<p>old</p>", "old.html")
+
+    before = time.time()
+
+    new = store.put("<p>new</p>", "new.html")
+
+    assert store.collect([], before=before)[:2] == (1, 1)
+
+    assert store.get_names() == ["new.html"] and store.get(new) == "<p>new</p>"
+
+def test_read_from_the_store_at_a_path(store, tmp_path):
+    store.put("<p>In the beginning</p>", "KJV_Genesis_1_2024-03-01.html")
+
+    assert read_chapter_html(f"{tmp_path}/html/KJV_Genesis_1_2024-03-01.html", f"{tmp_path}/") == "<p>In the beginning</p>"
+
+def test_configured_store_is_read_by_the_scripts(server, workdir):
+    """The merger and the indexer read the html from the store the scraper wrote it to"""
+    run_process(["main.py", "-b", "Genesis 1-2", "-v", "KJV", "-c", "off", "-u", server.url, "--html",
+                 "--html-store", "blobs", "--blobs-path", "./data/store/"], workdir)
+
+    assert not glob.glob(f"{workdir}/data/html/*.html") and not os.path.exists(f"{workdir}/data/blobs/")
+
+    run_process(["merger.py", "-bp", "./data/store/"], workdir)
+
+    run_process(["indexer.py", "-bp", "./data/store/"], workdir)
+
+    assert len(glob.glob(f"{workdir}/data/merged/*.html")) == 2
+
+    index = SearchIndex(f"{workdir}/data/index/")
+
+    assert index.search("beginning")[0] == 1
+
+    index.close()
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmarks.pages import wrap_page
+from benchmarks.extract_benchmark import EDGE_CASES
+from utils import ChapterExtractor
+
+from .conftest import FIXTURES, load_page
+
+FIXTURES_PATH = "./tests/fixtures/"
+
+def get_baseline_text(page: str) -> str:
+    """The text content as the scraper extracted it before the ChapterExtractor (__extract_data)"""
+    passage_tag = BeautifulSoup(page, "html.parser").select_one("div.passage-text")
+
+    if passage_tag is None: return None
+
+    chapter_tag = passage_tag.select_one("span.chapternum")
+
+    if chapter_tag: chapter_tag.decompose()
+
+    verse = ""
+
+    for paragraph in passage_tag.select("p"):
+        for span_tag in paragraph.select("span.text"):
+            cross_reference = span_tag.select_one("sup.crossreference")
+
+            if cross_reference is not None:
+                cross_reference.decompose()
+
+            verse_num = ""
+
+            verse_num_tag = span_tag.select_one("sup.versenum")
+
+            if verse_num_tag is not None:
+                verse_num = verse_num_tag.get_text(strip=True) + " "
+
+                verse_num_tag.decompose()
+
+            verse += verse_num + span_tag.get_text().strip().replace("\n", "") + " "
+
+            while "  " in verse: verse = verse.replace("  ", " ")
+
+    return verse.encode("ascii", errors="ignore").decode()
+
+@pytest.fixture(scope="module")
+def edge_pages() -> list[str]:
+    """Markup the fixtures don't cover, and a page without a passage"""
+    return [wrap_page(content, "Genesis 1", "KJV") for content in EDGE_CASES] + [
+        wrap_page("", "Genesis 1", "KJV").replace("passage-text", "no-passage")]
+
+@pytest.fixture(scope="module")
+def expected_pages() -> list[tuple[str, dict[str, str]]]:
+    """The pages with the title and text content the baseline scraper extracted from them"""
+    with open(f"{FIXTURES_PATH}text_content.json", encoding="utf-8") as file:
+        expected = json.load(file)
+
+    return [(load_page(file_name), expected[file_name]) for file_name in FIXTURES] + [
+        (wrap_page(content, "Genesis 1", "KJV"), expected[f"edge-{i}"]) for i, content in enumerate(EDGE_CASES)]
+
+@pytest.mark.parametrize("passage_only", [False, True])
+@pytest.mark.parametrize("verse_output", [False, True])
+def test_stream_matches_tree(expected_pages, passage_only, verse_output):
+    options = {"tag_settings": [], "include_html": False, "verse_output": verse_output, "passage_only": passage_only}
+
+    for page, expected in expected_pages:
+        for streaming in [True, False]:
+            chapter = ChapterExtractor(**options, streaming=streaming).process(page, 1)[0][0]
+
+            assert chapter.title == expected["title"]
+
+            assert chapter.content.encode("ascii", errors="ignore").decode() == expected["content"]
+
+def test_stream_covers_fixtures(pages):
+    extractor = ChapterExtractor([], False, passage_only=True)
+
+    assert all(extractor.stream(page, 1) is not None for page in pages)
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_text_matches_baseline(pages, edge_pages, streaming):
+    extractor = ChapterExtractor([], False, streaming=streaming)
+
+    for page in pages + edge_pages:
+        content = extractor.process(page, 1)[0][0].content
+
+        assert (content and content.encode("ascii", errors="ignore").decode()) == get_baseline_text(page)
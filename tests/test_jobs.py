@@ -0,0 +1,139 @@
+import glob
+import time
+from typing import Iterator
+
+import pytest
+
+from benchmarks.suite import run_process, read_metrics, count_chapters
+from utils import Job, JobQueue
+
+def make_job(chapter: int, priority: float=0.0) -> Job:
+    return Job("King James Version", "KJV", "Genesis", chapter, priority)
+
+@pytest.fixture
+def queue(tmp_path) -> Iterator[JobQueue]:
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=0.2, max_attempts=2)
+
+    yield queue
+
+    queue.close()
+
+def test_enqueue_skips_queued_jobs(queue):
+    assert queue.enqueue([make_job(1), make_job(2)]) == 2
+
+    assert queue.enqueue([make_job(2), make_job(3)]) == 1
+
+    assert queue.get_counts() == {"pending": 3, "leased": 0, "done": 0, "failed": 0}
+
+def test_claim_by_priority(queue):
+    queue.enqueue([make_job(1, 0.0), make_job(2, -30.0), make_job(3, -10.0)])
+
+    assert [job.chapter for job in queue.claim("a", 2)] == [2, 3]
+
+    assert [job.chapter for job in queue.claim("b", 2)] == [1]
+
+    assert queue.claim("c", 2) == []
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.enqueue([make_job(1)])
+
+    job, = queue.claim("a", 1)
+
+    assert queue.claim("b", 1) == []
+
+    time.sleep(0.3)
+
+    assert queue.claim("b", 1) == [job]
+
+    assert not queue.complete("a", job.key, {"size": 1})
+
+    assert queue.complete("b", job.key, {"size": 2})
+
+    finished, = queue.get_finished()
+
+    assert (finished.status, finished.result) == ("done", {"size": 2})
+
+def test_heartbeat_renews_leases(queue):
+    queue.enqueue([make_job(1)])
+
+    queue.claim("a", 1)
+
+    for _ in range(3):
+        time.sleep(0.1)
+
+        assert queue.heartbeat("a") == 1
+
+    assert queue.claim("b", 1) == []
+
+def test_released_jobs_are_retried(queue):
+    queue.enqueue([make_job(1)])
+
+    for _ in range(3):
+        job, = queue.claim("a", 1)
+
+        assert queue.release("a") == 1
+
+    assert queue.claim("b", 1) == [job]
+
+def test_fails_after_max_attempts(queue):
+    queue.enqueue([make_job(1)])
+
+    for worker in ["a", "b"]:
+        assert len(queue.claim(worker, 1)) == 1
+
+        time.sleep(0.3)
+
+    assert queue.claim("c", 1) == []
+
+    finished, = queue.get_finished()
+
+    assert (finished.status, finished.reason) == ("failed", "lease expired")
+
+def test_finished_jobs_are_paged_and_removed(queue):
+    queue.enqueue([make_job(chapter) for chapter in range(1, 6)])
+
+    for job in queue.claim("a", 5):
+        if job.chapter % 2: queue.complete("a", job.key, {"size": job.chapter})
+        else: queue.fail("a", job.key, "404")
+
+    first = queue.get_finished(limit=3)
+
+    assert [job.chapter for job in first] == [1, 2, 3]
+
+    assert [job.chapter for job in queue.get_finished({job.rowid for job in first})] == [4, 5]
+
+    queue.remove([job[1:4] for job in first])
+
+    assert queue.get_counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+
+def read_file(file_path: str) -> str:
+    with open(file_path, encoding="utf-8") as file:
+        return file.read()
+
+def test_spawned_workers_have_their_own_outputs(server, workdir):
+    """The coordinator saves the chapters scraped by the workers it starts, which log and export their metrics
+    to their own files"""
+    requests = server.requests
+
+    run_process(["main.py", "-b", "Genesis 1-6", "-v", "KJV", "-c", "off", "-u", server.url,
+                 "--coordinate", "--spawn", "2"], workdir)
+
+    assert server.requests - requests == 6 and count_chapters(workdir) == 6
+
+    queue = JobQueue(f"{workdir}/data/jobs.db")
+
+    assert not any(queue.get_counts().values())
+
+    queue.close()
+
+    worker_logs = glob.glob(f"{workdir}/logs/logs-*.log")
+
+    assert len(worker_logs) == 2 and all("pulling jobs" in read_file(file_path) for file_path in worker_logs)
+
+    assert "6 chapters queued" in read_file(f"{workdir}/logs/logs.log")
+
+    assert "pulling jobs" not in read_file(f"{workdir}/logs/logs.log")
+
+    worker_metrics = glob.glob(f"{workdir}/logs/scraper-*-metrics.json")
+
+    assert len(worker_metrics) == 2 and read_metrics(workdir, "scraper")
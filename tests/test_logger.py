@@ -0,0 +1,43 @@
+import os
+import sys
+import subprocess
+
+from utils import Logger
+
+def test_counted_warnings_are_summarized(monkeypatch):
+    logger, warnings = Logger("Counter"), []
+
+    monkeypatch.setattr(logger, "warn", warnings.append)
+
+    [logger.count(message) for message in ["Slow response", "Missing tag", "Slow response"]]
+
+    logger.summarize()
+
+    logger.summarize()
+
+    assert warnings == ["Slow response (2 times)", "Missing tag (1 times)"]
+
+def test_progress_is_throttled(monkeypatch):
+    logger, messages = Logger("Progress", progress_interval=60), []
+
+    monkeypatch.setattr(logger, "info", messages.append)
+
+    [logger.progress(f"Crawled: {crawled}") for crawled in range(3)]
+
+    logger.progress("Done", force=True)
+
+    assert messages == ["Crawled: 0", "Done"]
+
+def test_worker_log_file(workdir):
+    """A process logging to its own file leaves the logs.log of the others alone"""
+    os.makedirs(f"{workdir}/logs/")
+
+    with open(f"{workdir}/logs/logs.log", "w") as file:
+        file.write("Coordinator:INFO - Started\n")
+
+    script = "from utils import Logger; Logger.set_file('logs-worker-1.log'); Logger('Worker').info('Started')"
+
+    subprocess.run([sys.executable, "-c", script], cwd=workdir, check=True)
+
+    with open(f"{workdir}/logs/logs.log") as file, open(f"{workdir}/logs/logs-worker-1.log") as worker_file:
+        assert file.read() == "Coordinator:INFO - Started\n" and worker_file.read() == "Worker:INFO - Started\n"
@@ -0,0 +1,53 @@
+import os
+import glob
+import shutil
+
+import pytest
+
+from benchmarks.suite import run_process, read_metrics
+
+@pytest.fixture
+def merge_workdir(workdir) -> str:
+    """A working directory with the csv and html fixtures"""
+    shutil.copytree("./data/csv/", f"{workdir}/data/csv/")
+    shutil.copytree("./data/html/", f"{workdir}/data/html/", dirs_exist_ok=True)
+
+    return workdir
+
+def merge(workdir: str, *args: str) -> dict[str, int]:
+    """Merges the fixtures, returns the chapters merged and skipped"""
+    run_process(["merger.py", *args], workdir)
+
+    counters = read_metrics(workdir, "merger")["counters"]
+
+    return {c["labels"]["result"]: c["value"] for c in counters if c["name"] == "chapters"}
+
+def test_incremental_merge_skips_unchanged_chapters(merge_workdir):
+    assert merge(merge_workdir, "--incremental") == {"merged": 112}
+
+    assert merge(merge_workdir, "--incremental") == {"skipped": 112}
+
+    with open(f"{merge_workdir}/data/html/KJV_Genesis_1_2024-03-07.html", "a", encoding="utf-8") as file:
+        file.write("<p>changed</p>")
+
+    assert merge(merge_workdir, "--incremental") == {"merged": 1, "skipped": 111}
+
+def read_merged(workdir: str) -> dict[str, str]:
+    merged = {}
+
+    for file_path in sorted(glob.glob(f"{workdir}/data/merged/*.html")):
+        with open(file_path, encoding="utf-8") as file:
+            merged[os.path.basename(file_path)] = file.read()
+
+    return merged
+
+def test_processes_merge_like_the_threads(merge_workdir):
+    assert merge(merge_workdir) == {"merged": 112}
+
+    merged = read_merged(merge_workdir)
+
+    shutil.rmtree(f"{merge_workdir}/data/merged/")
+
+    assert merge(merge_workdir, "--processes", "2") == {"merged": 112}
+
+    assert read_merged(merge_workdir) == merged
@@ -0,0 +1,15 @@
+import pytest
+
+from main import PARSER, BibleGatewayScraper, ScraperOptions
+
+def test_options_from_args():
+    assert ScraperOptions.from_args(PARSER.parse_args([])) == ScraperOptions(include_html=False)
+
+    options = ScraperOptions.from_args(PARSER.parse_args(["--html", "-e", "async", "-v", "KJV", "NIV", "-bp", "./blobs/"]))
+
+    assert options.include_html and options.engine == "async" and options.version_ids == ["KJV", "NIV"]
+
+    assert options.blobs_path == "./blobs/"
+
+def test_thread_engine_needs_patching():
+    with pytest.raises(RuntimeError, match="patch_thread_engine"): BibleGatewayScraper(ScraperOptions(engine="thread"))
@@ -0,0 +1,19 @@
+import pytest
+
+from utils import parse_page, cut_passage, PARSER_BACKENDS
+
+def get_passage(page: str, backend: str, passage_only: bool) -> str:
+    return parse_page(page, backend, passage_only).select_one("div.passage-text").__repr__()
+
+@pytest.mark.parametrize("backend", PARSER_BACKENDS)
+@pytest.mark.parametrize("passage_only", [False, True])
+def test_parser_backends_match(pages, backend, passage_only):
+    for page in pages:
+        assert get_passage(page, backend, passage_only) == get_passage(page, "html.parser", False)
+
+def test_cut_passage():
+    page = '<div class="nav"><div>menu</div></div><div class="passage-text"><div><p>text</p></div></div><div>ad</div>'
+
+    assert cut_passage(page) == '<div class="passage-text"><div><p>text</p></div></div>'
+
+    assert cut_passage('<div class="no-passage"></div>') is None
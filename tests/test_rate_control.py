@@ -0,0 +1,74 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils import TokenBucket, ConcurrencyLimiter, get_backoff, parse_retry_after
+
+def test_bucket_spends_the_burst_then_paces():
+    bucket = TokenBucket(10, burst=2)
+
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01) and bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+    assert TokenBucket(0).reserve() == 0.0
+
+def test_bucket_refills():
+    bucket = TokenBucket(100, burst=1)
+
+    bucket.reserve()
+
+    time.sleep(0.05)
+
+    assert bucket.reserve() == 0.0
+
+def test_limiter_grows_by_one_per_round_trip():
+    limiter = ConcurrencyLimiter(8, initial=2)
+
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.05]
+
+    [limiter.release(0.1) for _ in range(2)]
+
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5) and limiter.in_flight == 0
+
+def test_limiter_backs_off_once_per_cooldown():
+    limiter = ConcurrencyLimiter(16, initial=16, cooldown=60)
+
+    [limiter.acquire() for _ in range(3)]
+
+    limiter.release(0.1)
+
+    limiter.release(failed=True)
+
+    limiter.release(failed=True)
+
+    assert limiter.limit == 8
+
+def test_limiter_backs_off_on_slow_responses():
+    limiter = ConcurrencyLimiter(16, initial=16, min_limit=6, cooldown=0)
+
+    [limiter.acquire() for _ in range(3)]
+
+    [limiter.release(latency) for latency in [0.1, 1.0, 1.0]]
+
+    assert limiter.limit == 6
+
+def test_retry_after_pauses_every_request():
+    limiter = ConcurrencyLimiter(4)
+
+    limiter.acquire()
+
+    limiter.release(failed=True, retry_after=5)
+
+    assert 4.5 < limiter.acquire() <= 5
+
+def test_backoff_and_retry_after():
+    assert all(0 <= get_backoff(attempt, 0.5, 4) <= min(4, 0.5 * 2 ** attempt) for attempt in range(10))
+
+    assert parse_retry_after("120") == 120 and parse_retry_after("soon") is None and parse_retry_after(None) is None
+
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+    assert 25 < parse_retry_after(date) <= 30
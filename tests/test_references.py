@@ -0,0 +1,38 @@
+import pytest
+
+from utils import parse_reference, get_reference_table
+
+@pytest.mark.parametrize("reference, book, chapters", [
+    ("Genesis", "Genesis", range(1, 51)),
+    ("genesis 3", "Genesis", range(3, 4)),
+    ("Gen 1-3", "Genesis", range(1, 4)),
+    ("Gen 1 – 3", "Genesis", range(1, 4)),
+    ("  Exod.  40 ", "Exodus", range(40, 41)),
+    ("1 Kgs 7", "1 Kings", range(7, 8)),
+    ("1Kgs 7", "1 Kings", range(7, 8)),
+    ("2 Sam", "2 Samuel", range(1, 25)),
+    ("Psalms 119", "Psalm", range(119, 120)),
+    ("Ps 150", "Psalm", range(150, 151)),
+    ("Song of Songs 2", "Song of Solomon", range(2, 3)),
+    ("Jn 3", "John", range(3, 4)),
+    ("1 John 5", "1 John", range(5, 6)),
+    ("Phil 4", "Philippians", range(4, 5)),
+    ("Phlm", "Philemon", range(1, 2)),
+    ("Revelations 22", "Revelation", range(22, 23)),
+    ("Obadiah", "Obadiah", range(1, 2)),
+])
+def test_parse_reference(reference, book, chapters):
+    parsed = parse_reference(reference)
+
+    assert (parsed.book.name, parsed.chapters) == (book, chapters)
+
+@pytest.mark.parametrize("reference", ["", "3", "Hezekiah 1", "Genesis 0", "Genesis 51", "Gen 3-1", "Jude 2", "Gen 1-51"])
+def test_parse_reference_errors(reference):
+    with pytest.raises(ValueError):
+        parse_reference(reference)
+
+def test_book_verse_counts():
+    """The book-level estimates of the scheduler cover every book with the KJV verse counts"""
+    books = get_reference_table().books
+
+    assert all(book.num_verses > book.num_chapters for book in books) and sum(book.num_verses for book in books) == 31102
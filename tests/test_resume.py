@@ -0,0 +1,24 @@
+import glob
+
+from benchmarks.server import PassageServer
+from benchmarks.suite import run_process, count_chapters
+from utils import Manifest
+
+def scrape(server: PassageServer, workdir: str, reference: str) -> int:
+    """Scrapes the chapters in html mode with --resume, returns the requests made"""
+    requests = server.requests
+
+    run_process(["main.py", "-b", reference, "-v", "KJV", "-c", "off", "-u", server.url, "--html", "--resume"], workdir)
+
+    return server.requests - requests
+
+def test_resume_scrapes_missing_chapters(server, workdir):
+    assert scrape(server, workdir, "Genesis 1-2") == 2
+
+    assert scrape(server, workdir, "Genesis 1-4") == 2
+
+    assert scrape(server, workdir, "Genesis 1-4") == 0
+
+    assert Manifest(f"{workdir}/data/manifest.db").get_completed() == {("KJV", "Genesis", c) for c in range(1, 5)}
+
+    assert count_chapters(workdir) == 4 and len(glob.glob(f"{workdir}/data/html/*.html")) == 4
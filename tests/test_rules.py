@@ -0,0 +1,20 @@
+import copy
+import json
+
+from bs4 import BeautifulSoup
+
+from utils import TagRules, parse_page
+
+def test_rules_match_sequential(pages):
+    """The compiled rules rewrite the passages like the rules applied one after the other"""
+    with open("./settings/settings.json", "r") as file:
+        rules = TagRules(json.load(file))
+
+    for page in pages:
+        soup = BeautifulSoup(parse_page(page, "html.parser", True).select_one("div.passage-text").__repr__(), "html.parser").find()
+
+        expected = copy.copy(soup)
+
+        assert rules.apply(soup) == rules.apply_sequential(expected)
+
+        assert soup.__repr__() == expected.__repr__()
@@ -0,0 +1,92 @@
+import csv
+import glob
+from typing import Iterator
+
+import pytest
+
+from benchmarks.suite import run_process
+from utils import SearchIndex, get_text_verses, parse_query
+from utils.search import tokenize
+
+CHAPTERS = [
+    ("Genesis", 1, "a", [(1, "In the beginning God created the heaven and the earth."),
+                         (2, "And the earth was without form, and void.")]),
+    ("Genesis", 5, "b", [(3, "And Adam lived an hundred and thirty years.")]),
+    ("Exodus", 20, "c", [(3, "Thou shalt have no other gods before me.")]),
+]
+
+@pytest.fixture
+def index(tmp_path) -> Iterator[SearchIndex]:
+    index = SearchIndex(f"{tmp_path}/")
+
+    index.open("KJV").update(CHAPTERS)
+
+    index.open("NIV").update([("Genesis", 1, "d", [(1, "In the beginning God created the heavens and the earth.")])])
+
+    yield index
+
+    index.close()
+
+def search(index: SearchIndex, query: str, version_ids: list[str]=None) -> list[str]:
+    return [f"{hit.key} {hit.version_id}" for hit in index.search(query, version_ids)[1]]
+
+def test_parse_query():
+    assert parse_query('"The Earth" god ""  heaven,') == [["the", "earth"], ["god"], ["heaven"]]
+
+def test_words_and_phrases(index):
+    assert search(index, "earth") == ["Gen-1-1 KJV", "Gen-1-2 KJV", "Gen-1-1 NIV"]
+
+    assert search(index, '"the earth" heaven') == ["Gen-1-1 KJV"]
+
+    assert search(index, '"earth the"') == [] and search(index, "earth adam") == []
+
+    assert search(index, "beginning", ["niv"]) == ["Gen-1-1 NIV"]
+
+def test_update_replaces_the_chapter(index):
+    index.open("KJV").update([("Genesis", 1, "e", [(1, "In the beginning was the Word.")])])
+
+    assert search(index, "earth", ["KJV"]) == []
+
+    assert search(index, "word") == ["Gen-1-1 KJV"]
+
+    assert index.open("KJV").get_hashes()[("Genesis", 1)] == "e"
+
+    index.open("KJV").compact()
+
+    assert search(index, "word") == ["Gen-1-1 KJV"] and search(index, "gods") == ["Exod-20-3 KJV"]
+
+    assert index.search("the", ["KJV"], limit=1)[0] == 1
+
+def test_text_verses_from_the_verse_output():
+    text = "In the beginning God created. 2 And the earth was void for 3 days. 3 And God said"
+
+    assert get_text_verses(text) == [(1, "In the beginning God created."), (2, "And the earth was void for"),
+                                     (3, "days. 3 And God said")]
+
+    verses = [(1, "In the beginning God created."), (2, "And the earth was void for 3 days."), (3, "And God said"), (4, "")]
+
+    assert get_text_verses(text, verses) == verses[:3]
+
+def test_indexer_reads_the_verse_output(server, workdir):
+    """The text content of a chapter is split at the verses of the verse level output saved with it"""
+    run_process(["main.py", "-b", "Genesis 1-3", "-v", "KJV", "-c", "off", "-u", server.url, "--verses"], workdir)
+
+    run_process(["indexer.py"], workdir)
+
+    expected = []
+
+    for file_path in glob.glob(f"{workdir}/data/verses/*.csv"):
+        with open(file_path, encoding="utf-8", newline="") as file:
+            expected += [(row["Book"], int(row["Chapter"]), int(row["Verse"]), row["Content"]) for row in csv.DictReader(file)]
+
+    index = SearchIndex(f"{workdir}/data/index/")
+
+    total, hits = index.search("the", limit=1000)
+
+    expected = [verse for verse in expected if "the" in tokenize(verse[3])]
+
+    assert len(expected) > 60 and total == len(expected)
+
+    assert sorted((hit.book, hit.chapter, hit.verse, hit.text) for hit in hits) == sorted(expected)
+
+    index.close()
@@ -0,0 +1,82 @@
+import csv
+import sqlite3
+from typing import Any
+
+import pytest
+
+from utils import CsvSink, ParquetSink, SqliteSink
+
+COLUMNS = {"version": "Version", "version_id": "ID", "book": "Book", "chapter": "Chapter", "content": "Content"}
+
+def get_row(book: str, chapter: int, content: str, chapter_title: str=None) -> dict[str, Any]:
+    """A chapters row, with its columns in the order of the scraper rows"""
+    row = {"version": "King James Version", "version_id": "KJV", "book": book, "chapter": chapter}
+
+    if chapter_title is not None: row["chapter_title"] = chapter_title
+
+    return {**row, "content": content}
+
+def read_csv(file_path: str) -> list[tuple[str, str, str]]:
+    with open(file_path, encoding="utf-8", newline="") as file:
+        return [(row["Book"], row["Chapter"], row["Content"]) for row in csv.DictReader(file)]
+
+def test_csv_is_sorted_in_book_order(tmp_path):
+    sink = CsvSink({"chapters": (f"{tmp_path}/", COLUMNS)}, "2024-03-01.csv", "never",
+                   book_order=["Genesis", "Exodus"])
+
+    sink.write("chapters", [get_row("Exodus", 1, "a"), get_row("Genesis", 10, "b")])
+
+    sink.write("chapters", [get_row("Genesis", 2, "c")])
+
+    sink.close()
+
+    assert read_csv(f"{tmp_path}/KJV_2024-03-01.csv") == [("Genesis", "2", "c"), ("Genesis", "10", "b"), ("Exodus", "1", "a")]
+
+@pytest.mark.parametrize("append_existing", [False, True])
+def test_csv_appends_to_existing_file(tmp_path, append_existing):
+    for content in ["a", "b"]:
+        sink = CsvSink({"chapters": (f"{tmp_path}/", COLUMNS)}, "2024-03-01.csv", "never", append_existing)
+
+        sink.write("chapters", [get_row("Genesis", 1, content)])
+
+        sink.close()
+
+    expected = [("Genesis", "1", "a"), ("Genesis", "1", "b")] if append_existing else [("Genesis", "1", "b")]
+
+    assert read_csv(f"{tmp_path}/KJV_2024-03-01.csv") == expected
+
+def test_parquet_keeps_the_last_row_of_a_chapter(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    sink = ParquetSink(f"{tmp_path}/")
+
+    row = get_row("Genesis", 2, "a", "The Garden")
+
+    sink.write("chapters", [row, {**row, "chapter": 1}])
+
+    sink.write("chapters", [{**row, "content": "b"}])
+
+    sink.close()
+
+    table = pq.read_table(f"{tmp_path}/chapters/KJV/Genesis/")
+
+    assert [(row["chapter"], row["content"]) for row in table.to_pylist()] == [(1, "a"), (2, "b")]
+
+def test_sqlite_replaces_chapters_and_inlines_html(tmp_path):
+    (tmp_path / "html").mkdir()
+
+    (tmp_path / "html" / "KJV_Genesis_1.html").write_text("<p>In the beginning</p>", encoding="utf-8")
+
+    sink = SqliteSink(f"{tmp_path}/scraped.db", f"{tmp_path}/html/")
+
+    row = get_row("Genesis", 1, "KJV_Genesis_1.html", "The Beginning")
+
+    sink.write("chapters", [row])
+
+    sink.write("chapters", [{**row, "chapter_title": "The Creation"}])
+
+    sink.close()
+
+    with sqlite3.connect(f"{tmp_path}/scraped.db") as connection:
+        assert connection.execute("SELECT chapter_title, html FROM chapters").fetchall() == [
+            ("The Creation", "<p>In the beginning</p>")]
@@ -0,0 +1,79 @@
+import json
+import glob
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+from benchmarks.suite import run_process
+from utils import VerseStore, StoredChapter, write_store
+from verse_server import VerseLookup, VerseServer
+
+CHAPTERS = [
+    StoredChapter("Genesis", 1, "The Creation", [(1, "In the beginning."), (2, "And the earth."), (4, "And God saw.")],
+                  "<p>In the beginning.</p>"),
+    StoredChapter("Exodus", 20, None, [(1, "And God spake.")], None),
+]
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_chapters_are_read_back(tmp_path, compress):
+    assert write_store(f"{tmp_path}/KJV.verses", "King James Version", "KJV", CHAPTERS, compress) == 2
+
+    store = VerseStore(f"{tmp_path}/KJV.verses")
+
+    assert store.version_id == "KJV" and store.get_chapters() == [("Genesis", 1), ("Exodus", 20)]
+
+    assert store.get_title("Gen", 1) == "The Creation" and store.get_fragment("Genesis", 1) == "<p>In the beginning.</p>"
+
+    assert store.get_title("Exodus", 20) is None and store.get_fragment("Exodus", 20) is None
+
+    assert store.get_verses("Genesis", 1) == CHAPTERS[0].verses
+
+    assert store.get_verses("Genesis", 1, 2, 3) == [(2, "And the earth.")] and store.get_verses("Genesis", 1, 5) == []
+
+    assert store.get_verses("Genesis", 2) is None and store.get_verses("Genesis", 51) is None
+
+    store.close()
+
+def test_other_files_are_refused(tmp_path):
+    (tmp_path / "KJV.verses").write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError): VerseStore(f"{tmp_path}/KJV.verses")
+
+def get(url: str) -> tuple[int, bytes]:
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+def test_server_serves_the_scraped_chapters(server, workdir):
+    """The verses are the ones the indexer reads and the chapters are merged like the merger does"""
+    run_process(["main.py", "-b", "Genesis 1-2", "-v", "KJV", "NIV", "-c", "off", "-u", server.url, "--html"], workdir)
+
+    run_process(["verse_server.py", "--build"], workdir)
+
+    run_process(["merger.py"], workdir)
+
+    verse_server = VerseServer(0, VerseLookup(f"{workdir}/data/store/")).start()
+
+    status, body = get(f"{verse_server.url}/verses?version=kjv&book=Gen&chapter=1&verses=1-2")
+
+    verses = json.loads(body)
+
+    assert status == 200 and verses["book"] == "Genesis" and verses["version_id"] == "KJV"
+
+    assert [verse["verse"] for verse in verses["verses"]] == [1, 2]
+
+    assert verses["verses"][0]["text"] == "In the beginning God created the heaven and the earth."
+
+    with open(glob.glob(f"{workdir}/data/merged/*genesis2.html")[0], encoding="utf-8") as file:
+        assert get(f"{verse_server.url}/chapter?book=Genesis&chapter=2") == (200, file.read().encode("utf-8"))
+
+    assert get(f"{verse_server.url}/verses?version=KJV&book=Genesis&chapter=3")[0] == 404
+
+    assert get(f"{verse_server.url}/verses?version=KJV&book=Genesis&chapter=one")[0] == 400
+
+    verse_server.shutdown()
+
+    verse_server.lookup.close()
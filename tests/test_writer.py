@@ -0,0 +1,72 @@
+import time
+from typing import Any
+
+import pytest
+
+from utils import Writer
+
+class ListSink:
+    """Keeps the rows written, failing on the tables in fail_on"""
+    def __init__(self, fail_on: list[str]=None) -> None:
+        self.fail_on = fail_on or []
+        self.rows: list[tuple[str, dict[str, Any]]] = []
+        self.closed = False
+
+    def get_path(self, table: str, row: dict[str, Any]) -> str:
+        return f"{table}/{row['version_id']}"
+
+    def write(self, table: str, rows: list[dict[str, Any]]) -> None:
+        if table in self.fail_on: raise OSError(f"Failed to write {table}")
+
+        self.rows += [(table, row) for row in rows]
+
+    def close(self) -> None:
+        self.closed = True
+
+def get_row(chapter: int) -> dict[str, Any]:
+    return {"version_id": "KJV", "book": "Genesis", "chapter": chapter}
+
+def test_rows_are_saved_in_batches():
+    sink, saved = ListSink(), []
+
+    writer = Writer([sink], batch_size=2, flush_interval=60, on_saved=saved.append)
+
+    [writer.put("chapters", get_row(chapter), chapter) for chapter in range(1, 4)]
+
+    writer.put("verses", get_row(1))
+
+    writer.close()
+
+    assert [row["chapter"] for _, row in sink.rows] == [1, 2, 3, 1] and sink.closed
+
+    assert saved == [[1, 2], [3]]
+
+    assert writer.get_path("chapters", get_row(1)) == "chapters/KJV"
+
+def test_rows_are_flushed_every_interval():
+    sink = ListSink()
+
+    writer = Writer([sink], batch_size=100, flush_interval=0.05)
+
+    writer.put("chapters", get_row(1))
+
+    time.sleep(0.5)
+
+    assert len(sink.rows) == 1
+
+    writer.close()
+
+def test_sink_error_is_raised_on_close():
+    sink, failing_sink, saved = ListSink(), ListSink(["verses"]), []
+
+    writer = Writer([sink, failing_sink], batch_size=100, flush_interval=60, on_saved=saved.append)
+
+    writer.put("chapters", get_row(1), "chapter")
+
+    writer.put("verses", get_row(1), "verse")
+
+    with pytest.raises(OSError, match="Failed to write verses"): writer.close()
+
+    assert len(sink.rows) == 2 and len(failing_sink.rows) == 1 and failing_sink.closed
+
+    assert saved == [["chapter"]]
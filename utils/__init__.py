@@ -1,2 +1,18 @@
 from .logger import Logger
-from .data import VERSIONS, BOOKS
\ No newline at end of file
+from .cache import ResponseCache, CachedResponse, CACHE_PATH
+from .manifest import Manifest, MANIFEST_PATH
+from .rules import TagRules
+from .parsing import parse_page, cut_passage, PARSER_BACKENDS
+from .writer import Writer
+from .blobs import BlobStore, get_blob_store, read_chapter_html, BLOBS_PATH, CODECS
+from .sinks import CsvSink, ParquetSink, SqliteSink, SINKS, FSYNC_POLICIES, PARQUET_PATH, SQLITE_PATH
+from .fragments import FragmentCache, render_fragment, FRAGMENTS_PATH
+from .merge_state import MergeState, MERGE_STATE_PATH
+from .rate_control import TokenBucket, ConcurrencyLimiter, get_backoff, parse_retry_after
+from .metrics import Metrics, Histogram, profile, METRICS_PATH
+from .data import VERSIONS, BOOKS
+from .references import ReferenceTable, Reference, get_reference_table, parse_reference
+from .search import SearchIndex, VersionIndex, Hit, get_html_verses, get_text_verses, parse_query, INDEX_PATH
+from .verse_store import VerseStore, StoredChapter, write_store, STORE_PATH
+from .jobs import JobQueue, Job, FinishedJob, JOBS_PATH
+from .extract import ChapterExtractor, ExtractedChapter, ParseWorker
\ No newline at end of file
@@ -0,0 +1,199 @@
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, Optional
+
+BLOBS_PATH = "./data/blobs/"
+
+CODECS = ["none", "gzip", "zstd"]
+
+EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+BLOB_STORES: dict[tuple[int, str], "BlobStore"] = {}
+
+BLOB_STORES_LOCK = threading.Lock()
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "gzip": return gzip.compress(data, mtime=0)
+
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=10).compress(data)
+
+    return data
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "gzip": return gzip.decompress(data)
+
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return data
+
+class BlobStore:
+    """Content-addressed store of the chapter html: each distinct html is saved once, compressed,
+    as <path>/<key[:2]>/<key> where key is its sha1. The dated file names (e.g. NIV_Exodus_4_2024-03-04.html)
+    are references to the keys kept in a sqlite database, so a snapshot that didn't change costs a row"""
+    def __init__(self, path: Optional[str]=BLOBS_PATH, codec: Optional[str]="gzip") -> None:
+        if not os.path.exists(path): os.makedirs(path)
+
+        if codec not in CODECS: raise ValueError(f"Unknown codec <{codec}>, use one of {', '.join(CODECS)}")
+
+        self.path = path
+        self.codec = codec
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(f"{path}blobs.db", timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS blobs (
+            key TEXT PRIMARY KEY, codec TEXT, size INTEGER, stored_size INTEGER, created REAL)""")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS refs (name TEXT PRIMARY KEY, key TEXT, created REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS refs_key ON refs (key)")
+
+    def get_blob_path(self, key: str, codec: str) -> str:
+        return f"{self.path}{key[:2]}/{key}{EXTENSIONS[codec]}"
+
+    def __write(self, key: str, data: bytes) -> None:
+        """Writes a compressed blob and its row, within the transaction of put"""
+        blob, blob_path = compress(data, self.codec), self.get_blob_path(key, self.codec)
+
+        if not os.path.exists(os.path.dirname(blob_path)): os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        with open(f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp", "wb") as file:
+            file.write(blob)
+
+        os.replace(f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp", blob_path)
+
+        self.connection.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                                (key, self.codec, len(data), len(blob), time.time()))
+
+    def put(self, html: str, name: Optional[str]=None) -> str:
+        """Stores the html unless a blob with the same content exists, and points the name at it. Returns its key"""
+        data = html.encode("utf-8")
+
+        key = hashlib.sha1(data).hexdigest()
+
+        with self.lock:
+            # The blob is looked up, written and referenced in one write transaction,
+            # so a collect (in this process or another one) can't delete it in between
+            self.connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                stored = self.connection.execute("SELECT codec FROM blobs WHERE key = ?", (key,)).fetchone()
+
+                if stored is None or not os.path.exists(self.get_blob_path(key, stored[0])): self.__write(key, data)
+
+                if name is not None: self.connection.execute("INSERT OR REPLACE INTO refs VALUES (?, ?, ?)", (name, key, time.time()))
+
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+
+                raise
+
+        return key
+
+    def get(self, key: str) -> str:
+        """Returns the html of a blob. Raises FileNotFoundError if there is none"""
+        with self.lock:
+            stored = self.connection.execute("SELECT codec FROM blobs WHERE key = ?", (key,)).fetchone()
+
+        if stored is None: raise FileNotFoundError(f"No blob {key} in {self.path}")
+
+        with open(self.get_blob_path(key, stored[0]), "rb") as file:
+            return decompress(file.read(), stored[0]).decode("utf-8")
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Returns the key a name refers to"""
+        with self.lock:
+            ref = self.connection.execute("SELECT key FROM refs WHERE name = ?", (name,)).fetchone()
+
+        return ref[0] if ref else None
+
+    def read(self, name: str) -> str:
+        """Returns the html a name refers to. Raises FileNotFoundError if it refers to nothing"""
+        key = self.resolve(name)
+
+        if key is None: raise FileNotFoundError(f"No reference {name} in {self.path}")
+
+        return self.get(key)
+
+    def get_names(self) -> list[str]:
+        with self.lock:
+            return [name for (name,) in self.connection.execute("SELECT name FROM refs")]
+
+    def get_stats(self) -> dict[str, int]:
+        """Returns the references, the blobs and their size before and after compression"""
+        with self.lock:
+            refs = self.connection.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+
+            blobs, size, stored_size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+
+        return {"refs": refs, "blobs": blobs, "size": size, "stored_size": stored_size}
+
+    def collect(self, live_names: Iterable[str], dry_run: Optional[bool]=False, 
+                before: Optional[float]=None) -> tuple[int, int, int]:
+        """Deletes the references that aren't live, then the blobs no reference points to.
+        With before, the references created since (e.g. by a scrape running meanwhile) are kept too.
+        Returns the references and blobs deleted (or that would be) and the bytes freed"""
+        live_names, before = set(live_names), time.time() if before is None else before
+
+        with self.lock:
+            # The references are read again in a write transaction, a put waits for it to end
+            self.connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                refs = self.connection.execute("SELECT name, key, created FROM refs").fetchall()
+
+                blobs = self.connection.execute("SELECT key, codec, stored_size FROM blobs").fetchall()
+
+                dead_refs = [name for name, _, created in refs if name not in live_names and created < before]
+
+                live_keys = {key for name, key, created in refs if name in live_names or created >= before}
+
+                dead_blobs = [(key, codec, stored_size) for key, codec, stored_size in blobs if key not in live_keys]
+
+                if not dry_run:
+                    self.connection.executemany("DELETE FROM refs WHERE name = ?", [(name,) for name in dead_refs])
+                    self.connection.executemany("DELETE FROM blobs WHERE key = ?", [(key,) for key, _, _ in dead_blobs])
+
+                    # Before the commit: once it's done a put could write the same blob again
+                    for key, codec, _ in dead_blobs:
+                        if os.path.exists(self.get_blob_path(key, codec)): os.remove(self.get_blob_path(key, codec))
+
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+
+                raise
+
+        return len(dead_refs), len(dead_blobs), sum(stored_size for _, _, stored_size in dead_blobs)
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+def get_blob_store(path: Optional[str]=BLOBS_PATH) -> BlobStore:
+    """Returns the blob store at path of the current process, the connection of a parent isn't used after a fork"""
+    key = (os.getpid(), path)
+
+    with BLOB_STORES_LOCK:
+        if key not in BLOB_STORES: BLOB_STORES[key] = BlobStore(path)
+
+        return BLOB_STORES[key]
+
+def read_chapter_html(file_path: str, blobs_path: Optional[str]=BLOBS_PATH) -> str:
+    """Reads a chapter html file, or the blob its name refers to in the store at blobs_path when the file isn't there"""
+    if os.path.exists(file_path):
+        with open(file_path, encoding="utf-8") as file:
+            return file.read()
+
+    return get_blob_store(blobs_path).read(os.path.basename(file_path))
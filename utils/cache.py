@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import dataclasses
+from typing import Optional
+
+CACHE_PATH = "./data/cache/"
+
+@dataclasses.dataclass
+class CachedResponse:
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+class ResponseCache:
+    """Stores compressed responses on disk keyed by the request params"""
+    def __init__(self, path: Optional[str]=CACHE_PATH, max_size: Optional[int]=512 * 1024 * 1024) -> None:
+        if not os.path.exists(path): os.makedirs(path)
+
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(f"{path}responses.db", check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, params TEXT, etag TEXT, last_modified TEXT,
+            body BLOB, size INTEGER, accessed REAL)""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS accessed_index ON responses (accessed)")
+        self.connection.commit()
+
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def get_key(params: dict[str, str]) -> str:
+        """Returns the cache key of the given request params"""
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def get(self, params: dict[str, str]) -> Optional[CachedResponse]:
+        """Returns the cached response of the params, marking it as recently used"""
+        key = self.get_key(params)
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, etag, last_modified FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None: return
+
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+
+        body, etag, last_modified = row
+
+        return CachedResponse(zlib.decompress(body).decode("utf-8"), etag, last_modified)
+
+    def put(self, params: dict[str, str], text: str,
+            etag: Optional[str]=None, last_modified: Optional[str]=None) -> None:
+        """Compresses and stores a response, evicting the least recently used ones over the size cap"""
+        key, body = self.get_key(params), zlib.compress(text.encode("utf-8"))
+
+        with self.lock:
+            row = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+
+            self.size += len(body) - (row[0] if row else 0)
+
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (key, json.dumps(params, sort_keys=True), etag,
+                                     last_modified, body, len(body), time.time()))
+
+            self.__evict()
+
+            self.connection.commit()
+
+    def __evict(self) -> None:
+        """Removes the least recently used responses until the cache fits in max_size"""
+        while self.size > self.max_size:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 100").fetchall()
+
+            if not rows: break
+
+            for key, size in rows:
+                if self.size <= self.max_size: break
+
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+                self.size -= size
+
+    def close(self) -> None:
+        """Closes the cache database"""
+        with self.lock:
+            self.connection.close()
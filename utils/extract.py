@@ -0,0 +1,591 @@
+import re
+import sys
+import copy
+import time
+import pickle
+import select
+import hashlib
+import subprocess
+from html.parser import HTMLParser
+from typing import Any, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.dammit import EntitySubstitution
+
+from .rules import TagRules
+from .parsing import parse_page, cut_passage
+
+VERSE_CLASS_RE = re.compile(r"^\w+-(\d+)-(\d+)$")
+
+NOTE_REFERENCE_RE = re.compile(r"(\d+):\d+")
+
+NOTE_CLASSES = ["footnotes", "crossrefs"]
+
+SPACES_RE = re.compile(" {2,}")
+
+# The tags the tree closes as soon as they open
+EMPTY_ELEMENT_TAGS = {"area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image",
+                      "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source",
+                      "spacer", "track", "wbr"}
+
+# The tags whose strings the tree keeps apart from the text (scripts, ruby text) or doesn't collapse (pre)
+UNSUPPORTED_TAGS = {"script", "style", "template", "rt", "rp", "pre", "textarea"}
+
+ASCII_SPACES = " \n\t\x0c\r"
+
+# The characters of a page fed at once to the streaming parser, the rest of the page is skipped after the passage
+FEED_SIZE = 16384
+
+class ExtractedChapter(NamedTuple):
+    chapter: int
+    title: Optional[str]
+    content: Optional[str]
+    content_hash: Optional[str]
+    verses: list[Tuple[int, str]]
+    not_found: list[str]
+
+class PassageTextParser(HTMLParser):
+    """Streams over the markup of a page and collects what ChapterExtractor gets from the tree in text mode:
+    the title (the first h3) and the (verse, verse number prefix, text) of every span.text in the passage
+    paragraphs, without the first chapter number and the first cross reference of each verse. It keeps
+    the stack of open tags the tree would have and its strings, but no tree. unsupported is set on markup
+    it can't mirror exactly (nested paragraphs or verse spans, scripts, pre...), the tree is needed then"""
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+
+        self.stack: list[str] = []
+        self.data: list[str] = []
+        self.found = False
+        self.done = False
+        self.unsupported = False
+
+        # Where the passage, the title, the paragraph, the verse span, the verse number and the dropped tag
+        # (chapter number or cross reference) being read start in the stack
+        self.passage_at: Optional[int] = None
+        self.title_at: Optional[int] = None
+        self.paragraph_at: Optional[int] = None
+        self.span_at: Optional[int] = None
+        self.verse_num_at: Optional[int] = None
+        self.dropped_at: Optional[int] = None
+
+        self.title: Optional[str] = None
+        self.title_strings: list[str] = []
+        self.chapter_num_found = False
+        self.span: Optional[tuple[Optional[int], list[str], Optional[list[str]], bool]] = None
+        self.verse_texts: list[tuple[Optional[int], str, str]] = []
+
+    @staticmethod
+    def __get_classes(attrs: list[tuple[str, Optional[str]]]) -> list[str]:
+        return (dict(attrs).get("class") or "").split()
+
+    def __flush(self) -> None:
+        """Hands the string ended by a tag to the title and the verse being read. Like the tree, a string
+        of spaces only becomes a single newline or space"""
+        if not self.data: return
+
+        data, self.data = "".join(self.data), []
+
+        if self.passage_at is None or self.done: return
+
+        if not data.strip(ASCII_SPACES): data = "\n" if "\n" in data else " "
+
+        if self.title_at is not None: self.title_strings.append(data)
+
+        if self.dropped_at is not None or self.span is None: return
+
+        self.span[2 if self.verse_num_at is not None else 1].append(data)
+
+    def __close(self, index: int) -> None:
+        """Ends the parts read that start at index or deeper in the stack"""
+        if self.verse_num_at is not None and self.verse_num_at >= index: self.verse_num_at = None
+
+        if self.dropped_at is not None and self.dropped_at >= index: self.dropped_at = None
+
+        if self.span_at is not None and self.span_at >= index:
+            verse, strings, verse_num, _ = self.span
+
+            verse_num = "".join(s.strip() for s in verse_num) + " " if verse_num is not None else ""
+
+            self.verse_texts.append((verse, verse_num, "".join(strings).strip().replace("\n", "")))
+
+            self.span_at, self.span = None, None
+
+        if self.paragraph_at is not None and self.paragraph_at >= index: self.paragraph_at = None
+
+        if self.title_at is not None and self.title_at >= index:
+            self.title = "".join(s.strip() for s in self.title_strings).encode("ascii", errors="ignore").decode()
+
+            self.title_at = None
+
+        if self.passage_at is not None and self.passage_at >= index: self.done = True
+
+    def __open_passage_tag(self, tag: str, attrs: list[tuple[str, Optional[str]]], index: int) -> None:
+        if tag in UNSUPPORTED_TAGS: self.unsupported = True
+
+        if tag == "h3" and self.title is None and self.title_at is None: self.title_at = index
+
+        if tag not in ["p", "span", "sup"]: return
+
+        classes = self.__get_classes(attrs)
+
+        if tag == "p" or (tag == "span" and "text" in classes):
+            if self.span_at is not None or self.dropped_at is not None or (tag == "p" and self.paragraph_at is not None):
+                self.unsupported = True
+            elif tag == "p":
+                self.paragraph_at = index
+            elif self.paragraph_at is not None:
+                verse = next((int(match.group(2)) for class_name in classes
+                              if (match := VERSE_CLASS_RE.match(class_name))), None)
+
+                self.span_at, self.span = index, (verse, [], None, False)
+
+        if tag == "span" and "chapternum" in classes and not self.chapter_num_found:
+            if "text" in classes: self.unsupported = True
+
+            self.chapter_num_found = True
+
+            if self.dropped_at is None: self.dropped_at = index
+
+        if tag != "sup" or self.span is None or self.dropped_at is not None: return
+
+        verse, strings, verse_num, cross_reference_found = self.span
+
+        if "crossreference" in classes and not cross_reference_found:
+            self.span, self.dropped_at = (verse, strings, verse_num, True), index
+        elif "versenum" in classes and verse_num is None:
+            self.span, self.verse_num_at = (verse, strings, [], cross_reference_found), index
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self.__flush()
+
+        if self.done or tag in EMPTY_ELEMENT_TAGS: return
+
+        index = len(self.stack)
+
+        self.stack.append(tag)
+
+        if self.passage_at is not None:
+            self.__open_passage_tag(tag, attrs, index)
+        elif tag == "div" and "passage-text" in self.__get_classes(attrs):
+            self.passage_at, self.found = index, True
+
+    def handle_endtag(self, tag: str) -> None:
+        """Closes the tag and the tags left open inside it, an end tag without an open tag is ignored"""
+        self.__flush()
+
+        if self.done or tag in EMPTY_ELEMENT_TAGS or tag not in self.stack: return
+
+        index = len(self.stack) - 1 - self.stack[::-1].index(tag)
+
+        del self.stack[index:]
+
+        self.__close(index)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attrs)
+
+        self.handle_endtag(tag)
+
+    def handle_data(self, data: str) -> None:
+        self.data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        """Same as the tree: a code point below 256 is read as windows-1252"""
+        try:
+            code_point = int(name.lstrip("xX"), 16) if name[0] in "xX" else int(name)
+        except ValueError:
+            code_point = -1
+
+        data = None
+
+        if 0 <= code_point < 256:
+            try:
+                data = bytearray([code_point]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+
+        if not data:
+            try:
+                data = chr(code_point)
+            except (ValueError, OverflowError):
+                pass
+
+        self.data.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name: str) -> None:
+        self.data.append(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name, f"&{name}"))
+
+    def handle_comment(self, data: str) -> None:
+        self.__flush()
+
+    def handle_decl(self, decl: str) -> None:
+        self.__flush()
+
+    def handle_pi(self, data: str) -> None:
+        self.__flush()
+
+    def unknown_decl(self, data: str) -> None:
+        self.__flush()
+
+        if self.passage_at is not None and not self.done: self.unsupported = True
+
+    def close(self) -> None:
+        """Ends the page, the tags left open are closed"""
+        super().close()
+
+        self.__flush()
+
+        self.__close(0)
+
+class ChapterExtractor:
+    """Parses a passage page and extracts the title, the html (the tag rules applied) or text and the verses
+    of its chapters. It holds no state between pages, so it can run in a parse worker process"""
+    def __init__(self, tag_settings: list[dict[str, Any]], include_html: Optional[bool]=True,
+                 verse_output: Optional[bool]=False, parser_backend: Optional[str]="html.parser",
+                 passage_only: Optional[bool]=False, streaming: Optional[bool]=True) -> None:
+        self.tag_rules = TagRules(tag_settings)
+        self.include_html = include_html
+        self.verse_output = verse_output
+        self.parser_backend = parser_backend
+        self.passage_only = passage_only
+        self.streaming = streaming
+
+    @staticmethod
+    def __get_span_verse(span_tag: Tag) -> Optional[int]:
+        """Gets the verse number from the verse class of a span (e.g. Gen-1-1)"""
+        for class_name in span_tag.get("class", []):
+            match = VERSE_CLASS_RE.match(class_name)
+
+            if match: return int(match.group(2))
+
+    def __get_verse_texts(self, passage_tag: Tag) -> list[Tuple[Optional[int], str, str]]:
+        """Gets the (verse, verse number prefix, text) of every span.text in the passage paragraphs.
+        Drops the chapter number and cross references"""
+        chapter_tag = passage_tag.select_one("span.chapternum")
+
+        if chapter_tag: chapter_tag.decompose()
+
+        verse_texts = []
+
+        for paragraph in passage_tag.select("p"):
+            for span_tag in paragraph.select("span.text"):
+                cross_reference = span_tag.select_one("sup.crossreference")
+
+                if cross_reference is not None:
+                    cross_reference.decompose()
+
+                verse_num = ""
+
+                verse_num_tag = span_tag.select_one("sup.versenum")
+
+                if verse_num_tag is not None:
+                    verse_num = verse_num_tag.get_text(strip=True) + " "
+
+                    verse_num_tag.decompose()
+
+                text = span_tag.get_text().strip().replace("\n", "")
+
+                verse_texts.append((self.__get_span_verse(span_tag), verse_num, text))
+
+        return verse_texts
+
+    @staticmethod
+    def __get_chapter_text(verse_texts: list[Tuple[Optional[int], str, str]]) -> str:
+        """Joins the verse texts into the chapter content, collapsing spaces in one pass"""
+        return SPACES_RE.sub(" ", "".join(f"{verse_num}{text} " for _, verse_num, text in verse_texts))
+
+    @staticmethod
+    def __get_verses(verse_texts: list[Tuple[Optional[int], str, str]]) -> list[Tuple[int, str]]:
+        """Groups the verse texts by verse into the (verse, text) of the verse level output"""
+        texts: dict[int, list[str]] = {}
+
+        [texts.setdefault(verse_number, []).append(text)
+         for verse_number, _, text in verse_texts if verse_number is not None]
+
+        return [(verse_number, SPACES_RE.sub(" ", " ".join(verse_text)).strip().encode("ascii", errors="ignore").decode())
+                for verse_number, verse_text in texts.items()]
+
+    def extract(self, soup: BeautifulSoup, chapter: int, timings: Optional[dict[str, float]]=None) -> ExtractedChapter:
+        """Extracts the chapter title, content (html or text) and verses of a passage. The content is None
+        when there is no passage. The seconds spent on the tag rules are added to timings"""
+        passage_tag = soup.select_one("div.passage-text")
+
+        if passage_tag is None: return ExtractedChapter(chapter, None, None, None, [], [])
+
+        header_tag = passage_tag.select_one("h3")
+
+        chapter_title = header_tag.get_text(strip=True) if header_tag else None
+
+        if chapter_title is not None:
+            chapter_title = chapter_title.encode("ascii", errors="ignore").decode()
+
+        verses, not_found = [], []
+
+        if self.include_html:
+            content = passage_tag.select_one("div.text-html")
+
+            if self.verse_output: verses = self.__get_verses(self.__get_verse_texts(copy.copy(passage_tag)))
+
+            started = time.perf_counter()
+
+            not_found = [f"{tag['tag']} {tag['attrs']} not found" for tag in self.tag_rules.apply(content)]
+
+            if timings is not None: timings["rules"] = timings.get("rules", 0) + time.perf_counter() - started
+
+            content = content.__repr__()
+        else:
+            verse_texts = self.__get_verse_texts(passage_tag)
+
+            content = self.__get_chapter_text(verse_texts)
+
+            if self.verse_output: verses = self.__get_verses(verse_texts)
+
+        return ExtractedChapter(chapter, chapter_title, content, hashlib.sha1(content.encode("utf-8")).hexdigest(),
+                                verses, not_found)
+
+    def stream(self, text: str, chapter: int) -> Optional[ExtractedChapter]:
+        """Extracts a chapter in text mode straight from the page markup, with a PassageTextParser instead
+        of the tree. Same result as extract, None if the markup needs the tree"""
+        parser = PassageTextParser()
+
+        text = (cut_passage(text) if self.passage_only else None) or text
+
+        for start in range(0, len(text), FEED_SIZE):
+            parser.feed(text[start:start + FEED_SIZE])
+
+            if parser.done: break
+
+        parser.close()
+
+        if parser.unsupported: return None
+
+        if not parser.found: return ExtractedChapter(chapter, None, None, None, [], [])
+
+        content = self.__get_chapter_text(parser.verse_texts)
+
+        verses = self.__get_verses(parser.verse_texts) if self.verse_output else []
+
+        return ExtractedChapter(chapter, parser.title, content, hashlib.sha1(content.encode("utf-8")).hexdigest(),
+                                verses, [])
+
+    @staticmethod
+    def __get_node_chapters(node: Tag) -> set[int]:
+        """Gets the chapters of the verse spans (e.g. Gen-1-1) found in a tag"""
+        span_tags = node.select("span.text")
+
+        if node.name == "span": span_tags.append(node)
+
+        return {int(match.group(1)) for span_tag in span_tags
+                for class_name in span_tag.get("class", [])
+                if (match := VERSE_CLASS_RE.match(class_name))}
+
+    @staticmethod
+    def __clone_tag(tag: Tag) -> Tag:
+        """Returns an empty copy of a tag with the same name and attributes"""
+        return BeautifulSoup("", "html.parser").new_tag(tag.name, attrs=dict(tag.attrs))
+
+    @staticmethod
+    def __split_notes(node: Tag, chapters: range) -> Optional[dict[int, Tag]]:
+        """Splits footnotes/cross references by the chapter each note refers to"""
+        notes: dict[int, list[Tag]] = {}
+
+        for item in node.select("li"):
+            link = item.select_one("a")
+
+            match = NOTE_REFERENCE_RE.search(link.get_text() if link else "")
+
+            if match is None or int(match.group(1)) not in chapters: return None
+
+            notes.setdefault(int(match.group(1)), []).append(item)
+
+        chapter_notes = {}
+
+        for chapter, items in notes.items():
+            chapter_node = copy.copy(node)
+
+            list_tag = chapter_node.select_one("ol, ul")
+
+            if list_tag is None: return None
+
+            list_tag.clear()
+
+            [list_tag.append(copy.copy(item)) for item in items]
+
+            chapter_notes[chapter] = chapter_node
+
+        return chapter_notes
+
+    def __split_nodes(self, parent: Tag, chapters: range) -> Optional[dict[int, list]]:
+        """Splits the children of a tag by chapter. Returns None if they can't be split cleanly"""
+        parts = {chapter: [] for chapter in chapters}
+
+        pending, current = [], None
+
+        for node in list(parent.children):
+            if not isinstance(node, Tag):
+                (pending if current is None else parts[current]).append(node)
+
+                continue
+
+            node_chapters = self.__get_node_chapters(node)
+
+            if not node_chapters.issubset(chapters): return None
+
+            if not node_chapters and set(node.get("class", [])).intersection(NOTE_CLASSES):
+                chapter_notes = self.__split_notes(node, chapters)
+
+                if chapter_notes is None: return None
+
+                [parts[chapter].append(note) for chapter, note in chapter_notes.items()]
+            elif len(node_chapters) == 1:
+                current = node_chapters.pop()
+
+                parts[current].extend(pending + [node])
+
+                pending = []
+            elif len(node_chapters) > 1:
+                node_parts = self.__split_nodes(node, chapters)
+
+                if node_parts is None: return None
+
+                for chapter, nodes in node_parts.items():
+                    if not nodes: continue
+
+                    chapter_node = self.__clone_tag(node)
+
+                    [chapter_node.append(child) for child in nodes]
+
+                    parts[chapter].extend(pending + [chapter_node])
+
+                    pending, current = [], chapter
+            else:
+                pending.append(node)
+
+        if current is None: return None
+
+        parts[current].extend(pending)
+
+        leading = parent.contents[0] if parent.contents else None
+
+        if isinstance(leading, NavigableString) and not leading.strip():
+            [nodes.insert(0, NavigableString(str(leading))) for nodes in parts.values()
+             if nodes and not isinstance(nodes[0], NavigableString)]
+
+        return parts
+
+    def split_chapters(self, soup: BeautifulSoup, chapters: range) -> Optional[dict[int, BeautifulSoup]]:
+        """Splits a multi-chapter passage into one passage per chapter"""
+        passage_tag = soup.select_one("div.passage-text")
+
+        content = passage_tag.select_one("div.text-html") if passage_tag else None
+
+        if content is None: return None
+
+        parts = self.__split_nodes(content, chapters)
+
+        if parts is None or not all(parts.values()): return None
+
+        chapter_soups = {}
+
+        for chapter, nodes in parts.items():
+            chapter_soup = BeautifulSoup('<div class="passage-text"></div>', "html.parser")
+
+            chapter_content = self.__clone_tag(content)
+
+            [chapter_content.append(node) for node in nodes]
+
+            chapter_soup.select_one("div.passage-text").append(chapter_content)
+
+            chapter_soups[chapter] = chapter_soup
+
+        return chapter_soups
+
+    def process(self, text: str, chapters: int|range) -> Tuple[Optional[list[ExtractedChapter]], dict[str, float]]:
+        """Parses a page of one chapter, or of a range of chapters split into one passage per chapter, and
+        extracts them. Returns the chapters (None if the range couldn't be split) and the seconds spent
+        parsing, extracting and applying the tag rules. A chapter in text mode is streamed (see stream)"""
+        started = time.perf_counter()
+
+        if self.streaming and not self.include_html and not isinstance(chapters, range):
+            extracted = self.stream(text, chapters)
+
+            if extracted is not None: return [extracted], {"stream": time.perf_counter() - started}
+
+            started = time.perf_counter()
+
+        soup = parse_page(text, self.parser_backend, self.passage_only)
+
+        timings = {"parse": time.perf_counter() - started}
+
+        if isinstance(chapters, range):
+            chapter_soups = self.split_chapters(soup, chapters)
+
+            if chapter_soups is None: return None, timings
+        else:
+            chapter_soups = {chapters: soup}
+
+        started = time.perf_counter()
+
+        extracted = [self.extract(chapter_soup, chapter, timings) for chapter, chapter_soup in chapter_soups.items()]
+
+        timings["extract"] = time.perf_counter() - started
+
+        return extracted, timings
+
+class ParseWorker:
+    """A process running a ChapterExtractor (see parse_worker.py): the pages are sent to its stdin
+    and the results read from its stdout, pickled. One page at a time, process blocks until it is done.
+    A process that dies or takes more than timeout seconds on a page is killed and started again"""
+    def __init__(self, options: dict[str, Any], timeout: Optional[float]=60.0) -> None:
+        self.options = options
+        self.timeout = timeout
+
+        self.__start()
+
+    def __start(self) -> None:
+        self.child = subprocess.Popen([sys.executable, "-m", "utils.parse_worker"],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        pickle.dump(self.options, self.child.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.child.stdin.flush()
+
+    def restart(self) -> None:
+        """Kills the process and starts a new one"""
+        self.child.kill()
+
+        self.child.wait()
+
+        self.__start()
+
+    def process(self, text: str, chapters: int|range) -> Tuple[Optional[list[ExtractedChapter]], dict[str, float]]:
+        """Same as ChapterExtractor.process, in the worker process. Raises RuntimeError when the page fails,
+        the process is restarted first if it died or timed out"""
+        try:
+            pickle.dump((text, chapters), self.child.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+
+            self.child.stdin.flush()
+
+            if not select.select([self.child.stdout], [], [], self.timeout)[0]:
+                raise TimeoutError(f"no result after {self.timeout}s")
+
+            status, result = pickle.load(self.child.stdout)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            pid = self.child.pid
+
+            self.restart()
+
+            raise RuntimeError(f"Parse worker {pid} failed ({e!r}), restarted it as {self.child.pid}") from e
+
+        if status == "error": raise RuntimeError(f"Parse worker {self.child.pid} failed:\n{result}")
+
+        return result
+
+    def close(self) -> None:
+        """Stops the process once it is done with its page"""
+        try:
+            self.child.stdin.close()
+        except OSError:
+            pass
+
+        self.child.wait()
@@ -0,0 +1,89 @@
+import os
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+FRAGMENTS_PATH = "./data/cache/fragments/"
+
+def render_fragment(html: str, depth: int) -> str:
+    """Prettifies an html fragment as it would be inside depth nested tags,
+    returning its lines already indented for that depth"""
+    wrapped = "<div>" * depth + html + "</div>" * depth
+
+    lines = BeautifulSoup(wrapped, "html.parser").prettify().splitlines(keepends=True)
+
+    return "".join(lines[depth:len(lines) - depth])
+
+class FragmentCache:
+    """Keeps the rendered version fragments of the merged files by content hash,
+    the most recently used ones in memory and all of them on disk"""
+    def __init__(self, path: Optional[str]=FRAGMENTS_PATH, depth: Optional[int]=3,
+                 max_entries: Optional[int]=2048) -> None:
+        if not os.path.exists(path): os.makedirs(path)
+
+        self.depth = depth
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        self.fragments: OrderedDict[str, str] = OrderedDict()
+
+        self.connection = sqlite3.connect(f"{path}fragments.db", timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS fragments (key TEXT PRIMARY KEY, body BLOB)")
+        self.connection.commit()
+
+    def get_key(self, html: str) -> str:
+        """Returns the cache key of a fragment, its content hash at the rendered depth"""
+        return hashlib.sha1(f"{self.depth}\n{html}".encode("utf-8")).hexdigest()
+
+    def __get(self, key: str) -> Optional[str]:
+        """Returns a rendered fragment from memory or from disk"""
+        if key in self.fragments:
+            self.fragments.move_to_end(key)
+
+            return self.fragments[key]
+
+        row = self.connection.execute("SELECT body FROM fragments WHERE key = ?", (key,)).fetchone()
+
+        if row is not None: return zlib.decompress(row[0]).decode("utf-8")
+
+    def __put(self, key: str, fragment: str, stored: bool) -> None:
+        """Adds a rendered fragment to memory, evicting the least recently used one, and to disk"""
+        self.fragments[key] = fragment
+
+        if len(self.fragments) > self.max_entries: self.fragments.popitem(last=False)
+
+        if stored: return
+
+        self.connection.execute("INSERT OR REPLACE INTO fragments VALUES (?, ?)",
+                                (key, zlib.compress(fragment.encode("utf-8"))))
+        self.connection.commit()
+
+    def render(self, html: str) -> str:
+        """Returns the rendered fragment, rendering it only if it isn't cached"""
+        key = self.get_key(html)
+
+        with self.lock:
+            fragment = self.__get(key)
+
+            if fragment is not None:
+                self.__put(key, fragment, True)
+
+                return fragment
+
+        fragment = render_fragment(html, self.depth)
+
+        with self.lock:
+            self.__put(key, fragment, False)
+
+        return fragment
+
+    def close(self) -> None:
+        """Closes the fragments database"""
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Iterable, NamedTuple, Optional
+
+JOBS_PATH = "./data/jobs.db"
+
+JOB_STATUSES = ["pending", "leased", "done", "failed"]
+
+class Job(NamedTuple):
+    version: str
+    version_id: str
+    book: str
+    chapter: int
+    priority: float
+
+    @property
+    def key(self) -> tuple[str, str, int]:
+        return self.version_id, self.book, self.chapter
+
+class FinishedJob(NamedTuple):
+    rowid: int
+    version_id: str
+    book: str
+    chapter: int
+    status: str
+    reason: Optional[str]
+    result: Optional[dict[str, Any]]
+
+class JobQueue:
+    """(version, book, chapter) jobs shared by scrapers in a sqlite database. A worker claims jobs with
+    a lease it renews with heartbeats, a job whose lease expired (its worker died) is claimed again,
+    up to max_attempts times. Workers on other hosts need the database on a filesystem with working locks.
+    Any object with the same methods can stand in for it"""
+    def __init__(self, path: Optional[str]=JOBS_PATH, lease_seconds: Optional[float]=60.0,
+                 max_attempts: Optional[int]=3) -> None:
+        if not os.path.exists(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(max_attempts, 1)
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            version_id TEXT, book TEXT, chapter INTEGER, version TEXT, priority REAL, status TEXT,
+            worker TEXT, lease_expires REAL, attempts INTEGER, reason TEXT, result TEXT, updated REAL,
+            PRIMARY KEY (version_id, book, chapter))""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority)")
+
+    def enqueue(self, jobs: Iterable[Job]) -> int:
+        """Adds the jobs not already queued, returns how many were added"""
+        now = time.time()
+
+        with self.lock:
+            changes = self.connection.total_changes
+
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, 'pending', NULL, NULL, 0, NULL, NULL, ?)",
+                                        [(*job.key, job.version, job.priority, now) for job in jobs])
+            self.connection.execute("COMMIT")
+
+            return self.connection.total_changes - changes
+
+    def claim(self, worker: str, count: int) -> list[Job]:
+        """Leases up to count pending jobs (or jobs whose lease expired) to a worker, highest priority first.
+        Jobs whose lease expired max_attempts times fail instead"""
+        if count <= 0: return []
+
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("""UPDATE jobs SET status = 'failed', reason = 'lease expired', worker = NULL, updated = ?
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""", (now, now, self.max_attempts))
+
+            rows = self.connection.execute("""SELECT version, version_id, book, chapter, priority FROM jobs
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY priority, rowid LIMIT ?""", (now, count)).fetchall()
+
+            jobs = [Job(*row) for row in rows]
+
+            self.connection.executemany("""UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?,
+                attempts = attempts + 1, updated = ? WHERE version_id = ? AND book = ? AND chapter = ?""",
+                [(worker, now + self.lease_seconds, now, *job.key) for job in jobs])
+            self.connection.execute("COMMIT")
+
+        return jobs
+
+    def heartbeat(self, worker: str) -> int:
+        """Renews the leases of a worker, returns how many it holds"""
+        with self.lock:
+            return self.connection.execute("UPDATE jobs SET lease_expires = ? WHERE worker = ? AND status = 'leased'",
+                                           (time.time() + self.lease_seconds, worker)).rowcount
+
+    def __finish(self, worker: str, key: tuple[str, str, int], status: str,
+                 reason: Optional[str], result: Optional[dict[str, Any]]) -> bool:
+        with self.lock:
+            return self.connection.execute("""UPDATE jobs SET status = ?, reason = ?, result = ?, worker = NULL, updated = ?
+                WHERE version_id = ? AND book = ? AND chapter = ? AND worker = ? AND status = 'leased'""",
+                (status, reason, json.dumps(result) if result is not None else None, time.time(), *key, worker)).rowcount > 0
+
+    def complete(self, worker: str, key: tuple[str, str, int], result: dict[str, Any]) -> bool:
+        """Saves the result of a job. Returns False if the worker lost its lease, the result is dropped"""
+        return self.__finish(worker, key, "done", None, result)
+
+    def fail(self, worker: str, key: tuple[str, str, int], reason: str) -> bool:
+        """Fails a job for good. Returns False if the worker lost its lease"""
+        return self.__finish(worker, key, "failed", reason, None)
+
+    def release(self, worker: str) -> int:
+        """Puts the jobs a worker still holds back in the queue, returns how many"""
+        with self.lock:
+            return self.connection.execute("""UPDATE jobs SET status = 'pending', worker = NULL, attempts = attempts - 1
+                WHERE worker = ? AND status = 'leased'""", (worker,)).rowcount
+
+    def get_counts(self) -> dict[str, int]:
+        """Returns the jobs by status"""
+        with self.lock:
+            rows = self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+
+        return {status: dict(rows).get(status, 0) for status in JOB_STATUSES}
+
+    def get_finished(self, skip: Optional[set[int]]=None, limit: Optional[int]=100) -> list[FinishedJob]:
+        """Returns up to limit jobs done or failed, in the order they were queued. The jobs whose rowid
+        is in skip (the ones already being saved) are left out"""
+        skip = skip or set()
+
+        with self.lock:
+            rowids = [rowid for (rowid,) in self.connection.execute(
+                "SELECT rowid FROM jobs WHERE status IN ('done', 'failed') ORDER BY rowid") if rowid not in skip][:limit]
+
+            rows = self.connection.execute(f"""SELECT rowid, version_id, book, chapter, status, reason, result FROM jobs
+                WHERE rowid IN ({", ".join("?" * len(rowids))}) ORDER BY rowid""", rowids).fetchall()
+
+        return [FinishedJob(*row[:6], json.loads(row[6]) if row[6] else None) for row in rows]
+
+    def remove(self, keys: Iterable[tuple[str, str, int]]) -> None:
+        """Deletes jobs, once their results are saved"""
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("DELETE FROM jobs WHERE version_id = ? AND book = ? AND chapter = ?", list(keys))
+            self.connection.execute("COMMIT")
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
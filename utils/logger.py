@@ -1,42 +1,124 @@
 import os
 import sys
+import time
+import atexit
 import logging
-from typing import Optional
+import importlib
+import threading
+import logging.handlers
+from collections import Counter
+from typing import Any, Optional
 
 LOGS_PATH = "./logs/"
 
+PROGRESS_INTERVAL = 5.0
+
+def get_original(module_name: str) -> Any:
+    """Returns a module as it was before eventlet patched it, when eventlet is loaded"""
+    eventlet = sys.modules.get("eventlet")
+
+    return eventlet.patcher.original(module_name) if eventlet is not None else importlib.import_module(module_name)
+
+class NativeQueueListener(logging.handlers.QueueListener):
+    """A queue listener running on an OS thread even when eventlet patched threading, 
+    so writing the logs doesn't block the green threads"""
+    def start(self) -> None:
+        self._thread = get_original("threading").Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
 class Logger:
-    """Logs info, warning and error messages"""
+    """Logs info, warning and error messages. The messages are handed to a queue and
+    written to the console and to logs.log (see set_file) by a single background listener"""
     if not os.path.exists(LOGS_PATH):
         os.makedirs(LOGS_PATH)
-    
-    def __init__(self, name: Optional[str]=None) -> None:
+
+    listener: Optional[logging.handlers.QueueListener] = None
+
+    file_name = "logs.log"
+
+    # C-level locks, so the listener can wait on it whether eventlet patched threading before or after
+    records = get_original("queue").SimpleQueue()
+
+    listener_lock = threading.Lock()
+
+    def __init__(self, name: Optional[str]=None, progress_interval: Optional[float]=PROGRESS_INTERVAL) -> None:
         name = __class__.__name__ if name is None else name
 
+        self.__start_listener()
+
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+        if not self.logger.handlers: self.logger.addHandler(logging.handlers.QueueHandler(self.records))
+
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.progress_interval = progress_interval
+        self.last_progress = 0.0
+
+    @classmethod
+    def set_file(cls, file_name: str) -> None:
+        """Sets the file in LOGS_PATH the messages of this process are written to, e.g. one per worker
+        process so they don't truncate the logs.log of the others. Call it before the first Logger"""
+        with cls.listener_lock:
+            if cls.listener is not None: raise RuntimeError("The log listener is already started")
 
-        s_handler = logging.StreamHandler()
-        f_handler = logging.FileHandler(f"{LOGS_PATH}logs.log", "w")
+            cls.file_name = file_name
 
-        fmt = logging.Formatter("%(name)s:%(levelname)s - %(message)s")
+    @classmethod
+    def __start_listener(cls) -> None:
+        """Starts the listener writing the queued messages, once per process.
+        The log file is truncated when it starts"""
+        with cls.listener_lock:
+            if cls.listener is not None: return
 
-        s_handler.setFormatter(fmt)
-        f_handler.setFormatter(fmt)
+            s_handler = logging.StreamHandler()
+            f_handler = logging.FileHandler(f"{LOGS_PATH}{cls.file_name}", "w")
 
-        s_handler.setLevel(logging.INFO)
-        f_handler.setLevel(logging.INFO)
+            fmt = logging.Formatter("%(name)s:%(levelname)s - %(message)s")
+
+            s_handler.setFormatter(fmt)
+            f_handler.setFormatter(fmt)
+
+            s_handler.setLevel(logging.INFO)
+            f_handler.setLevel(logging.INFO)
+
+            cls.listener = NativeQueueListener(cls.records, s_handler, f_handler, respect_handler_level=True)
+            cls.listener.start()
+
+            atexit.register(cls.listener.stop)
 
-        self.logger.addHandler(s_handler)
-        self.logger.addHandler(f_handler)
-    
     def info(self, message: str) -> None:
         self.logger.info(message)
-    
+
     def warn(self, message: str) -> None:
         self.logger.warning(message)
-    
+
     def error(self, message: str, severe: Optional[bool]=False) -> None:
         self.logger.error(message, exc_info=True)
 
-        if severe: sys.exit(1)
\ No newline at end of file
+        if severe: sys.exit(1)
+
+    def count(self, message: str) -> None:
+        """Counts a repeated warning instead of logging it, see summarize"""
+        with self.lock:
+            self.counters[message] += 1
+
+    def summarize(self) -> None:
+        """Logs the warnings counted, most frequent first, and resets the counters"""
+        with self.lock:
+            counters, self.counters = self.counters, Counter()
+
+        [self.warn(f"{message} ({count} times)") for message, count in counters.most_common()]
+
+    def progress(self, message: str, force: Optional[bool]=False) -> None:
+        """Logs a progress message at most once every progress_interval seconds"""
+        now = time.monotonic()
+
+        with self.lock:
+            if not force and now - self.last_progress < self.progress_interval: return
+
+            self.last_progress = now
+
+        self.info(message)
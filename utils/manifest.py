@@ -0,0 +1,63 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+MANIFEST_PATH = "./data/manifest.db"
+
+class Manifest:
+    """Keeps track of the scraped (version, book, chapter) units in a sqlite database"""
+    def __init__(self, path: Optional[str]=MANIFEST_PATH) -> None:
+        if not os.path.exists(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS units (
+            version_id TEXT, book TEXT, chapter INTEGER, status TEXT, content_hash TEXT,
+            output_path TEXT, updated REAL, PRIMARY KEY (version_id, book, chapter))""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS sizes (
+            book TEXT, chapter INTEGER, size INTEGER, PRIMARY KEY (book, chapter))""")
+        self.connection.commit()
+
+    def get_completed(self) -> set[tuple[str, str, int]]:
+        """Returns the (version id, book, chapter) units that were scraped and saved"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT version_id, book, chapter FROM units WHERE status = 'done'").fetchall()
+
+        return {(version_id, book, int(chapter)) for version_id, book, chapter in rows}
+
+    def mark(self, units: list[tuple[str, str, int, str, Optional[str], Optional[str]]]) -> None:
+        """Records (version id, book, chapter, status, content hash, output path) units"""
+        if not units: return
+
+        updated = time.time()
+
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        [(*unit, updated) for unit in units])
+            self.connection.commit()
+
+    def get_sizes(self) -> dict[tuple[str, int], int]:
+        """Returns the size of the (book, chapter) units seen, the largest of their versions"""
+        with self.lock:
+            rows = self.connection.execute("SELECT book, chapter, size FROM sizes").fetchall()
+
+        return {(book, int(chapter)): size for book, chapter, size in rows}
+
+    def record_sizes(self, sizes: dict[tuple[str, int], int]) -> None:
+        """Records the size of (book, chapter) units, keeping the largest seen"""
+        if not sizes: return
+
+        with self.lock:
+            self.connection.executemany("""INSERT INTO sizes VALUES (?, ?, ?) ON CONFLICT (book, chapter)
+                DO UPDATE SET size = MAX(size, excluded.size)""", [(*key, size) for key, size in sizes.items()])
+            self.connection.commit()
+
+    def close(self) -> None:
+        """Closes the manifest database"""
+        with self.lock:
+            self.connection.close()
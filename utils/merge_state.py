@@ -0,0 +1,34 @@
+import os
+import time
+import sqlite3
+from typing import Optional
+
+MERGE_STATE_PATH = "./data/merge_state.db"
+
+class MergeState:
+    """Keeps the hash of the inputs each merged file was built from in a sqlite database"""
+    def __init__(self, path: Optional[str]=MERGE_STATE_PATH) -> None:
+        if not os.path.exists(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS merged (
+            file_name TEXT PRIMARY KEY, inputs_hash TEXT, updated REAL)""")
+        self.connection.commit()
+
+    def get_hashes(self) -> dict[str, str]:
+        """Returns the inputs hash of every merged file"""
+        return dict(self.connection.execute("SELECT file_name, inputs_hash FROM merged").fetchall())
+
+    def record(self, hashes: list[tuple[str, str]]) -> None:
+        """Records the (file name, inputs hash) of the files merged"""
+        if not hashes: return
+
+        updated = time.time()
+
+        self.connection.executemany("INSERT OR REPLACE INTO merged VALUES (?, ?, ?)",
+                                    [(*file_hash, updated) for file_hash in hashes])
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Closes the merge state database"""
+        self.connection.close()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+from typing import Any, Callable, Iterator, Optional
+
+METRICS_PATH = "./logs/"
+
+BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf")]
+
+class Histogram:
+    """Counts the observed durations in cumulative buckets, like a prometheus histogram"""
+    def __init__(self) -> None:
+        self.counts = [0 for _ in BUCKETS]
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+
+        for i, bucket in enumerate(BUCKETS):
+            if value <= bucket: self.counts[i] += 1
+
+    def get_quantile(self, quantile: float) -> Optional[float]:
+        """Returns the quantile interpolated linearly within the bucket it falls in,
+        like prometheus' histogram_quantile"""
+        if not self.count: return
+
+        rank = quantile * self.count
+
+        i = next(i for i, count in enumerate(self.counts) if count >= rank)
+
+        if BUCKETS[i] == float("inf"): return BUCKETS[i - 1]
+
+        lower, below = (BUCKETS[i - 1], self.counts[i - 1]) if i else (0.0, 0)
+
+        in_bucket = self.counts[i] - below
+
+        return round(lower + (BUCKETS[i] - lower) * (rank - below) / in_bucket, 6) if in_bucket else BUCKETS[i]
+
+class Metrics:
+    """Collects per-stage latencies, counters and sampled gauges of a run
+    and exports them as a json summary and a prometheus text file"""
+    def __init__(self, name: str, path: Optional[str]=METRICS_PATH, sample_interval: Optional[float]=1.0) -> None:
+        if not os.path.exists(path): os.makedirs(path)
+
+        self.name = name
+        self.path = path
+        self.sample_interval = sample_interval
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.samples: dict[str, list[tuple[float, float]]] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records the duration of a stage"""
+        with self.lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Times the block as a stage"""
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def increment(self, counter: str, value: Optional[float]=1, **labels: Any) -> None:
+        """Adds the value to a counter, e.g. increment("requests", status=200)"""
+        key = (counter, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def sample(self, gauge: str, value: float) -> None:
+        """Records the value of a gauge at most once every sample_interval seconds"""
+        elapsed = time.monotonic() - self.started
+
+        with self.lock:
+            samples = self.samples.setdefault(gauge, [])
+
+            if samples and elapsed - samples[-1][0] < self.sample_interval: return
+
+            samples.append((round(elapsed, 3), value))
+
+    def get_summary(self) -> dict[str, Any]:
+        """Returns the metrics as a json serializable dict"""
+        with self.lock:
+            return {
+                "name": self.name,
+                "elapsed": round(time.monotonic() - self.started, 3),
+                "stages": {stage: {"count": h.count, "sum": round(h.sum, 6),
+                                   "mean": round(h.sum / h.count, 6) if h.count else None,
+                                   "p50": h.get_quantile(0.5), "p90": h.get_quantile(0.9),
+                                   "p99": h.get_quantile(0.99)}
+                           for stage, h in self.histograms.items()},
+                "counters": [{"name": counter, "labels": dict(labels), "value": value}
+                             for (counter, labels), value in self.counters.items()],
+                "gauges": {gauge: {"max": max(v for _, v in samples), "samples": samples}
+                           for gauge, samples in self.samples.items() if samples}
+            }
+
+    @staticmethod
+    def __format_labels(labels: dict[str, str]) -> str:
+        if not labels: return ""
+
+        return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+    def get_prometheus(self) -> str:
+        """Returns the metrics in the prometheus text format"""
+        summary, lines = self.get_summary(), []
+
+        stage_metric = f"{self.name}_stage_seconds"
+
+        lines += [f"# HELP {stage_metric} Duration of the {self.name} stages", f"# TYPE {stage_metric} histogram"]
+
+        with self.lock:
+            for stage, h in self.histograms.items():
+                lines += [f'{stage_metric}_bucket{{stage="{stage}",le="{"+Inf" if b == float("inf") else b}"}} {c}'
+                          for b, c in zip(BUCKETS, h.counts)]
+                lines += [f'{stage_metric}_sum{{stage="{stage}"}} {h.sum}', f'{stage_metric}_count{{stage="{stage}"}} {h.count}']
+
+        for counter in dict.fromkeys(c["name"] for c in summary["counters"]):
+            lines += [f"# TYPE {self.name}_{counter}_total counter"]
+
+            lines += [f"{self.name}_{counter}_total{self.__format_labels(c['labels'])} {c['value']}"
+                      for c in summary["counters"] if c["name"] == counter]
+
+        for gauge, values in summary["gauges"].items():
+            lines += [f"# TYPE {self.name}_{gauge} gauge", f"{self.name}_{gauge} {values['samples'][-1][1]}",
+                      f"# TYPE {self.name}_{gauge}_max gauge", f"{self.name}_{gauge}_max {values['max']}"]
+
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> tuple[str, str]:
+        """Writes <name>-metrics.json and <name>-metrics.prom, returns their paths"""
+        json_path, prom_path = f"{self.path}{self.name}-metrics.json", f"{self.path}{self.name}-metrics.prom"
+
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(self.get_summary(), file, indent=4)
+
+        with open(prom_path, "w", encoding="utf-8") as file:
+            file.write(self.get_prometheus())
+
+        return json_path, prom_path
+
+def profile(function: Callable[[], Any], path: str, top: Optional[int]=30) -> Any:
+    """Runs the function under cProfile, dumps the stats to path and prints the top functions"""
+    profiler = cProfile.Profile()
+
+    try:
+        return profiler.runcall(function)
+    finally:
+        profiler.dump_stats(path)
+
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
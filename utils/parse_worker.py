@@ -0,0 +1,33 @@
+import os
+import sys
+import pickle
+import traceback
+
+from utils.extract import ChapterExtractor
+
+def serve() -> None:
+    """Reads the extractor options then (text, chapters) pages from stdin and writes the result
+    of each page to stdout, until stdin is closed. Anything printed goes to stderr"""
+    stdin, stdout = sys.stdin.buffer, os.fdopen(os.dup(1), "wb")
+
+    os.dup2(2, 1)
+
+    extractor = ChapterExtractor(**pickle.load(stdin))
+
+    while True:
+        try:
+            text, chapters = pickle.load(stdin)
+        except EOFError:
+            break
+
+        try:
+            result = ("ok", extractor.process(text, chapters))
+        except Exception:
+            result = ("error", traceback.format_exc())
+
+        pickle.dump(result, stdout, protocol=pickle.HIGHEST_PROTOCOL)
+
+        stdout.flush()
+
+if __name__ == "__main__":
+    serve()
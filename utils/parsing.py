@@ -0,0 +1,36 @@
+import re
+from typing import Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+PARSER_BACKENDS = ["html.parser", "lxml"]
+
+PASSAGE_START_RE = re.compile(
+    r"""<div\b[^>]*\bclass\s*=\s*["'][^"']*\bpassage-text\b[^"']*["'][^>]*>""", re.I)
+
+DIV_TAG_RE = re.compile(r"<(/?)div\b[^>]*>", re.I)
+
+def cut_passage(text: str) -> Optional[str]:
+    """Cuts the first div.passage-text element out of the raw page, None if it can't be found"""
+    start_match = PASSAGE_START_RE.search(text)
+
+    if start_match is None: return
+
+    depth = 0
+
+    for div_match in DIV_TAG_RE.finditer(text, start_match.start()):
+        depth += -1 if div_match.group(1) else 1
+
+        if depth == 0: return text[start_match.start():div_match.end()]
+
+def parse_page(text: str, backend: Optional[str]="html.parser",
+               passage_only: Optional[bool]=False) -> BeautifulSoup:
+    """Parses a passage page. With passage_only, only the div.passage-text region
+    becomes python objects, the rest of the page (navigation, scripts, config) is skipped"""
+    if not passage_only: return BeautifulSoup(text, backend)
+
+    passage = cut_passage(text)
+
+    if passage is not None: return BeautifulSoup(passage, backend)
+
+    return BeautifulSoup(text, backend, parse_only=SoupStrainer("div", class_="passage-text"))
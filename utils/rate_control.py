@@ -0,0 +1,101 @@
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+POLL_INTERVAL = 0.05
+
+class TokenBucket:
+    """Limits the requests per second. A rate of 0 doesn't limit anything"""
+    def __init__(self, rate: float, burst: Optional[float]=None) -> None:
+        self.rate = rate
+        self.burst = max(burst if burst is not None else rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token, returns the seconds to wait before using it"""
+        if self.rate <= 0: return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+            self.updated = now
+
+            return max(-self.tokens / self.rate, 0.0)
+
+class ConcurrencyLimiter:
+    """Adjusts the requests in flight with AIMD: the limit grows by one per round trip
+    while the responses are fast and ok, and is cut by backoff on 429s, 5xx, timeouts
+    or latencies above latency_factor times the best recent latency (at most once per cooldown).
+    Retry-After pauses every request"""
+    def __init__(self, max_limit: int, initial: Optional[int]=10, min_limit: Optional[int]=1,
+                 latency_factor: Optional[float]=3.0, backoff: Optional[float]=0.5,
+                 cooldown: Optional[float]=1.0) -> None:
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_factor = latency_factor
+        self.backoff = backoff
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.base_latency: Optional[float] = None
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a slot if one is free, otherwise returns the seconds to wait before trying again"""
+        with self.lock:
+            now = time.monotonic()
+
+            if now < self.paused_until: return self.paused_until - now
+
+            if self.in_flight >= int(self.limit): return POLL_INTERVAL
+
+            self.in_flight += 1
+
+            return 0.0
+
+    def release(self, latency: Optional[float]=None, failed: Optional[bool]=False,
+                retry_after: Optional[float]=None) -> None:
+        """Frees a slot and adjusts the limit from the outcome of the request"""
+        with self.lock:
+            now = time.monotonic()
+
+            self.in_flight -= 1
+
+            if retry_after: self.paused_until = max(self.paused_until, now + retry_after)
+
+            if latency is not None and not failed:
+                self.base_latency = latency if self.base_latency is None else min(
+                    latency, self.base_latency + (latency - self.base_latency) * 0.01)
+
+            slow = not failed and latency is not None and latency > self.latency_factor * self.base_latency
+
+            if failed or slow:
+                if now - self.last_decrease < self.cooldown: return
+
+                self.limit, self.last_decrease = max(self.limit * self.backoff, self.min_limit), now
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+def get_backoff(attempt: int, base: Optional[float]=0.5, cap: Optional[float]=30.0) -> float:
+    """Returns the seconds to wait before a retry: capped exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Returns the seconds a Retry-After header (seconds or http date) asks to wait"""
+    if not value: return
+
+    if value.strip().isdigit(): return float(value)
+
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return
@@ -0,0 +1,113 @@
+import re
+import functools
+from typing import NamedTuple, Optional
+
+from .data import BOOKS
+
+ALIASES = {
+    "Psalms": "Psalm",
+    "Pss": "Psalm",
+    "Qoh": "Ecclesiastes",
+    "Song of Songs": "Song of Solomon",
+    "Canticles": "Song of Solomon",
+    "Jdg": "Judges",
+    "Mt": "Matthew",
+    "Mk": "Mark",
+    "Lk": "Luke",
+    "Jn": "John",
+    "Phm": "Philemon",
+    "Revelations": "Revelation"
+}
+
+# Verses of each book (KJV versification) by OSIS code. A book-level heuristic to estimate the size of
+# chapters not scraped yet: every chapter of a book gets its average, the chapters of a book aren't told apart
+BOOK_VERSE_COUNTS = {
+    "Gen": 1533, "Exod": 1213, "Lev": 859, "Num": 1288, "Deut": 959, "Josh": 658, "Judg": 618, "Ruth": 85,
+    "1Sam": 810, "2Sam": 695, "1Kgs": 816, "2Kgs": 719, "1Chr": 942, "2Chr": 822, "Ezra": 280, "Neh": 406,
+    "Esth": 167, "Job": 1070, "Ps": 2461, "Prov": 915, "Eccl": 222, "Song": 117, "Isa": 1292, "Jer": 1364,
+    "Lam": 154, "Ezek": 1273, "Dan": 357, "Hos": 197, "Joel": 73, "Amos": 146, "Obad": 21, "Jonah": 48,
+    "Mic": 105, "Nah": 47, "Hab": 56, "Zeph": 53, "Hag": 38, "Zech": 211, "Mal": 55, "Matt": 1071,
+    "Mark": 678, "Luke": 1151, "John": 879, "Acts": 1007, "Rom": 433, "1Cor": 437, "2Cor": 257, "Gal": 149,
+    "Eph": 155, "Phil": 104, "Col": 95, "1Thess": 89, "2Thess": 47, "1Tim": 113, "2Tim": 83, "Titus": 46,
+    "Phlm": 25, "Heb": 303, "Jas": 108, "1Pet": 105, "2Pet": 61, "1John": 105, "2John": 13, "3John": 14,
+    "Jude": 25, "Rev": 404
+}
+
+REFERENCE_RE = re.compile(r"^\s*(?P<book>[1-3]?\s*[^\d\s][^\d]*?)\s*(?:(?P<first>\d+)(?:\s*[-–]\s*(?P<last>\d+))?)?\s*$")
+
+KEY_RE = re.compile(r"[\s.]+")
+
+class Book(NamedTuple):
+    name: str
+    osis: str
+    num_chapters: int
+    index: int
+    num_verses: int = 0
+
+class Reference(NamedTuple):
+    book: Book
+    chapters: range
+
+def get_key(name: str) -> str:
+    """Normalizes a book name for the lookups, e.g. "1 Kgs." -> "1kgs" """
+    return KEY_RE.sub("", name).lower()
+
+class ReferenceTable:
+    """Looks up the books of books.json in O(1) by canonical name, OSIS code, alias
+    or any unambiguous prefix of them (e.g. "Gen", "1 Kgs", "Rev"), and parses references"""
+    def __init__(self, books: list[dict]) -> None:
+        self.books = [Book(book["display"], book["osis"], book["num_chapters"], i, BOOK_VERSE_COUNTS.get(book["osis"], 0))
+                      for i, book in enumerate(books)]
+
+        self.keys: dict[str, Book] = {}
+
+        prefixes: dict[str, set[int]] = {}
+
+        for book in self.books:
+            for key in [get_key(book.name), get_key(book.osis)]:
+                self.keys[key] = book
+
+                [prefixes.setdefault(key[:end], set()).add(book.index)
+                 for end in range(3 if key[0].isdigit() else 2, len(key))]
+
+        by_name = {book.name: book for book in self.books}
+
+        self.keys.update({get_key(alias): by_name[name] for alias, name in ALIASES.items()})
+
+        [self.keys.setdefault(prefix, self.books[min(indexes)]) for prefix, indexes in prefixes.items() if len(indexes) == 1]
+
+    def get(self, name: str) -> Optional[Book]:
+        """Returns the book named, falling back to the first book whose name contains it"""
+        key = get_key(name)
+
+        book = self.keys.get(key)
+
+        if book is not None or not key: return book
+
+        return next((book for book in self.books if key in get_key(book.name)), None)
+
+    def parse(self, reference: str) -> Reference:
+        """Parses references like "Genesis", "Gen 1-3" or "1 Kgs 7". Raises ValueError
+        when the book is unknown or the chapters are out of its range"""
+        reference_match = REFERENCE_RE.match(reference)
+
+        book = self.get(reference_match.group("book")) if reference_match else None
+
+        if book is None: raise ValueError(f"Unknown book in <{reference}>")
+
+        first, last = reference_match.group("first", "last")
+
+        chapters = range(int(first or 1), int(last or first or book.num_chapters) + 1)
+
+        if not chapters or chapters.start < 1 or chapters[-1] > book.num_chapters:
+            raise ValueError(f"<{reference}> isn't within the {book.num_chapters} chapters of {book.name}")
+
+        return Reference(book, chapters)
+
+@functools.cache
+def get_reference_table() -> ReferenceTable:
+    """Returns the reference table, built once per process"""
+    return ReferenceTable(BOOKS["books"]["AMP"])
+
+def parse_reference(reference: str) -> Reference:
+    return get_reference_table().parse(reference)
@@ -0,0 +1,193 @@
+import re
+import bisect
+import dataclasses
+from typing import Any, Optional
+
+from bs4 import ResultSet, Tag
+
+SIMPLE_TAG_RE = re.compile(r"^[\w-]+$")
+
+@dataclasses.dataclass
+class CompiledRule:
+    index: int
+    settings: dict[str, Any]
+    attrs: list[tuple[str, list[str], Optional[re.Pattern]]]
+    actions: set[str]
+
+class TagRules:
+    """Applies the settings.json tag rules in a single walk of the html tree"""
+    def __init__(self, tag_settings: list[dict[str, Any]]) -> None:
+        self.tag_settings = tag_settings
+
+        self.rules = [self.__compile_rule(index, tag) for index, tag in enumerate(tag_settings)]
+
+        self.rules_by_tag: dict[str, list[CompiledRule]] = {}
+
+        [self.rules_by_tag.setdefault(rule.settings["tag"], []).append(rule) for rule in self.rules]
+
+        self.indices_by_tag = {name: [rule.index for rule in rules]
+                               for name, rules in self.rules_by_tag.items()}
+
+        self.compiled = all(SIMPLE_TAG_RE.match(tag["tag"]) for tag in tag_settings)
+
+    @staticmethod
+    def __compile_rule(index: int, tag: dict[str, Any]) -> CompiledRule:
+        """Precompiles the attribute values and wildcard regexes of a rule"""
+        attrs = []
+
+        for attr, value in tag["attrs"].items():
+            wildcard_re = None
+
+            if "changeAttrWildcard" in tag["actions"] and "(.*)" in value:
+                wildcard_re = re.compile(rf"{value}", re.I)
+
+            attrs.append((attr, value.split(" "), wildcard_re))
+
+        return CompiledRule(index, tag, attrs, set(tag["actions"]))
+
+    def __next_rule(self, name: str, position: int) -> Optional[CompiledRule]:
+        """Returns the first rule for the tag name at or after the given position"""
+        indices = self.indices_by_tag.get(name)
+
+        if indices is None: return
+
+        i = bisect.bisect_left(indices, position)
+
+        if i < len(indices): return self.rules_by_tag[name][i]
+
+    @staticmethod
+    def __apply_rule(rule: CompiledRule, html_tag: Tag, state: list[bool]) -> Optional[str]:
+        """Applies a rule to a tag. state holds the rule's [found, tag_found] flags,
+        which carry over from tag to tag like in the sequential loop"""
+        tag = rule.settings
+
+        if not len(rule.attrs): state[0] = True
+
+        for attr, values, wildcard_re in rule.attrs:
+            if not html_tag.attrs.get(attr): continue
+
+            if wildcard_re is not None:
+                wildcard_match = wildcard_re.search(' '.join(html_tag.attrs[attr]))
+
+                if wildcard_match:
+                    state[1], wildcard = True, wildcard_match.group(1)
+
+                    for new_attr, new_value in tag["attrsToChange"].items():
+                        html_tag.attrs[new_attr] = new_value.format(wildcard)
+
+            for val in values:
+                state[0] = val in html_tag.attrs[attr]
+
+                if not state[0]: break
+
+        if not state[0]: return
+
+        state[1] = True
+
+        if "remove" in rule.actions:
+            html_tag.decompose()
+
+            return "remove"
+        elif "stripTags" in rule.actions:
+            html_tag.unwrap()
+
+            return "stripTags"
+
+        if "changeAttrs" in rule.actions:
+            for new_attr, new_value in tag["attrsToChange"].items():
+                html_tag.attrs[new_attr] = new_value
+
+        if "rename" in rule.actions:
+            html_tag.name = tag["newTagName"]
+
+        if "removeAttr" in rule.actions:
+            html_tag.attrs = {k:v for k, v in html_tag.attrs.items()
+                              if not k in tag["attrsToRemove"]}
+
+    def __walk(self, html_tag: Tag, states: list[list[bool]]) -> None:
+        """Applies every matching rule to the tag, in settings order, then walks its children"""
+        children, position = list(html_tag.children), 0
+
+        while (rule := self.__next_rule(html_tag.name, position)) is not None:
+            position = rule.index + 1
+
+            result = self.__apply_rule(rule, html_tag, states[rule.index])
+
+            if result == "remove": return
+
+            if result == "stripTags": break
+
+        [self.__walk(child, states) for child in children if isinstance(child, Tag)]
+
+    def apply(self, html: Tag) -> list[dict[str, Any]]:
+        """Applies the rules to the html and returns the settings of the rules that matched nothing"""
+        if not self.compiled: return self.apply_sequential(html)
+
+        states = [[False, False] for _ in self.rules]
+
+        self.__walk(html, states)
+
+        return [rule.settings for rule, (_, tag_found) in zip(self.rules, states) if not tag_found]
+
+    def apply_sequential(self, html: Tag) -> list[dict[str, Any]]:
+        """Applies the rules one after the other, selecting the tags of each rule again.
+        Used for rules whose tag is a css selector and as the reference for apply"""
+        not_found = []
+
+        for tag in self.tag_settings:
+            soup_tags: ResultSet[Tag] = []
+
+            if tag["tag"] == html.name: soup_tags.append(html)
+
+            soup_tags.extend(html.select(tag["tag"]))
+
+            found, tag_found = False, False
+
+            for html_tag in soup_tags:
+                if not len(tag["attrs"]): found = True
+
+                for attr, value in tag["attrs"].items():
+                    if not html_tag.attrs.get(attr): continue
+
+                    if "changeAttrWildcard" in tag["actions"] and "(.*)" in value:
+                        wildcard_re = re.search(rf"{value}", ' '.join(html_tag.attrs[attr]), re.I)
+
+                        if wildcard_re:
+                            tag_found, wildcard = True, wildcard_re.group(1)
+
+                            for new_attr, new_value in tag["attrsToChange"].items():
+                                html_tag.attrs[new_attr] = new_value.format(wildcard)
+
+                    for val in value.split(" "):
+                        found = False
+
+                        found = True if  val in html_tag.attrs[attr] else found
+
+                        if not found: break
+
+                if found:
+                    tag_found = True
+
+                    if "remove" in tag["actions"]:
+                        html_tag.decompose()
+
+                        continue
+                    elif "stripTags" in tag["actions"]:
+                        html_tag.unwrap()
+
+                        continue
+
+                    if "changeAttrs" in tag["actions"]:
+                        for new_attr, new_value in tag["attrsToChange"].items():
+                            html_tag.attrs[new_attr] = new_value
+
+                    if "rename" in tag["actions"]:
+                        html_tag.name = tag["newTagName"]
+
+                    if "removeAttr" in tag["actions"]:
+                        html_tag.attrs = {k:v for k, v in html_tag.attrs.items()
+                                            if not k in tag["attrsToRemove"]}
+
+            if not tag_found: not_found.append(tag)
+
+        return not_found
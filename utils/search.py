@@ -0,0 +1,426 @@
+import os
+import re
+import mmap
+import time
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left
+from html.parser import HTMLParser
+from typing import Iterable, NamedTuple, Optional
+
+from .references import get_reference_table
+
+INDEX_PATH = "./data/index/"
+
+MAX_SEGMENTS = 8
+
+TOKEN_RE = re.compile(r"\w+")
+
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+VERSE_KEY_RE = re.compile(r"^\w+-(\d+)-(\d+)$")
+
+SPACES_RE = re.compile(r"\s+")
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+SKIPPED_CLASSES = {"chapternum", "footnotes", "crossrefs"}
+
+class Hit(NamedTuple):
+    version_id: str
+    book: str
+    chapter: int
+    verse: int
+    text: str
+
+    @property
+    def key(self) -> str:
+        """Returns the verse span id of the hit, e.g. Gen-1-1"""
+        book = get_reference_table().get(self.book)
+
+        return f"{book.osis if book else self.book}-{self.chapter}-{self.verse}"
+
+class VerseTextParser(HTMLParser):
+    """Collects the text of the verse spans (span.text with a Gen-1-1 like class) of an html fragment,
+    without the verse and chapter numbers, footnotes and cross references"""
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+
+        self.stack: list[tuple[str, bool, Optional[int]]] = []
+        self.skipped = 0
+        self.verses: list[int] = []
+        self.texts: dict[int, list[str]] = {}
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        if tag in VOID_TAGS: return
+
+        classes = (dict(attrs).get("class") or "").split()
+
+        skipped = tag in ["sup", "h3", "h4"] or not SKIPPED_CLASSES.isdisjoint(classes)
+
+        verse = next((int(match.group(2)) for class_name in classes
+                      if (match := VERSE_KEY_RE.match(class_name))), None) if tag == "span" else None
+
+        self.stack.append((tag, skipped, verse))
+
+        self.skipped += skipped
+
+        if verse is not None: self.verses.append(verse)
+
+    def handle_endtag(self, tag: str) -> None:
+        if not any(open_tag == tag for open_tag, _, _ in self.stack): return
+
+        while self.stack:
+            open_tag, skipped, verse = self.stack.pop()
+
+            self.skipped -= skipped
+
+            if verse is not None: self.verses.pop()
+
+            if open_tag == tag: break
+
+    def handle_data(self, data: str) -> None:
+        if self.skipped or not self.verses: return
+
+        self.texts.setdefault(self.verses[-1], []).append(data)
+
+def get_html_verses(html: str) -> list[tuple[int, str]]:
+    """Returns the (verse, text) of the verse spans of an html fragment"""
+    parser = VerseTextParser()
+
+    parser.feed(html)
+
+    parser.close()
+
+    return [(verse, SPACES_RE.sub(" ", "".join(texts)).strip()) for verse, texts in parser.texts.items()]
+
+def get_text_verses(text: str, verses: Optional[list[tuple[int, str]]]=None) -> list[tuple[int, str]]:
+    """Splits the text content of a chapter ("In the beginning... 2 And the earth...") into its verses.
+    The verse level output saved along with it (--verses) has the verses split at their spans, they are used when
+    given. Otherwise a verse starts at the number following the previous verse, a number in the text can fool it"""
+    if verses: return [(verse, verse_text) for verse, verse_text in verses if verse_text]
+
+    words, verse = {1: []}, 1
+
+    for word in text.split():
+        if word == str(verse + 1):
+            verse += 1
+
+            words[verse] = []
+        else:
+            words[verse].append(word)
+
+    return [(verse, " ".join(verse_words)) for verse, verse_words in words.items() if verse_words]
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def parse_query(query: str) -> list[list[str]]:
+    """Parses a query into clauses that must all match: words, and "quoted phrases"
+    whose words must be consecutive"""
+    clauses = [tokenize(match.group(1) if match.group(1) is not None else match.group(2))
+               for match in QUERY_RE.finditer(query)]
+
+    return [clause for clause in clauses if clause]
+
+class Postings:
+    """The postings of a term in a segment: its doc ids, then where the positions of each doc start
+    (relative to the positions, plus one past the last one), then the positions"""
+    def __init__(self, segment: memoryview, offset: int, docs: int) -> None:
+        self.docs = segment[offset:offset + docs]
+        self.starts = segment[offset + docs:offset + 2 * docs + 1]
+        self.base = offset + 2 * docs + 1
+        self.segment = segment
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def find_all(self, docs: list[int]) -> dict[int, int]:
+        """Returns the index in the postings of each of the docs, which all have the term.
+        A few docs are searched for, many are looked up in a map of the postings"""
+        if len(docs) * 16 < len(self.docs): return {doc: bisect_left(self.docs, doc) for doc in docs}
+
+        return dict(zip(self.docs.tolist(), range(len(self.docs))))
+
+    def get_positions(self, i: int) -> memoryview:
+        return self.segment[self.base + self.starts[i]:self.base + self.starts[i + 1]]
+
+def match_phrase(phrase: list[str], postings: dict[str, Postings], indexes: dict[str, dict[int, int]], doc: int) -> bool:
+    """Returns whether the terms of a phrase are consecutive in a doc"""
+    starts = set(postings[phrase[0]].get_positions(indexes[phrase[0]][doc]))
+
+    for offset, term in enumerate(phrase[1:], 1):
+        starts.intersection_update([position - offset for position in postings[term].get_positions(indexes[term][doc])])
+
+        if not starts: return False
+
+    return True
+
+def write_segment(path: str, docs: Iterable[tuple[int, str]]) -> list[tuple[str, int, int]]:
+    """Writes the postings of the (doc id, text) docs, in increasing doc id order, to a segment file
+    of native uint32s. Returns the (term, offset, docs) of every term"""
+    postings: dict[str, list[tuple[int, list[int]]]] = {}
+
+    for doc, text in docs:
+        positions: dict[str, list[int]] = {}
+
+        [positions.setdefault(term, []).append(position) for position, term in enumerate(tokenize(text))]
+
+        [postings.setdefault(term, []).append((doc, term_positions)) for term, term_positions in positions.items()]
+
+    segment, terms = array("I"), []
+
+    for term in sorted(postings):
+        entries, start, starts = postings[term], 0, []
+
+        terms.append((term, len(segment), len(entries)))
+
+        for _, term_positions in entries:
+            starts.append(start)
+
+            start += len(term_positions)
+
+        segment.extend(doc for doc, _ in entries)
+        segment.extend(starts + [start])
+
+        [segment.extend(term_positions) for _, term_positions in entries]
+
+    with open(path, "wb") as file:
+        segment.tofile(file)
+
+    return terms
+
+class VersionIndex:
+    """Inverted index of the verses of a version, made of immutable segments: the postings are
+    memory-mapped segment files and the terms, verses and deleted verses are kept in a sqlite database.
+    Each update adds a segment, the segments are merged back into one past MAX_SEGMENTS"""
+    def __init__(self, path: str, max_segments: Optional[int]=MAX_SEGMENTS) -> None:
+        if not os.path.exists(path): os.makedirs(path)
+
+        self.path = path
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.segments: dict[int, tuple[mmap.mmap, memoryview]] = {}
+
+        self.connection = sqlite3.connect(f"{path}index.db", timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, docs INTEGER, created REAL)")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS terms (
+            term TEXT, segment INTEGER, offset INTEGER, docs INTEGER, PRIMARY KEY (term, segment)) WITHOUT ROWID""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY, book TEXT, chapter INTEGER, verse INTEGER, text TEXT, deleted INTEGER DEFAULT 0)""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS docs_chapter ON docs (book, chapter)")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS chapters (
+            book TEXT, chapter INTEGER, source_hash TEXT, PRIMARY KEY (book, chapter))""")
+        self.connection.commit()
+
+    def __get_segment_path(self, segment: int) -> str:
+        return f"{self.path}segment-{segment}.postings"
+
+    def get_hashes(self) -> dict[tuple[str, int], str]:
+        """Returns the hash of the source each (book, chapter) was indexed from"""
+        with self.lock:
+            rows = self.connection.execute("SELECT book, chapter, source_hash FROM chapters").fetchall()
+
+        return {(book, chapter): source_hash for book, chapter, source_hash in rows}
+
+    @staticmethod
+    def __sort_verses(verses: Iterable[tuple]) -> list[tuple]:
+        """Sorts (book, chapter, verse, ...) rows in the order of the books"""
+        table = get_reference_table()
+
+        def get_order(row: tuple) -> tuple[int, int, int]:
+            book = table.get(row[0])
+
+            return (book.index if book else len(table.books), row[1], row[2])
+
+        return sorted(verses, key=get_order)
+
+    def __add_segment(self, docs: list[tuple[int, str]]) -> Optional[int]:
+        """Writes the docs to a new segment file and records its terms, in the current transaction"""
+        if not docs: return
+
+        segment = (self.connection.execute("SELECT MAX(id) FROM segments").fetchone()[0] or 0) + 1
+
+        terms = write_segment(self.__get_segment_path(segment), docs)
+
+        self.connection.execute("INSERT INTO segments VALUES (?, ?, ?)", (segment, len(docs), time.time()))
+        self.connection.executemany("INSERT INTO terms VALUES (?, ?, ?, ?)",
+                                    [(term, segment, offset, count) for term, offset, count in terms])
+
+        return segment
+
+    def update(self, chapters: list[tuple[str, int, str, list[tuple[int, str]]]]) -> int:
+        """Indexes the (book, chapter, source hash, [(verse, text)]) chapters in a new segment,
+        replacing the verses they had. Returns the verses indexed"""
+        if not chapters: return 0
+
+        verses = self.__sort_verses((book, chapter, verse, text)
+                                    for book, chapter, _, chapter_verses in chapters
+                                    for verse, text in chapter_verses)
+
+        with self.lock:
+            self.connection.executemany("UPDATE docs SET deleted = 1 WHERE book = ? AND chapter = ?",
+                                        [(book, chapter) for book, chapter, _, _ in chapters])
+
+            first = (self.connection.execute("SELECT MAX(id) FROM docs").fetchone()[0] or 0) + 1
+
+            self.connection.executemany("INSERT INTO docs (id, book, chapter, verse, text) VALUES (?, ?, ?, ?, ?)",
+                                        [(doc, *verse) for doc, verse in enumerate(verses, first)])
+
+            self.connection.executemany("INSERT OR REPLACE INTO chapters VALUES (?, ?, ?)",
+                                        [(book, chapter, source_hash) for book, chapter, source_hash, _ in chapters])
+
+            self.__add_segment([(doc, verse[3]) for doc, verse in enumerate(verses, first)])
+
+            self.connection.commit()
+
+            segments = self.connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+        if segments > self.max_segments: self.compact()
+
+        return len(verses)
+
+    def compact(self) -> None:
+        """Merges the segments into one without the deleted verses, numbering the verses in the order of the books"""
+        with self.lock:
+            old_segments = [segment for (segment,) in self.connection.execute("SELECT id FROM segments")]
+
+            verses = self.__sort_verses(self.connection.execute(
+                "SELECT book, chapter, verse, text FROM docs WHERE deleted = 0").fetchall())
+
+            self.connection.execute("DELETE FROM docs")
+            self.connection.execute("DELETE FROM terms")
+
+            self.connection.executemany("INSERT INTO docs (id, book, chapter, verse, text) VALUES (?, ?, ?, ?, ?)",
+                                        [(doc, *verse) for doc, verse in enumerate(verses, 1)])
+
+            self.__add_segment([(doc, verse[3]) for doc, verse in enumerate(verses, 1)])
+
+            self.connection.executemany("DELETE FROM segments WHERE id = ?", [(segment,) for segment in old_segments])
+
+            self.connection.commit()
+
+            for segment in old_segments:
+                self.__close_segment(segment)
+
+                if os.path.exists(self.__get_segment_path(segment)): os.remove(self.__get_segment_path(segment))
+
+    def __open_segment(self, segment: int) -> memoryview:
+        """Memory-maps a segment file once, the pages are only read when a search touches them"""
+        if segment not in self.segments:
+            with open(self.__get_segment_path(segment), "rb") as file:
+                segment_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self.segments[segment] = (segment_map, memoryview(segment_map).cast("I"))
+
+        return self.segments[segment][1]
+
+    def __close_segment(self, segment: int) -> None:
+        if segment not in self.segments: return
+
+        segment_map, view = self.segments.pop(segment)
+
+        view.release()
+
+        segment_map.close()
+
+    def __search_segment(self, segment: int, clauses: list[list[str]]) -> list[int]:
+        """Returns the ids of the docs of a segment matching every clause"""
+        postings: dict[str, Postings] = {}
+
+        for term in {term for clause in clauses for term in clause}:
+            row = self.connection.execute("SELECT offset, docs FROM terms WHERE term = ? AND segment = ?",
+                                          (term, segment)).fetchone()
+
+            if row is None: return []
+
+            postings[term] = Postings(self.__open_segment(segment), *row)
+
+        rarest, *others = sorted(postings.values(), key=len)
+
+        docs = set(rarest.docs.tolist())
+
+        [docs.intersection_update(term_postings.docs.tolist()) for term_postings in others]
+
+        phrases = [clause for clause in clauses if len(clause) > 1]
+
+        if not phrases: return sorted(docs)
+
+        docs = sorted(docs)
+
+        indexes = {term: postings[term].find_all(docs) for phrase in phrases for term in phrase}
+
+        return [doc for doc in docs if all(match_phrase(phrase, postings, indexes, doc) for phrase in phrases)]
+
+    def search(self, clauses: list[list[str]], limit: Optional[int]=20) -> tuple[int, list[tuple]]:
+        """Returns how many verses match every clause and the (book, chapter, verse, text) of the first ones"""
+        if not clauses: return 0, []
+
+        with self.lock:
+            deleted = {doc for (doc,) in self.connection.execute("SELECT id FROM docs WHERE deleted = 1")}
+
+            total, docs = 0, []
+
+            for (segment,) in self.connection.execute("SELECT id FROM segments ORDER BY id").fetchall():
+                segment_docs = [doc for doc in self.__search_segment(segment, clauses) if doc not in deleted]
+
+                total += len(segment_docs)
+
+                docs.extend(segment_docs[:max(limit - len(docs), 0)])
+
+            rows = self.connection.execute(
+                f"SELECT book, chapter, verse, text FROM docs WHERE id IN ({', '.join('?' for _ in docs)}) ORDER BY id",
+                docs).fetchall()
+
+        return total, rows
+
+    def close(self) -> None:
+        """Closes the segments and the index database"""
+        with self.lock:
+            [self.__close_segment(segment) for segment in list(self.segments)]
+
+            self.connection.close()
+
+class SearchIndex:
+    """Full-text index of the scraped chapters, one VersionIndex per version in path/<version id>/"""
+    def __init__(self, path: Optional[str]=INDEX_PATH) -> None:
+        self.path = path
+        self.indexes: dict[str, VersionIndex] = {}
+
+    def get_versions(self) -> list[str]:
+        """Returns the ids of the versions indexed"""
+        if not os.path.exists(self.path): return []
+
+        return sorted(name for name in os.listdir(self.path) if os.path.exists(f"{self.path}{name}/index.db"))
+
+    def open(self, version_id: str) -> VersionIndex:
+        """Returns the index of a version, creating it if needed"""
+        if version_id not in self.indexes: self.indexes[version_id] = VersionIndex(f"{self.path}{version_id}/")
+
+        return self.indexes[version_id]
+
+    def search(self, query: str, version_ids: Optional[list[str]]=None,
+               limit: Optional[int]=20) -> tuple[int, list[Hit]]:
+        """Returns how many verses match the query in the versions given (all of them if none)
+        and the first limit ones. Every word and "quoted phrase" of the query must match"""
+        clauses, total, hits = parse_query(query), 0, []
+
+        wanted = {version_id.lower() for version_id in version_ids or []}
+
+        for version_id in self.get_versions():
+            if wanted and version_id.lower() not in wanted: continue
+
+            version_total, rows = self.open(version_id).search(clauses, max(limit - len(hits), 0))
+
+            total += version_total
+
+            hits.extend(Hit(version_id, *row) for row in rows)
+
+        return total, hits
+
+    def close(self) -> None:
+        [index.close() for index in self.indexes.values()]
+
+        self.indexes = {}
@@ -0,0 +1,216 @@
+import os
+import csv
+import glob
+import time
+import sqlite3
+from typing import Any, Optional, Tuple
+
+from .blobs import read_chapter_html, BLOBS_PATH
+
+SINKS = ["csv", "parquet", "sqlite"]
+
+FSYNC_POLICIES = ["never", "flush", "close"]
+
+PARQUET_PATH = "./data/parquet/"
+
+SQLITE_PATH = "./data/scraped.db"
+
+SORT_KEYS = {
+    "chapters": ["book", "chapter"],
+    "verses": ["book", "chapter", "verse"]
+}
+
+class CsvSink:
+    """Appends the rows to one csv file per table and version, sorted by book (in book_order) 
+    and chapter on close"""
+    def __init__(self, tables: dict[str, Tuple[str, dict[str, str]]], suffix: str,
+                 fsync: Optional[str]="close", append_existing: Optional[bool]=False, 
+                 book_order: Optional[list[str]]=None) -> None:
+        self.tables = tables
+        self.suffix = suffix
+        self.fsync = fsync
+        self.append_existing = append_existing
+        self.book_order = {book: i for i, book in enumerate(book_order or [])}
+
+        self.files: dict[str, list[str]] = {}
+
+    def get_path(self, table: str, row: dict[str, Any]) -> str:
+        """Returns the file the row is written to"""
+        return "{}{}_{}".format(self.tables[table][0], row["version_id"], self.suffix)
+
+    def write(self, table: str, rows: list[dict[str, Any]]) -> None:
+        """Appends the rows to their files, adding the header to new files"""
+        columns, rows_by_file = self.tables[table][1], {}
+
+        [rows_by_file.setdefault(self.get_path(table, row), []).append(
+            {columns[k]: v for k, v in row.items()}) for row in rows]
+
+        for file_name, file_rows in rows_by_file.items():
+            if file_name not in self.files:
+                if not (self.append_existing and os.path.exists(file_name)): open(file_name, "w").close()
+
+                self.files[file_name] = [(columns[key], self.book_order if key == "book" else None) 
+                                         for key in SORT_KEYS[table]]
+
+            write_header = os.path.getsize(file_name) == 0
+
+            with open(file_name, "a", encoding="utf-8", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=list(file_rows[0].keys()), lineterminator=os.linesep)
+
+                if write_header: writer.writeheader()
+
+                writer.writerows(file_rows)
+
+                file.flush()
+
+                if self.fsync == "flush": os.fsync(file.fileno())
+
+    @staticmethod
+    def __get_sort_key(row: dict[str, str], sort_by: list[Tuple[str, Optional[dict[str, int]]]]) -> tuple:
+        """Sorts numbers as numbers and the columns with an order (the books) by their position in it"""
+        return tuple(order.get(row[column], len(order)) if order is not None else 
+                     int(row[column]) if row[column].isdigit() else row[column] for column, order in sort_by)
+
+    def __sort(self, file_name: str, sort_by: list[Tuple[str, Optional[dict[str, int]]]]) -> None:
+        """Sorts the rows of a csv file once all of them are written"""
+        with open(file_name, encoding="utf-8", newline="") as file:
+            reader = csv.DictReader(file)
+
+            fieldnames, rows = reader.fieldnames, list(reader)
+
+        rows.sort(key=lambda row: self.__get_sort_key(row, sort_by))
+
+        with open(file_name, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames, lineterminator=os.linesep)
+
+            writer.writeheader()
+
+            writer.writerows(rows)
+
+            file.flush()
+
+            if self.fsync != "never": os.fsync(file.fileno())
+
+    def close(self) -> None:
+        """Sorts the files written by book and chapter"""
+        [self.__sort(file_name, sort_by) for file_name, sort_by in self.files.items()]
+
+class ParquetSink:
+    """Writes the rows to parquet datasets partitioned by version and book,
+    e.g. ./data/parquet/chapters/KJV/Genesis/. Each flush adds a part file
+    and the parts of a partition are compacted into one file on close"""
+    def __init__(self, path: Optional[str]=PARQUET_PATH) -> None:
+        self.path = path
+
+        self.partitions: set[Tuple[str, str]] = set()
+
+    @staticmethod
+    def get_schema(table: str) -> Any:
+        """Returns the arrow schema of a table"""
+        import pyarrow as pa
+
+        columns = [("version", pa.string()), ("version_id", pa.string()),
+                   ("book", pa.string()), ("chapter", pa.int32())]
+
+        if table == "chapters":
+            columns += [("chapter_title", pa.string()), ("content", pa.string())]
+        else:
+            columns += [("verse", pa.int32()), ("content", pa.string())]
+
+        return pa.schema(columns)
+
+    def get_path(self, table: str, row: dict[str, Any]) -> str:
+        """Returns the partition directory the row is written to"""
+        return f"{self.path}{table}/{row['version_id']}/{row['book']}/"
+
+    def write(self, table: str, rows: list[dict[str, Any]]) -> None:
+        """Writes the rows of each partition to a new part file"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows_by_path: dict[str, list[dict[str, Any]]] = {}
+
+        [rows_by_path.setdefault(self.get_path(table, row), []).append(row) for row in rows]
+
+        for path, path_rows in rows_by_path.items():
+            if not os.path.exists(path): os.makedirs(path)
+
+            pq.write_table(pa.Table.from_pylist(path_rows, schema=self.get_schema(table)),
+                           f"{path}part-{time.time_ns()}.parquet")
+
+            self.partitions.add((table, path))
+
+    def __compact(self, table: str, path: str) -> None:
+        """Merges the part files of a partition into one sorted file,
+        keeping the last written row of each chapter (or verse)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parts = sorted(glob.glob(f"{path}part-*.parquet"))
+
+        if len(parts) < 2: return
+
+        rows = {tuple(row[key] for key in SORT_KEYS[table]): row
+                for part in parts for row in pq.read_table(part).to_pylist()}
+
+        compacted = f"{path}part-{time.time_ns()}.parquet"
+
+        pq.write_table(pa.Table.from_pylist([rows[key] for key in sorted(rows)], schema=self.get_schema(table)),
+                       f"{compacted}.tmp")
+
+        os.replace(f"{compacted}.tmp", compacted)
+
+        [os.remove(part) for part in parts]
+
+    def close(self) -> None:
+        """Compacts the partitions written"""
+        [self.__compact(table, path) for table, path in self.partitions]
+
+class SqliteSink:
+    """Writes the rows to a sqlite database indexed by (version_id, book, chapter).
+    When html_path is given the chapter html files (or their blobs in blobs_path) are stored inline"""
+    def __init__(self, path: Optional[str]=SQLITE_PATH, html_path: Optional[str]=None,
+                 blobs_path: Optional[str]=BLOBS_PATH) -> None:
+        if not os.path.exists(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+
+        self.path = path
+        self.html_path = html_path
+        self.blobs_path = blobs_path
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS chapters (
+            version TEXT, version_id TEXT, book TEXT, chapter INTEGER, chapter_title TEXT,
+            content TEXT, html TEXT, updated REAL, PRIMARY KEY (version_id, book, chapter))""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS verses (
+            version TEXT, version_id TEXT, book TEXT, chapter INTEGER, verse INTEGER,
+            content TEXT, updated REAL, PRIMARY KEY (version_id, book, chapter, verse))""")
+        self.connection.commit()
+
+    def get_path(self, table: str, row: dict[str, Any]) -> str:
+        """Returns the database the row is written to"""
+        return self.path
+
+    def __read_html(self, file_name: str) -> Optional[str]:
+        """Reads a chapter html file (or the blob its name refers to) to store it inline"""
+        if self.html_path is None: return
+
+        return read_chapter_html(f"{self.html_path}{file_name}", self.blobs_path)
+
+    def write(self, table: str, rows: list[dict[str, Any]]) -> None:
+        """Inserts the rows, replacing the ones of the chapters scraped again"""
+        updated = time.time()
+
+        if table == "chapters":
+            values = [(*row.values(), self.__read_html(row["content"]), updated) for row in rows]
+        else:
+            values = [(*row.values(), updated) for row in rows]
+
+        placeholders = ", ".join("?" for _ in values[0])
+
+        self.connection.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", values)
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Closes the database"""
+        self.connection.close()
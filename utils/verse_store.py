@@ -0,0 +1,164 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import itertools
+from typing import Any, Iterable, NamedTuple, Optional
+
+from .references import get_reference_table
+
+STORE_PATH = "./data/store/"
+
+MAGIC = b"BGVS"
+
+FORMAT_VERSION = 1
+
+COMPRESSED = 1
+
+HEADER = struct.Struct("<4sHHII")
+
+CHAPTER_ENTRY = struct.Struct("<QIII")
+
+class StoredChapter(NamedTuple):
+    book: str
+    chapter: int
+    title: Optional[str]
+    verses: list[tuple[int, str]]
+    fragment: Optional[str]
+
+def get_chapter_slots() -> list[int]:
+    """Returns the slot of the first chapter of every book in the chapter table"""
+    return [0, *itertools.accumulate(book.num_chapters for book in get_reference_table().books)]
+
+def pack_chapter(chapter: StoredChapter) -> tuple[int, bytes]:
+    """Packs a chapter into the offsets of its fields followed by the fields: the title, the rendered
+    fragment and verse 1 to the last verse (empty if missing). Returns the last verse and the block"""
+    texts = dict(chapter.verses)
+
+    verses = max(texts, default=0)
+
+    fields = [(chapter.title or "").encode("utf-8"), (chapter.fragment or "").encode("utf-8")]
+
+    fields += [texts.get(verse, "").encode("utf-8") for verse in range(1, verses + 1)]
+
+    offsets = [0, *itertools.accumulate(len(field) for field in fields)]
+
+    return verses, struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(fields)
+
+def write_store(path: str, version: str, version_id: str, chapters: Iterable[StoredChapter],
+                compress: Optional[bool]=False) -> int:
+    """Writes the chapters of a version to a store file: a header, the version metadata, a table with
+    the (offset, stored length, length, last verse) of the block of every chapter in book order, then
+    the blocks, zlib compressed with compress. Returns the chapters written"""
+    if not os.path.exists(os.path.dirname(path)): os.makedirs(os.path.dirname(path))
+
+    table, slots = get_reference_table(), get_chapter_slots()
+
+    entries, metadata = [(0, 0, 0, 0) for _ in range(slots[-1])], json.dumps(
+        {"version": version, "version_id": version_id}).encode("utf-8")
+
+    with open(f"{path}.tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSED if compress else 0, len(entries), len(metadata)))
+        file.write(metadata)
+
+        table_offset = file.tell()
+
+        file.write(bytes(CHAPTER_ENTRY.size * len(entries)))
+
+        for chapter in chapters:
+            book = table.get(chapter.book)
+
+            if book is None or not 1 <= chapter.chapter <= book.num_chapters: continue
+
+            verses, block = pack_chapter(chapter)
+
+            stored = zlib.compress(block) if compress else block
+
+            entries[slots[book.index] + chapter.chapter - 1] = (file.tell(), len(stored), len(block), verses)
+
+            file.write(stored)
+
+        file.seek(table_offset)
+
+        file.write(b"".join(CHAPTER_ENTRY.pack(*entry) for entry in entries))
+
+    os.replace(f"{path}.tmp", path)
+
+    return sum(1 for entry in entries if entry[1])
+
+class VerseStore:
+    """Random access to the verses, titles and rendered fragments of a version from its store file,
+    memory-mapped so a lookup only reads the table entry and the bytes it returns"""
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, self.flags, self.chapters, metadata_length = HEADER.unpack_from(self.map, 0)
+
+        if magic != MAGIC or format_version != FORMAT_VERSION: raise ValueError(f"{path} isn't a verse store")
+
+        self.metadata: dict[str, Any] = json.loads(self.map[HEADER.size:HEADER.size + metadata_length])
+        self.version: str = self.metadata["version"]
+        self.version_id: str = self.metadata["version_id"]
+        self.table_offset = HEADER.size + metadata_length
+        self.slots = get_chapter_slots()
+
+    def __get_entry(self, book: str, chapter: int) -> Optional[tuple[int, int, int, int]]:
+        """Returns the table entry of a chapter, None if the chapter isn't stored"""
+        book = get_reference_table().get(book)
+
+        if book is None or not 1 <= chapter <= book.num_chapters: return
+
+        entry = CHAPTER_ENTRY.unpack_from(self.map, self.table_offset + (self.slots[book.index] + chapter - 1) * CHAPTER_ENTRY.size)
+
+        return entry if entry[1] else None
+
+    def __read_fields(self, entry: tuple[int, int, int, int], first: int, last: int) -> list[str]:
+        """Returns the fields first to last of a chapter block, decompressing it if needed"""
+        offset, stored, _, verses = entry
+
+        block = self.map
+
+        if self.flags & COMPRESSED: block, offset = zlib.decompress(self.map[offset:offset + stored]), 0
+
+        data = offset + (verses + 3) * 4
+
+        offsets = struct.unpack_from(f"<{last - first + 2}I", block, offset + first * 4)
+
+        return [block[data + start:data + end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def get_chapters(self) -> list[tuple[str, int]]:
+        """Returns the (book, chapter) of the chapters stored, in book order"""
+        return [(book.name, chapter) for book in get_reference_table().books
+                for chapter in range(1, book.num_chapters + 1) if self.__get_entry(book.name, chapter)]
+
+    def get_title(self, book: str, chapter: int) -> Optional[str]:
+        entry = self.__get_entry(book, chapter)
+
+        return (self.__read_fields(entry, 0, 0)[0] or None) if entry else None
+
+    def get_fragment(self, book: str, chapter: int) -> Optional[str]:
+        """Returns the html of a chapter as rendered for the merged files, None for text only chapters"""
+        entry = self.__get_entry(book, chapter)
+
+        return (self.__read_fields(entry, 1, 1)[0] or None) if entry else None
+
+    def get_verses(self, book: str, chapter: int, first: Optional[int]=1,
+                   last: Optional[int]=None) -> Optional[list[tuple[int, str]]]:
+        """Returns the (verse, text) of the verses first to last (the end of the chapter if None)
+        found in a chapter, None if the chapter isn't stored"""
+        entry = self.__get_entry(book, chapter)
+
+        if entry is None: return
+
+        first, last = max(first, 1), min(last or entry[3], entry[3])
+
+        if first > last: return []
+
+        texts = self.__read_fields(entry, first + 1, last + 1)
+
+        return [(verse, text) for verse, text in zip(range(first, last + 1), texts) if text]
+
+    def close(self) -> None:
+        self.map.close()
@@ -0,0 +1,118 @@
+import time
+import threading
+from queue import Queue, Empty
+from typing import Any, Callable, Optional
+
+CLOSE = object()
+
+class Writer:
+    """Streams rows to the output sinks from a single writer thread fed by a bounded queue. A sink failing
+    doesn't stop the thread: the error is logged, the rows it failed on aren't reported as saved and
+    close raises the first error once the queue is drained"""
+    def __init__(self, sinks: list[Any], batch_size: Optional[int]=100,
+                 flush_interval: Optional[float]=5.0, queue_size: Optional[int]=1000,
+                 logger: Optional[Any]=None, metrics: Optional[Any]=None,
+                 on_saved: Optional[Callable[[list[Any]], None]]=None) -> None:
+        self.sinks = sinks
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self.metrics = metrics
+        self.on_saved = on_saved
+        self.error: Optional[Exception] = None
+
+        self.queue = Queue(maxsize=queue_size)
+
+        self.thread = threading.Thread(target=self.__work, daemon=True)
+        self.thread.start()
+
+    def put(self, table: str, row: dict[str, Any], unit: Optional[Any]=None) -> None:
+        """Queues a row of a table (chapters or verses), blocking while the queue is full.
+        Once the row is written to every sink, its unit is handed to on_saved with the others of the batch"""
+        self.queue.put((table, row, unit))
+
+    def get_path(self, table: str, row: dict[str, Any]) -> str:
+        """Returns where the first sink writes the row to"""
+        return self.sinks[0].get_path(table, row)
+
+    def __work(self) -> None:
+        """Writes the queued rows in batches of batch_size or every flush_interval seconds"""
+        pending, last_flush = [], time.monotonic()
+
+        while True:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.01)
+
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                item = None
+
+            if item is CLOSE:
+                self.__flush(pending)
+
+                break
+
+            if item is not None: pending.append(item)
+
+            if len(pending) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                self.__flush(pending)
+
+                pending, last_flush = [], time.monotonic()
+
+    def __flush(self, pending: list[tuple]) -> None:
+        """Writes the pending rows to the sinks, table by table"""
+        rows_by_table: dict[str, list[dict[str, Any]]] = {}
+
+        [rows_by_table.setdefault(table, []).append(row) for table, row, _ in pending]
+
+        started = time.perf_counter()
+
+        saved_tables = [table for table, rows in rows_by_table.items() if self.__write(table, rows)]
+
+        if self.metrics is not None and pending: self.metrics.observe("write", time.perf_counter() - started)
+
+        units = [unit for table, _, unit in pending if unit is not None and table in saved_tables]
+
+        if self.on_saved is None or not units: return
+
+        try:
+            self.on_saved(units)
+        except Exception as e:
+            self.__fail(e, "Failed to report the rows saved")
+
+    def __write(self, table: str, rows: list[dict[str, Any]]) -> bool:
+        """Writes rows to every sink, returns whether they all succeeded"""
+        saved = True
+
+        for sink in self.sinks:
+            try:
+                sink.write(table, rows)
+            except Exception as e:
+                saved = False
+
+                self.__fail(e, f"{type(sink).__name__} failed to write {len(rows)} {table} records")
+
+        if saved and self.logger is not None: self.logger.info(f"{len(rows)} {table} records saved")
+
+        return saved
+
+    def __fail(self, error: Exception, message: str) -> None:
+        """Logs an error of the writer thread, the first one is raised by close"""
+        if self.error is None: self.error = error
+
+        if self.logger is not None: self.logger.error(message)
+
+    def close(self) -> None:
+        """Writes the rows left, stops the writer thread and closes the sinks.
+        Raises the first error of the writer, if any"""
+        self.queue.put(CLOSE)
+
+        self.thread.join()
+
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.__fail(e, f"Failed to close {type(sink).__name__}")
+
+        if self.error is not None: raise self.error
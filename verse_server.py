@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from merger import BibleVerse, VERSIONS, create_option, create_content, format_version_content
+from indexer import get_latest_chapters, ChapterReader, VERSES_PATH
+from utils import VerseStore, StoredChapter, write_store, STORE_PATH, FragmentCache, get_reference_table, BLOBS_PATH
+
+CACHE_ENTRIES = 4096
+
+PARSER = argparse.ArgumentParser(description="Builds the verse stores and serves verses and merged chapters from them")
+
+PARSER.add_argument("-csv", "--csv_path", type=str, default="./data/csv/")
+
+PARSER.add_argument("-html", "--html_path", type=str, default="./data/html/")
+
+PARSER.add_argument("-vp", "--verses_path", type=str, default=VERSES_PATH)
+
+PARSER.add_argument("-bp", "--blobs_path", type=str, default=BLOBS_PATH)
+
+PARSER.add_argument("-st", "--store_path", type=str, default=STORE_PATH)
+
+PARSER.add_argument("-bd", "--build", action="store_true")
+
+PARSER.add_argument("-z", "--compress", action="store_true")
+
+PARSER.add_argument("-p", "--port", type=int, default=8080)
+
+PARSER.add_argument("-ce", "--cache-entries", type=int, default=CACHE_ENTRIES)
+
+def build(csv_path: str, html_path: str, store_path: Optional[str]=STORE_PATH, compress: Optional[bool]=False,
+          verses_path: Optional[str]=VERSES_PATH, blobs_path: Optional[str]=BLOBS_PATH) -> None:
+    """Writes a store per version from the newest snapshot of every chapter. The html is rendered
+    for the merged files once here, so nothing is parsed when it is served"""
+    fragments = FragmentCache()
+
+    for version_id, verses in get_latest_chapters(csv_path).items():
+        started, chapters, reader = time.perf_counter(), [], ChapterReader(html_path, verses_path, blobs_path)
+
+        for file_name, verse in verses:
+            source = reader.read(file_name, verse)
+
+            if source is None:
+                print(f"Skipping {verse.book} {verse.chapter} ({version_id}), {verse.content} not found")
+
+                continue
+
+            text, is_html, chapter_verses = source
+
+            chapters.append(StoredChapter(verse.book, verse.chapter, verse.chapter_title, chapter_verses,
+                                          fragments.render(text) if is_html else None))
+
+        written = write_store(f"{store_path}{version_id}.verses", verses[0][1].version, version_id, chapters, compress)
+
+        print(f"{version_id}: {written} chapters stored in {time.perf_counter() - started:.1f}s")
+
+    fragments.close()
+
+class VerseLookup:
+    """Looks up verses, verse ranges and merged chapters in the verse stores without parsing any html,
+    keeping the most recently used results in memory"""
+    def __init__(self, store_path: Optional[str]=STORE_PATH, max_entries: Optional[int]=CACHE_ENTRIES) -> None:
+        self.stores = {store.version_id.lower(): store for store in
+                       (VerseStore(f"{store_path}{f}") for f in sorted(os.listdir(store_path)) if f.endswith(".verses"))}
+
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        self.cache: OrderedDict[tuple, Any] = OrderedDict()
+
+    def __cached(self, key: tuple, lookup: Callable[[], Any]) -> Any:
+        """Returns the result of a lookup from the cache, evicting the least recently used one when full"""
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+
+                return self.cache[key]
+
+        result = lookup()
+
+        with self.lock:
+            self.cache[key] = result
+
+            if len(self.cache) > self.max_entries: self.cache.popitem(last=False)
+
+        return result
+
+    def get_verses(self, version_id: str, book: str, chapter: int, first: Optional[int]=1,
+                   last: Optional[int]=None) -> Optional[dict[str, Any]]:
+        """Returns the verses first to last (to the end of the chapter if None) of a chapter, None if it isn't stored"""
+        def lookup() -> Optional[dict[str, Any]]:
+            store, book_found = self.stores.get(version_id.lower()), get_reference_table().get(book)
+
+            verses = store.get_verses(book, chapter, first, last) if store and book_found else None
+
+            if verses is None: return
+
+            return {"version": store.version, "version_id": store.version_id, "book": book_found.name,
+                    "chapter": chapter, "chapter_title": store.get_title(book, chapter),
+                    "verses": [{"verse": verse, "text": text} for verse, text in verses]}
+
+        return self.__cached(("verses", version_id.lower(), book, chapter, first, last), lookup)
+
+    def get_chapter(self, book: str, chapter: int, version_ids: Optional[list[str]]=None) -> Optional[str]:
+        """Returns a chapter merged like the merger does, with the versions given (all of them if none)
+        in the options-order.json order. None if no version has the html of the chapter"""
+        wanted = tuple(sorted({version_id.lower() for version_id in version_ids or []}))
+
+        def lookup() -> Optional[str]:
+            book_found, options, content, first_verse = get_reference_table().get(book), "", "", None
+
+            for version_id in VERSIONS if book_found else []:
+                store = self.stores.get(version_id.lower())
+
+                if store is None or (wanted and version_id.lower() not in wanted): continue
+
+                fragment = store.get_fragment(book, chapter)
+
+                if fragment is None: continue
+
+                verse = BibleVerse(store.version, store.version_id, book_found.name, chapter)
+
+                options += create_option(verse)
+
+                content += format_version_content(verse, fragment)
+
+                first_verse = first_verse or verse
+
+            return create_content(first_verse, options, content) if first_verse else None
+
+        return self.__cached(("chapter", book, chapter, wanted), lookup)
+
+    def close(self) -> None:
+        [store.close() for store in self.stores.values()]
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """GET /verses?version=KJV&book=Genesis&chapter=1&verses=1-5 returns the verses as json,
+    GET /chapter?book=Genesis&chapter=1&versions=KJV,NIV returns the merged chapter"""
+    protocol_version = "HTTP/1.1"
+
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None: pass
+
+    def __send(self, status: int, body: bytes, content_type: Optional[str]="application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def __send_error(self, status: int, message: str) -> None:
+        self.__send(status, json.dumps({"error": message}).encode("utf-8"))
+
+    def do_GET(self) -> None:
+        lookup: VerseLookup = self.server.lookup
+
+        url = urlparse(self.path)
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        try:
+            book, chapter = params["book"], int(params["chapter"])
+
+            first, _, last = params.get("verses", "").partition("-")
+
+            first, last = int(first or 1), int(last) if last else int(first) if first else None
+        except (KeyError, ValueError):
+            return self.__send_error(400, "book and chapter are required, verses must be like 3 or 1-5")
+
+        if url.path == "/verses":
+            verses = lookup.get_verses(params.get("version", ""), book, chapter, first, last)
+
+            if verses is None: return self.__send_error(404, f"{book} {chapter} ({params.get('version')}) not found")
+
+            return self.__send(200, json.dumps(verses).encode("utf-8"))
+
+        if url.path == "/chapter":
+            version_ids = [version_id for version_id in params.get("versions", "").split(",") if version_id]
+
+            merged = lookup.get_chapter(book, chapter, version_ids)
+
+            if merged is None: return self.__send_error(404, f"{book} {chapter} not found")
+
+            return self.__send(200, merged.encode("utf-8"), "text/html")
+
+        self.__send_error(404, f"{url.path} not found")
+
+class VerseServer(ThreadingHTTPServer):
+    """Serves the verse lookups over http on localhost"""
+    daemon_threads = True
+
+    def __init__(self, port: int, lookup: VerseLookup) -> None:
+        super().__init__(("127.0.0.1", port), LookupHandler)
+
+        self.lookup = lookup
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "VerseServer":
+        """Serves in a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+        return self
+
+if __name__ == "__main__":
+    args = PARSER.parse_args()
+
+    if args.build:
+        build(args.csv_path, args.html_path, args.store_path, args.compress, args.verses_path, args.blobs_path)
+    else:
+        server = VerseServer(args.port, VerseLookup(args.store_path, args.cache_entries))
+
+        print(f"Serving {', '.join(store.version_id for store in server.lookup.stores.values())} on {server.url}")
+
+        server.serve_forever()